@@ -0,0 +1,77 @@
+"""
+Бенчмарк стоимости логирования одной сделки
+
+Сравнивает синхронную запись в файл (форматирование JSON, запись и
+ротация в вызывающем потоке) с очередью и фоновой записью пачками.
+Консольный вывод отключен в обоих вариантах.
+
+Сделки идут сериями (--burst) с паузами, как в интерактивной работе:
+в сплошном цикле фоновый поток делит GIL с вызывающим и искажает замер.
+Паузы в измеренное время не входят.
+
+Запуск: python -m benchmarks.bench_logging --trades 100000
+"""
+
+import argparse
+import tempfile
+import time
+
+from src.valutatrade_hub import const
+from src.valutatrade_hub.logging_config import (
+    setup_action_logger,
+    shutdown_action_logger,
+)
+
+TRADE_EXTRA = {
+    "action": const.LOG_ACTION_BUY,
+    "username": "user1",
+    "user_id": 1,
+    "currency_code": "BTC",
+    "amount": 0.001,
+    "rate": 60000.0,
+    "base_currency": "USD",
+    "result": "OK",
+    "error_type": "",
+    "error_message": "",
+    "context": "",
+}
+
+
+def measure(label: str, trades: int, burst: int, queued: bool):
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = setup_action_logger(
+            log_dir, queued=queued, console=False, name=f"bench_{label}"
+        )
+
+        started = time.perf_counter_ns()
+        caller = 0
+        for _ in range(0, trades, burst):
+            burst_started = time.perf_counter_ns()
+            for _ in range(burst):
+                logger.info("BUY operation completed", extra=TRADE_EXTRA)
+            caller += time.perf_counter_ns() - burst_started
+            time.sleep(0.005)
+
+        shutdown_action_logger(logger)
+        total = time.perf_counter_ns() - started
+
+    print(
+        f"{label}: {caller / trades / 1000:.2f} мкс на сделку в вызывающем потоке, "
+        f"всего с паузами {total / 1e9:.2f} с"
+    )
+    return caller / trades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--burst", type=int, default=100)
+    args = parser.parse_args()
+
+    sync = measure("sync", args.trades, args.burst, queued=False)
+    queued = measure("queued", args.trades, args.burst, queued=True)
+    print(f"Ускорение для вызывающего кода: x{sync / queued:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Бенчмарк памяти доменных моделей: загрузка портфелей в старом формате
+(вложенные {"balance": x} и классы с __dict__) против плоского формата
+и моделей на __slots__
+
+Запуск: python -m benchmarks.bench_models --count 1000000
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from src.valutatrade_hub.core.models import Portfolio
+
+CURRENCIES = ("USD", "EUR", "RUB", "BTC", "ETH")
+
+
+class LegacyPortfolio:
+    """Портфель в прежнем виде: обычный класс с __dict__"""
+
+    def __init__(self, user_id, wallets):
+        self._user_id = user_id
+        self._wallets = wallets
+
+
+def generate_wallets(count: int, seed: int) -> list[dict[str, float]]:
+    rnd = random.Random(seed)
+    return [
+        {
+            code: round(rnd.uniform(0, 1000), 2)
+            for code in rnd.sample(CURRENCIES, rnd.randint(1, 3))
+        }
+        for _ in range(count)
+    ]
+
+
+def measure(label: str, payload: str, build) -> tuple[int, float]:
+    """Разбирает JSON и строит объекты, возвращает удержанную память и время"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    objects = build(json.loads(payload))
+    elapsed = time.perf_counter() - started
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label}: {retained / 1024 / 1024:.1f} МБ, {elapsed:.2f} с "
+        f"({len(objects)} портфелей)"
+    )
+    del objects
+    return retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    wallets = generate_wallets(args.count, args.seed)
+    legacy_payload = json.dumps(
+        [
+            {
+                "user_id": user_id,
+                "wallets": {code: {"balance": b} for code, b in w.items()},
+            }
+            for user_id, w in enumerate(wallets, 1)
+        ]
+    )
+    compact_payload = json.dumps(
+        [{"user_id": user_id, "wallets": w} for user_id, w in enumerate(wallets, 1)]
+    )
+    del wallets
+
+    legacy_memory, legacy_time = measure(
+        "Вложенный формат + __dict__",
+        legacy_payload,
+        lambda records: [
+            LegacyPortfolio(r["user_id"], r["wallets"]) for r in records
+        ],
+    )
+    compact_memory, compact_time = measure(
+        "Плоский формат + __slots__",
+        compact_payload,
+        lambda records: [Portfolio.from_record(r) for r in records],
+    )
+
+    print(
+        f"Память: {compact_memory / legacy_memory:.0%} от прежней, "
+        f"время: {compact_time / legacy_time:.0%} от прежнего"
+    )
+
+
+if __name__ == "__main__":
+    main()
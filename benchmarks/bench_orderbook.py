@@ -0,0 +1,148 @@
+"""
+Бенчмарк книги лимитных заявок
+
+Запуск: python -m benchmarks.bench_orderbook --orders 1000000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from src.valutatrade_hub.const import SIDE_BUY, SIDE_SELL
+from src.valutatrade_hub.core import utils
+from src.valutatrade_hub.core.orderbook import LimitOrder, OrderBooks, OrderMatcher
+from src.valutatrade_hub.infra.database import DatabaseManager
+
+PAIR_CURRENCY = "BTC"
+BASE_CURRENCY = "USD"
+MID_PRICE = 60000.0
+
+
+def generate_orders(count: int, seed: int) -> list[LimitOrder]:
+    """Генерирует заявки вокруг текущего курса (±20%)"""
+    rnd = random.Random(seed)
+    orders = []
+    for order_id in range(1, count + 1):
+        side = SIDE_BUY if rnd.random() < 0.5 else SIDE_SELL
+        # Покупки ниже рынка, продажи выше - иначе они исполнились бы сразу
+        offset = rnd.uniform(0.0, 0.2) * MID_PRICE
+        price = MID_PRICE - offset if side == SIDE_BUY else MID_PRICE + offset
+        orders.append(
+            LimitOrder(
+                order_id=order_id,
+                user_id=rnd.randint(1, 10000),
+                side=side,
+                currency=PAIR_CURRENCY,
+                base_currency=BASE_CURRENCY,
+                amount=round(rnd.uniform(0.001, 1.0), 6),
+                price=round(price, 2),
+                created_at="2025-01-01T00:00:00",
+            )
+        )
+    return orders
+
+
+def bench_matcher(orders: list[LimitOrder], moves: int, seed: int):
+    """
+    Полный путь обновления курса: OrderMatcher.match с файлами заявок,
+    портфелей и журнала балансов
+    """
+    pair = f"{PAIR_CURRENCY}_{BASE_CURRENCY}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        db = DatabaseManager(data_dir)
+        db.save("orders.json", OrderBooks(orders).to_record())
+        portfolios = []
+        for user_id in sorted({order.user_id for order in orders}):
+            portfolio = utils.create_portfolio(user_id, BASE_CURRENCY)
+            portfolio["wallets"] = {BASE_CURRENCY: 1e12, PAIR_CURRENCY: 1e6}
+            portfolios.append(portfolio)
+        db.save("portfolios.json", portfolios)
+
+        matcher = OrderMatcher(db, "orders.json", "portfolios.json")
+        started = time.perf_counter()
+        matcher.match({pair: MID_PRICE})
+        print(f"OrderMatcher: загрузка книг {time.perf_counter() - started:.2f} с")
+
+        rnd = random.Random(seed)
+        rate = MID_PRICE
+        quiet = crossing = 0.0
+        quiet_moves = filled = 0
+        for _ in range(moves):
+            # Половина курсов остается внутри спреда и ничего не пересекает
+            if rnd.random() < 0.5:
+                started = time.perf_counter()
+                matcher.match({pair: rate})
+                quiet += time.perf_counter() - started
+                quiet_moves += 1
+                continue
+            rate *= 1 - rnd.uniform(0.0, 0.0005)
+            started = time.perf_counter()
+            filled += len(matcher.match({pair: rate}))
+            crossing += time.perf_counter() - started
+
+    print(
+        f"OrderMatcher без пересечений: "
+        f"{quiet / max(quiet_moves, 1) * 1e6:.1f} мкс на обновление"
+    )
+    print(
+        f"OrderMatcher с исполнением ({filled} заявок): "
+        f"{crossing / max(moves - quiet_moves, 1) * 1e3:.1f} мс на обновление "
+        f"(запись заявок, портфелей и журнала)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--moves", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--matcher-orders",
+        type=int,
+        default=100_000,
+        help="заявок для полного пути OrderMatcher.match (0 - пропустить)",
+    )
+    args = parser.parse_args()
+
+    if args.matcher_orders:
+        bench_matcher(
+            generate_orders(args.matcher_orders, args.seed), args.moves, args.seed
+        )
+
+    orders = generate_orders(args.orders, args.seed)
+
+    started = time.perf_counter()
+    books = OrderBooks(orders)
+    build_time = time.perf_counter() - started
+    print(f"Книга из {len(books)} заявок построена за {build_time:.2f} с")
+
+    # Курс медленно дрейфует вниз: каждый шаг пересекает немного уровней
+    rnd = random.Random(args.seed)
+    rate = MID_PRICE
+    pair = f"{PAIR_CURRENCY}_{BASE_CURRENCY}"
+    filled = 0
+    started = time.perf_counter()
+    for _ in range(args.moves):
+        rate *= 1 - rnd.uniform(0.0, 0.0005)
+        filled += len(books.match({pair: rate}))
+    match_time = time.perf_counter() - started
+
+    print(
+        f"{args.moves} обновлений курса: исполнено {filled} заявок, "
+        f"{match_time / args.moves * 1e6:.1f} мкс на обновление"
+    )
+
+    # Для сравнения: наивный полный перебор открытых заявок на каждый курс
+    open_orders = books.open_orders()
+    started = time.perf_counter()
+    crossed = sum(1 for order in open_orders if order.crosses(rate))
+    scan_time = time.perf_counter() - started
+    print(
+        f"Полный перебор {len(open_orders)} заявок: {scan_time * 1e6:.1f} мкс "
+        f"на обновление (пересечено {crossed})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк сессий: команды в секунду при входе на каждую команду
+и при повторном использовании токена сессии
+
+Запуск: python -m benchmarks.bench_sessions --users 1000 --commands 200
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import tempfile
+import time
+
+from src.valutatrade_hub.core import usecases, utils
+from src.valutatrade_hub.core.sessions import SessionManager
+from src.valutatrade_hub.infra.database import DatabaseManager
+from src.valutatrade_hub.infra.settings import app_config
+
+PASSWORD = "password"
+
+
+def prepare_data(db: DatabaseManager, users_count: int):
+    """Создает пользователей, портфели и курсы напрямую, минуя register"""
+    hash_params = app_config.get("PASSWORD_HASHING")
+    base_currency = app_config.get("BASE_CURRENCY")
+    users, portfolios = [], []
+
+    # Хеш считается один раз: пароли одинаковые, соль общая
+    salt = utils.generate_salt()
+    password_hash = utils.hashed_password(PASSWORD, salt, hash_params)
+
+    for user_id in range(1, users_count + 1):
+        users.append(
+            utils.create_user(user_id, f"user{user_id}", password_hash, salt)
+        )
+        portfolios.append(utils.create_portfolio(user_id, base_currency))
+
+    db.save(app_config.get("USERS_FILE"), users)
+    db.save(app_config.get("PORTFOLIOS_FILE"), portfolios)
+    db.save(app_config.get("RATES_FILE"), {"pairs": {}})
+
+
+def run_commands(label: str, commands: int, command) -> float:
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(commands):
+            command()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {commands / elapsed:.1f} команд/с")
+    return commands / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--commands", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.getLogger("domain_actions").disabled = True
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        db = DatabaseManager(data_dir)
+        prepare_data(db, args.users)
+        username = f"user{args.users}"
+
+        sessions = SessionManager(
+            db, app_config.get("SESSIONS_FILE"), app_config.get("USERS_FILE")
+        )
+
+        def command_with_login():
+            user = usecases.login(username, PASSWORD, db)
+            usecases.show_portfolio(user, db)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            token = sessions.create(usecases.login(username, PASSWORD, db))
+
+        def command_with_session():
+            usecases.show_portfolio(sessions.get(token), db)
+
+        login_rate = run_commands(
+            "Вход на каждую команду", args.commands, command_with_login
+        )
+        session_rate = run_commands(
+            "Токен сессии", args.commands, command_with_session
+        )
+        print(f"Ускорение: x{session_rate / login_rate:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк времени запуска CLI
+
+Запускает интерпретатор с -X importtime и суммирует время импорта
+src.main, выводит самые дорогие модули и полное время команды
+help + exit. Завершается с ошибкой, если медиана импорта превышает бюджет.
+
+Запуск: python -m benchmarks.bench_startup --runs 10 --budget-ms 80
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times() -> dict[str, tuple[int, int]]:
+    """
+    Модуль -> (собственное, суммарное) время импорта в мкс
+
+    Учитываются только модули, импортированные ради src.main: -X importtime
+    выводит дерево в порядке завершения импорта, поэтому это строки после
+    предыдущего модуля верхнего уровня (site и т.п.).
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # заголовок
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+        # Модуль верхнего уровня закрывает свое поддерево
+        if module.startswith(" ") and not module.startswith("  "):
+            if module.strip() != "src.main":
+                times = {}
+            else:
+                break
+    return times
+
+
+def one_shot_seconds() -> float:
+    """Полное время процесса для команд help и exit"""
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "src.main"],
+        cwd=ROOT,
+        input="help\nexit\n",
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=80.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # Первый запуск прогревает .pyc и файловый кеш
+    import_times()
+
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [run["src.main"][1] / 1000 for run in runs]
+    one_shot = [one_shot_seconds() * 1000 for _ in range(args.runs)]
+
+    own_modules = {
+        module: statistics.median(run.get(module, (0, 0))[0] for run in runs)
+        for module in runs[-1]
+    }
+    print(f"Самые дорогие модули (собственное время, медиана из {args.runs}):")
+    for module, self_us in sorted(own_modules.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"  {self_us / 1000:8.2f} мс  {module}")
+
+    median = statistics.median(totals)
+    print(f"Импорт src.main: медиана {median:.1f} мс, минимум {min(totals):.1f} мс")
+    print(f"help + exit: медиана {statistics.median(one_shot):.1f} мс")
+
+    if median > args.budget_ms:
+        print(f"Бюджет {args.budget_ms:.0f} мс превышен")
+        sys.exit(1)
+    print(f"В пределах бюджета {args.budget_ms:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
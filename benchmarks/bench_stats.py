@@ -0,0 +1,59 @@
+"""
+Бенчмарк накладных расходов статистики задержек
+
+Сравнивает прямой вызов функции с вызовом через timed_phase и
+begin/end замера при выключенной и включенной статистике.
+
+Запуск: python -m benchmarks.bench_stats --calls 1000000
+"""
+
+import argparse
+import time
+
+from src.valutatrade_hub.infra import stats
+
+
+def _noop():
+    return None
+
+
+def measure(label: str, calls: int, call) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        call()
+    per_call = (time.perf_counter_ns() - started) / calls
+    print(f"{label}: {per_call:.0f} нс/вызов")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    registry = stats.registry
+    phase = stats.timed_phase(stats.PHASE_DB_LOAD)(_noop)
+
+    def action():
+        span = registry.begin("BENCH")
+        phase()
+        registry.end(span)
+
+    baseline = measure("Прямой вызов", args.calls, _noop)
+
+    registry.enabled = False
+    disabled = measure("Выключено: фаза", args.calls, phase)
+    disabled_action = measure("Выключено: операция с фазой", args.calls, action)
+
+    registry.enabled = True
+    measure("Включено: операция с фазой", args.calls, action)
+
+    print(
+        f"Накладные расходы при выключенной статистике: "
+        f"{disabled - baseline:.0f} нс на фазу, "
+        f"{disabled_action - baseline:.0f} нс на операцию"
+    )
+
+
+if __name__ == "__main__":
+    main()
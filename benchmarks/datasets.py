@@ -0,0 +1,119 @@
+"""
+Генерация наборов данных для бенчмарков
+
+Файлы пишутся потоково, по одной записи, поэтому память не зависит от
+размера набора.
+"""
+
+import json
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+
+from src.valutatrade_hub.core import utils
+from src.valutatrade_hub.infra.settings import app_config
+
+PASSWORD = "password"
+CRYPTO_PRICES = {"BTC": 60000.0, "ETH": 3000.0}
+FIAT_PRICES = {"EUR": 1.08, "RUB": 0.011}
+
+
+def _write_json_array(path: str, items):
+    """Пишет JSON-массив потоково"""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[")
+        for index, item in enumerate(items):
+            if index:
+                file.write(",")
+            file.write(json.dumps(item, ensure_ascii=False))
+        file.write("]")
+
+
+def current_pairs() -> dict:
+    """Свежие курсы в формате rates.json"""
+    updated_at = datetime.now().isoformat()
+    return {
+        f"{code}_{app_config.get('BASE_CURRENCY')}": {
+            "rate": rate,
+            "source": "Benchmark",
+            "updated_at": updated_at,
+        }
+        for code, rate in {**CRYPTO_PRICES, **FIAT_PRICES}.items()
+    }
+
+
+def write_history(path: str, ticks: int, seed: int = 42):
+    """История курсов: случайное блуждание по парам с шагом в минуту"""
+    rnd = random.Random(seed)
+    prices = {**CRYPTO_PRICES, **FIAT_PRICES}
+    codes = list(prices)
+    base = app_config.get("BASE_CURRENCY")
+    start = datetime.now() - timedelta(minutes=ticks // len(codes) + 1)
+
+    def items():
+        for index in range(ticks):
+            code = codes[index % len(codes)]
+            prices[code] *= 1 + rnd.gauss(0, 0.001)
+            timestamp = (start + timedelta(minutes=index // len(codes))).isoformat()
+            yield {
+                "id": f"{code}_{base}_{timestamp}",
+                "from_currency": code,
+                "to_currency": base,
+                "rate": prices[code],
+                "timestamp": timestamp,
+                "source": "Benchmark",
+            }
+
+    _write_json_array(path, items())
+
+
+def write_dataset(data_dir: str, users: int, history_path: str | None = None):
+    """
+    Создает набор данных в формате приложения
+
+    Все пользователи получают пароль PASSWORD (хеш считается один раз),
+    баланс в базовой валюте и немного BTC.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    base = app_config.get("BASE_CURRENCY")
+    salt = utils.generate_salt()
+    password_hash = utils.hashed_password(
+        PASSWORD, salt, app_config.get("PASSWORD_HASHING")
+    )
+    registration_date = datetime.now().isoformat()
+
+    _write_json_array(
+        os.path.join(data_dir, app_config.get("USERS_FILE")),
+        (
+            {
+                "user_id": user_id,
+                "username": f"user{user_id}",
+                "hashed_password": password_hash,
+                "salt": salt,
+                "registration_date": registration_date,
+            }
+            for user_id in range(1, users + 1)
+        ),
+    )
+    _write_json_array(
+        os.path.join(data_dir, app_config.get("PORTFOLIOS_FILE")),
+        (
+            {"user_id": user_id, "wallets": {base: 1_000_000.0, "BTC": 10.0}}
+            for user_id in range(1, users + 1)
+        ),
+    )
+
+    with open(
+        os.path.join(data_dir, app_config.get("RATES_FILE")), "w", encoding="utf-8"
+    ) as file:
+        json.dump(
+            {"pairs": current_pairs(), "last_refresh": datetime.now().isoformat()},
+            file,
+        )
+
+    if history_path:
+        # Копия, а не ссылка: update_rates перезаписывает файл истории
+        shutil.copyfile(
+            history_path, os.path.join(data_dir, app_config.get("HISTORY_FILE"))
+        )
@@ -0,0 +1,316 @@
+"""
+Набор бенчмарков для всех сценариев core/usecases.py
+
+Для каждого размера набора данных генерируются пользователи, портфели и
+история курсов; каждый сценарий запускается в отдельном процессе, чтобы
+пиковый RSS относился только к нему. Вызовы провайдеров курсов заменены
+заглушками.
+
+Запуск: python -m benchmarks.suite --users 1000,100000,1000000 --ticks 10000000
+Сравнение: python -m benchmarks.suite --compare benchmarks/results/<file>.json
+Память: python -m benchmarks.suite --memory - пик и остаток памяти под
+tracemalloc; запуск завершается с ошибкой при превышении бюджета
+MEMORY_PROFILING.budgets_mb
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import datasets
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+SCENARIOS = (
+    "register",
+    "login",
+    "show_portfolio",
+    "buy",
+    "sell",
+    "update_rates",
+    "get_rate",
+    "show_rates",
+    "place_order",
+    "show_orders",
+    "pnl",
+    "portfolio_history",
+    "export",
+)
+
+
+class StubClient:
+    """Заглушка провайдера курсов"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def fetch_rates(self):
+        return {key: value["rate"] for key, value in datasets.current_pairs().items()}
+
+
+def _scenarios(usecases, models, db, users: int) -> dict:
+    """Сценарии: имя -> функция одного вызова (аргумент - номер итерации)"""
+    from src.valutatrade_hub.infra.settings import app_config
+
+    # Последний пользователь - худший случай для линейных поисков
+    user = models.User.from_record(
+        next(
+            record
+            for record in db.load(app_config.get("USERS_FILE"))
+            if record["user_id"] == users
+        )
+    )
+    since = (datetime.now() - timedelta(days=1)).isoformat()
+
+    return {
+        "register": lambda i: usecases.register(
+            f"bench{os.getpid()}_{i}", datasets.PASSWORD, db
+        ),
+        "login": lambda i: usecases.login(user.username, datasets.PASSWORD, db),
+        "show_portfolio": lambda i: usecases.show_portfolio(user, db),
+        "buy": lambda i: usecases.buy(user, "BTC", 0.001, db),
+        "sell": lambda i: usecases.sell(user, "BTC", 0.001, db),
+        "update_rates": lambda i: usecases.update_rates(None, db),
+        "get_rate": lambda i: usecases.get_rate_action("BTC", "USD", db),
+        "show_rates": lambda i: usecases.show_rates(None, 3, None, db),
+        "place_order": lambda i: usecases.place_order(
+            user, "buy", "BTC", 0.001, 1.0, db
+        ),
+        "show_orders": lambda i: usecases.show_orders(user, db),
+        "pnl": lambda i: usecases.show_pnl(user, db),
+        "portfolio_history": lambda i: usecases.show_portfolio_history(
+            user, since, "1h", None, db
+        ),
+        "export": lambda i: usecases.export_data(
+            None, None, os.path.join(db.data_dir, "export"),
+            None, None, None, None, None, db,
+        ),
+    }
+
+
+def run_scenario(
+    data_dir: str, users: int, name: str, iterations: int, memory: bool = False
+) -> dict:
+    """
+    Выполняет сценарий в текущем (отдельном) процессе
+
+    Сценарии обернуты в error_handler и не бросают исключений, поэтому
+    каждый вызов идет в своем RequestContext, а ошибки из ctx.errors
+    попадают в результат.
+    """
+    latencies = []
+    errors: list[Exception] = []
+    usage = None
+
+    with open(os.devnull, "w") as devnull:
+        # Импорт внутри перенаправления: консольный обработчик логов
+        # запоминает поток при создании
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            from src.valutatrade_hub.core import models, usecases
+            from src.valutatrade_hub.core.context import RequestContext
+            from src.valutatrade_hub.infra.database import DatabaseManager
+            from src.valutatrade_hub.parser_service import api_client
+
+            api_client.CoinGeckoClient = StubClient
+            api_client.ExchangeRateApiClient = StubClient
+
+            db = DatabaseManager(data_dir)
+            call = _scenarios(usecases, models, db, users)[name]
+
+            started = time.perf_counter()
+            for i in range(iterations):
+                with RequestContext(db).activate() as ctx:
+                    call_started = time.perf_counter()
+                    call(i)
+                    latencies.append(time.perf_counter() - call_started)
+                errors.extend(ctx.errors)
+            total = time.perf_counter() - started
+
+            if memory:
+                # Отдельный вызов под tracemalloc, чтобы замер памяти
+                # не искажал задержки
+                from src.valutatrade_hub.infra.memory import MemoryProfiler
+                from src.valutatrade_hub.infra.settings import app_config
+
+                settings = app_config.get("MEMORY_PROFILING")
+                profiler = MemoryProfiler(
+                    top=settings["top"],
+                    frames=settings["frames"],
+                    budgets=settings["budgets_mb"],
+                )
+                with RequestContext(db).activate() as ctx:
+                    with profiler.measure(name) as usage:
+                        call(iterations)
+                errors.extend(ctx.errors)
+
+    latencies.sort()
+    result = {
+        "usecase": name,
+        "iterations": iterations,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "throughput_per_s": iterations / total if total else 0.0,
+        # ru_maxrss в Linux - в килобайтах
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if errors:
+        result["errors"] = len(errors)
+        result["error"] = f"{type(errors[0]).__name__}: {errors[0]}"
+    if usage is not None:
+        result["memory"] = usage.to_record()
+        result["over_budget"] = usage.over_budget
+    return result
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """Перцентиль по методу ближайшего ранга (values отсортирован)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def _run_isolated(
+    data_dir: str, users: int, name: str, iterations: int, memory: bool
+) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as pool:
+        return pool.submit(
+            run_scenario, data_dir, users, name, iterations, memory
+        ).result()
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Ищет сценарии, у которых p50 или p99 выросли больше порога"""
+    previous = {
+        (item["dataset"], item["usecase"]): item for item in baseline["results"]
+    }
+    regressions = []
+    for item in current["results"]:
+        if item.get("errors"):
+            continue
+        before = previous.get((item["dataset"], item["usecase"]))
+        if not before:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if before[metric] and item[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f"{item['dataset']} {item['usecase']}: {metric} "
+                    f"{before[metric]:.2f} → {item[metric]:.2f}"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", default="1000,100000,1000000")
+    parser.add_argument("--ticks", type=int, default=10_000_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--usecases", default="", help="через запятую")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="JSON прошлого запуска")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--memory", action="store_true", help="замер tracemalloc")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.users.split(",") if size]
+    selected = [name for name in args.usecases.split(",") if name]
+    report = {
+        "started_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "ticks": args.ticks,
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        history_path = os.path.join(workdir, "history.json")
+        print(f"Генерация истории курсов: {args.ticks} тиков...")
+        datasets.write_history(history_path, args.ticks)
+
+        for users in sizes:
+            dataset = f"users={users}"
+            data_dir = os.path.join(workdir, dataset)
+            print(f"Генерация набора {dataset}...")
+            datasets.write_dataset(data_dir, users, history_path)
+
+            for name in selected or SCENARIOS:
+                result = _run_isolated(
+                    data_dir, users, name, args.iterations, args.memory
+                )
+                result["dataset"] = dataset
+                report["results"].append(result)
+                print(
+                    f"  {name:<18} p50={result['p50_ms']:9.2f} мс "
+                    f"p99={result['p99_ms']:9.2f} мс "
+                    f"{result['throughput_per_s']:9.1f} оп/с "
+                    f"RSS={result['peak_rss_mb']:8.1f} МБ"
+                )
+                if "errors" in result:
+                    print(
+                        f"  {'':<18} ОШИБКИ: {result['errors']} из "
+                        f"{args.iterations}, первая - {result['error']}"
+                    )
+                if "memory" in result:
+                    usage = result["memory"]
+                    budget = usage["budget_mb"]
+                    print(
+                        f"  {'':<18} пик={usage['peak_mb']:9.2f} МБ "
+                        f"остаток={usage['retained_mb']:9.2f} МБ"
+                        + (f" бюджет={budget} МБ" if budget is not None else "")
+                        + (" ПРЕВЫШЕН" if result["over_budget"] else "")
+                    )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {output}")
+
+    failed = [
+        f"{item['dataset']} {item['usecase']}: {item['error']}"
+        for item in report["results"]
+        if item.get("errors")
+    ]
+    if failed:
+        print("Сценарии завершились с ошибками:")
+        for line in failed:
+            print(f"- {line}")
+        sys.exit(1)
+
+    over_budget = [
+        f"{item['dataset']} {item['usecase']}: {item['memory']['peak_mb']:.2f} МБ "
+        f"> {item['memory']['budget_mb']} МБ"
+        for item in report["results"]
+        if item.get("over_budget")
+    ]
+    if over_budget:
+        print("Превышен бюджет памяти:")
+        for line in over_budget:
+            print(f"- {line}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.threshold)
+        if regressions:
+            print("Регрессии:")
+            for line in regressions:
+                print(f"- {line}")
+            sys.exit(1)
+        print("Регрессий не обнаружено")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
-from src.valutatrade_hub.cli.interface import run
+import sys
+
+from src.valutatrade_hub.cli.interface import run, run_script
 
 
 def main():
-    run()
+    argv = sys.argv[1:]
+
+    # --script <файл>: пакетный режим; без файла или "-" - команды из stdin
+    if "--script" in argv:
+        index = argv.index("--script") + 1
+        path = (
+            argv[index]
+            if index < len(argv) and not argv[index].startswith("--")
+            else "-"
+        )
+        sys.exit(1 if run_script(path) else 0)
+
+    # --profile: профилировать команды всей сессии,
+    # --memprofile: замерять память команд всей сессии
+    run(
+        profile="--profile" in sys.argv[1:],
+        memprofile="--memprofile" in sys.argv[1:],
+    )
 
 if __name__ == "__main__":
     main()
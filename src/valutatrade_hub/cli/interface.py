@@ -1,5 +1,10 @@
+import contextlib
+import io
+import json
 import os
 import shlex
+import sys
+import time
 
 import prompt  # type: ignore
 
@@ -7,26 +12,111 @@ import src.valutatrade_hub.const as const
 import src.valutatrade_hub.core.usecases as usecases
 import src.valutatrade_hub.core.utils as utils
 from src.valutatrade_hub.core import models
+from src.valutatrade_hub.core.context import RequestContext
+from src.valutatrade_hub.core.sessions import SessionManager
+from src.valutatrade_hub.infra import metrics, stats
 from src.valutatrade_hub.infra.database import DatabaseManager
+from src.valutatrade_hub.infra.memory import MemoryProfiler
+from src.valutatrade_hub.infra.profiler import CommandProfiler
 from src.valutatrade_hub.infra.settings import app_config
 
-data_file_path = os.path.abspath(app_config.get("DATA_FILE"))
-db = DatabaseManager(data_file_path)
 
+class CliRuntime:
+    """База данных, сессии и профилировщики CLI, настроенные по config.json"""
 
-def run():
-    """Запуск интерфейса командной строки"""
-    is_active = True
-    user: models.User | None = None
+    __slots__ = ("data_file_path", "db", "sessions", "profiler", "memory_profiler")
 
-    utils.welcome()
+    def __init__(self):
+        self.data_file_path = os.path.abspath(app_config.get("DATA_FILE"))
+        self.db = DatabaseManager(self.data_file_path)
+        self.sessions = SessionManager(
+            self.db,
+            app_config.get("SESSIONS_FILE"),
+            app_config.get("USERS_FILE"),
+            ttl_seconds=app_config.get("SESSION_TTL_SECONDS"),
+            max_size=app_config.get("SESSION_CACHE_SIZE"),
+        )
+        stats.registry.enabled = app_config.get("STATS_ENABLED")
+        self.profiler = CommandProfiler(
+            app_config.get("PROFILING")["dir"],
+            sample_rate=app_config.get("PROFILING")["sample_rate"],
+            top=app_config.get("PROFILING")["top"],
+        )
+        self.memory_profiler = MemoryProfiler(
+            top=app_config.get("MEMORY_PROFILING")["top"],
+            frames=app_config.get("MEMORY_PROFILING")["frames"],
+            budgets=app_config.get("MEMORY_PROFILING")["budgets_mb"],
+        )
+
+
+_runtime: CliRuntime | None = None
+
+
+def get_runtime() -> CliRuntime:
+    """Окружение CLI; config.json читается при первом обращении"""
+    global _runtime
+    if _runtime is None:
+        _runtime = CliRuntime()
+    return _runtime
+
+
+def __getattr__(name: str):
+    # db, sessions и профилировщики создаются лениво: импорт модуля
+    # не читает config.json
+    if name in CliRuntime.__slots__:
+        return getattr(get_runtime(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CliState:
+    """Состояние CLI между командами"""
+
+    __slots__ = ("user", "token", "is_active")
+
+    def __init__(self):
+        self.user: models.User | None = None
+        self.token: str | None = None
+        self.is_active = True
+
+
+def execute(user_input: str, state: CliState) -> RequestContext | None:
+    """
+    Разбирает и выполняет одну команду
+
+    Returns:
+        Контекст команды (ошибки сценария - в ctx.errors) или None для
+        пустой строки
+    """
+    args = shlex.split(user_input)
+    if not args:
+        return None
+    command = args[0]
+    command_args = utils.parse_args(args) or {}
 
-    while is_active:
-        user_input = prompt.string(">>> ")
-        args = shlex.split(user_input)
-        command = args[0]
-        command_args = utils.parse_args(args) or {}
+    runtime = get_runtime()
+    db = runtime.db
 
+    # Контекст команды: каждый файл читается не больше одного раза
+    ctx = RequestContext(db, state.user)
+
+    # Команда с токеном выполняется в его сессии без повторного входа
+    if command_args.get(const.KEY_WORD_TOKEN):
+        session_user = runtime.sessions.get(command_args[const.KEY_WORD_TOKEN])
+        if session_user is None:
+            ctx.fail("Сессия недействительна или истекла, выполните login")
+            return ctx
+        state.user = session_user
+        state.token = command_args[const.KEY_WORD_TOKEN]
+        ctx.user = state.user
+
+    # Профилирование: все команды (с выборкой) или одна с --profile
+    with (
+        ctx.activate(),
+        runtime.profiler.profile(command, force=const.KEY_WORD_PROFILE in command_args),
+        runtime.memory_profiler.profile(
+            command, force=const.KEY_WORD_MEMPROFILE in command_args
+        ),
+    ):
         match (command):
             case const.CMD_REGISTER:
                 usecases.register(
@@ -34,33 +124,54 @@ def run():
                     command_args.get(const.KEY_WORD_PASSWORD),
                     db,
                 )
+            case const.CMD_BULK_REGISTER:
+                usecases.bulk_register(command_args.get(const.KEY_WORD_FILE), db)
             case const.CMD_LOGIN:
-                user = usecases.login(
+                state.user = usecases.login(
                     command_args.get(const.KEY_WORD_USERNAME),
                     command_args.get(const.KEY_WORD_PASSWORD),
                     db,
                 )
+                if state.user:
+                    state.token = usecases.start_session(state.user, runtime.sessions)
+            case const.CMD_LOGOUT:
+                usecases.logout(state.token, runtime.sessions)
+                state.user, state.token = None, None
             case const.CMD_SHOW_PORTFOLIO:
                 base_currency = command_args.get(const.KEY_WORD_BASE)
                 if base_currency:
-                    usecases.show_portfolio(
-                        user, db, base_currency
-                    )
+                    usecases.show_portfolio(state.user, db, base_currency, ctx=ctx)
                 else:
-                    usecases.show_portfolio(user, db)
+                    usecases.show_portfolio(state.user, db, ctx=ctx)
+            case const.CMD_PNL:
+                base_currency = command_args.get(const.KEY_WORD_BASE)
+                if base_currency:
+                    usecases.show_pnl(state.user, db, base_currency, ctx=ctx)
+                else:
+                    usecases.show_pnl(state.user, db, ctx=ctx)
+            case const.CMD_PORTFOLIO_HISTORY:
+                usecases.show_portfolio_history(
+                    state.user,
+                    command_args.get(const.KEY_WORD_SINCE),
+                    command_args.get(const.KEY_WORD_INTERVAL),
+                    command_args.get(const.KEY_WORD_BASE),
+                    db,
+                )
             case const.CMD_BUY:
                 usecases.buy(
-                    user,
+                    state.user,
                     command_args.get(const.KEY_WORD_CURRENCY),
                     float(command_args.get(const.KEY_WORD_AMOUNT) or 0),
                     db,
+                    ctx=ctx,
                 )
             case const.CMD_SELL:
                 usecases.sell(
-                    user,
+                    state.user,
                     command_args.get(const.KEY_WORD_CURRENCY),
                     float(command_args.get(const.KEY_WORD_AMOUNT) or 0),
                     db,
+                    ctx=ctx,
                 )
             case const.CMD_GET_RATE:
                 usecases.get_rate_action(
@@ -69,17 +180,196 @@ def run():
                     db,
                 )
             case const.CMD_UPDATE_RATES:
-                usecases.update_rates(command_args.get(const.KEY_WORD_SOURCE), db=db)   
+                usecases.update_rates(
+                    command_args.get(const.KEY_WORD_SOURCE), db=db
+                )
             case const.CMD_SHOW_RATES:
                 usecases.show_rates(command_args.get(const.KEY_WORD_CURRENCY), 
                                     int(command_args.get(const.KEY_WORD_TOP) or 0), 
-                                    command_args.get(const.KEY_WORD_BASE), db=db)
-                
+                                    command_args.get(const.KEY_WORD_BASE), db=db,
+                                    page=int(command_args.get(const.KEY_WORD_PAGE) or 0) or None, # noqa E501
+                                    page_size=int(command_args.get(const.KEY_WORD_PAGE_SIZE) or 0) or None) # noqa E501
+            case const.CMD_PLACE_ORDER:
+                usecases.place_order(
+                    state.user,
+                    command_args.get(const.KEY_WORD_SIDE),
+                    command_args.get(const.KEY_WORD_CURRENCY),
+                    float(command_args.get(const.KEY_WORD_AMOUNT) or 0),
+                    float(command_args.get(const.KEY_WORD_PRICE) or 0),
+                    db,
+                )
+            case const.CMD_ORDERS:
+                usecases.show_orders(state.user, db)
+            case const.CMD_CANCEL_ORDER:
+                usecases.cancel_order(
+                    state.user, int(command_args.get(const.KEY_WORD_ID) or 0), db
+                )
+
+            case const.CMD_STATS:
+                usecases.show_stats()
+            case const.CMD_LOG_REPORT:
+                usecases.show_log_report(
+                    command_args.get(const.KEY_WORD_SINCE),
+                    command_args.get(const.KEY_WORD_UNTIL),
+                    command_args.get(const.KEY_WORD_TOP),
+                )
+            case const.CMD_COMPACT_HISTORY:
+                usecases.compact_history(db)
+            case const.CMD_RATE_STATS:
+                usecases.show_rate_stats(
+                    command_args.get(const.KEY_WORD_PAIR),
+                    command_args.get(const.KEY_WORD_WINDOW),
+                    const.KEY_WORD_REBUILD in command_args,
+                    db,
+                )
+            case const.CMD_EXPORT:
+                usecases.export_data(
+                    command_args.get(const.KEY_WORD_DATASETS),
+                    command_args.get(const.KEY_WORD_FORMAT),
+                    command_args.get(const.KEY_WORD_OUT),
+                    command_args.get(const.KEY_WORD_USERS),
+                    command_args.get(const.KEY_WORD_PAIR),
+                    command_args.get(const.KEY_WORD_SINCE),
+                    command_args.get(const.KEY_WORD_UNTIL),
+                    command_args.get(const.KEY_WORD_SHARDS),
+                    db=db,
+                )
+            case const.CMD_PROFILE:
+                usecases.set_profiling(
+                    runtime.profiler, args[1] if len(args) > 1 else None
+                )
+            case const.CMD_MEMPROFILE:
+                usecases.set_memory_profiling(
+                    runtime.memory_profiler, args[1] if len(args) > 1 else None
+                )
+
             case const.CMD_HELP:
                 usecases.help()    
             case const.CMD_EXIT:
-                is_active = usecases.exit()
-                continue
+                state.is_active = usecases.exit()
             case _:
-                print(f"Неизвестная команда {command}")
+                ctx.fail(f"Неизвестная команда {command}")
+
+    return ctx
+
+
+@contextlib.contextmanager
+def _saving_stats(db):
+    """Сохраняет гистограммы при любом выходе: exit, EOF, Ctrl-C, ошибка"""
+    try:
+        yield
+    finally:
+        usecases.save_stats(db)
+
+
+def run(profile: bool = False, memprofile: bool = False):
+    """
+    Запуск интерфейса командной строки
+
+    Args:
+        profile: профилировать команды (доля - PROFILING.sample_rate)
+        memprofile: замерять память команд через tracemalloc
+    """
+    runtime = get_runtime()
+    runtime.profiler.enabled = profile
+    runtime.memory_profiler.enabled = memprofile
+    metrics_settings = app_config.get("METRICS")
+    if metrics_settings.get("http_port"):
+        metrics.registry.serve(
+            metrics_settings["http_port"], metrics_settings.get("http_host")
+        )
+    state = CliState()
+
+    utils.welcome()
+
+    with _saving_stats(runtime.db):
+        while state.is_active:
+            execute(prompt.string(">>> "), state)
+
+            # Файл метрик обновляется после каждой команды
+            usecases.save_metrics()
+
+
+def run_script(path: str = "-") -> int:
+    """
+    Пакетный режим: команды из файла или stdin ("-"), по одной на строку
+
+    Вход пользователя сохраняется между строками, пустые строки и
+    комментарии (#) пропускаются. Для каждой команды в stdout выводится
+    строка JSON с результатом и выводом команды. Данные читаются один раз
+    и записываются на диск в конце сценария; изменения команды, завершившейся
+    ошибкой, отменяются.
+
+    Returns:
+        Количество команд, завершившихся ошибкой
+    """
+    state = CliState()
+    executed = failed = 0
+    started = time.perf_counter()
+
+    source = (
+        contextlib.nullcontext(sys.stdin)
+        if path == "-"
+        else open(path, encoding="utf-8")
+    )
+    db = get_runtime().db
+    # Статистика записывается после сброса буфера данных
+    with _saving_stats(db), source as lines, db.buffered():
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
                 continue
+
+            captured = io.StringIO()
+            command_started = time.perf_counter()
+            db.savepoint()
+            with contextlib.redirect_stdout(captured):
+                try:
+                    ctx = execute(line, state)
+                    errors = ctx.errors if ctx is not None else []
+                except ValueError as e:
+                    # Ошибка разбора строки, например незакрытая кавычка
+                    print(f"Ошибка разбора команды: {e}")
+                    ctx, errors = None, [e]
+                except BaseException:
+                    # Прерванная команда не попадает в запись при выходе
+                    db.rollback()
+                    raise
+            # Команда с ошибкой не оставляет изменений в буфере
+            if errors:
+                db.rollback()
+            else:
+                db.release()
+
+            result = {
+                "line": number,
+                "command": line.split(maxsplit=1)[0],
+                "ok": not errors,
+                "output": captured.getvalue().rstrip("\n"),
+                "duration_ms": round((time.perf_counter() - command_started) * 1000, 3),
+            }
+            if ctx is not None and ctx.snapshot_id is not None:
+                # Снимок курсов, по которому выполнена команда
+                result["snapshot_id"] = ctx.snapshot_id
+            if errors:
+                # Последней перехватывается ошибка самого внешнего сценария
+                result["error"] = {
+                    "type": type(errors[-1]).__name__,
+                    "message": str(errors[-1]),
+                }
+                failed += 1
+            executed += 1
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+            if not state.is_active:
+                break
+
+    usecases.save_metrics()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Выполнено команд: {executed}, ошибок: {failed}, "
+        f"{elapsed:.2f} с ({executed / elapsed if elapsed else 0:.0f} ком/с)",
+        file=sys.stderr,
+    )
+    return failed
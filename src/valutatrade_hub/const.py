@@ -1,6 +1,7 @@
 CMD_EXIT = "exit"
 CMD_REGISTER = "register"
 CMD_LOGIN = "login"
+CMD_LOGOUT = "logout"
 CMD_SHOW_PORTFOLIO = "show-portfolio"
 CMD_BUY = "buy"
 CMD_SELL = "sell"
@@ -8,6 +9,19 @@ CMD_GET_RATE = "get-rate"
 CMD_UPDATE_RATES = "update-rates"
 CMD_SHOW_RATES = "show-rates"
 CMD_HELP = "help"
+CMD_PLACE_ORDER = "place-order"
+CMD_ORDERS = "orders"
+CMD_CANCEL_ORDER = "cancel-order"
+CMD_PNL = "pnl"
+CMD_PORTFOLIO_HISTORY = "portfolio-history"
+CMD_STATS = "stats"
+CMD_PROFILE = "profile"
+CMD_LOG_REPORT = "log-report"
+CMD_MEMPROFILE = "memprofile"
+CMD_EXPORT = "export"
+CMD_BULK_REGISTER = "bulk-register"
+CMD_RATE_STATS = "rate-stats"
+CMD_COMPACT_HISTORY = "compact-history"
 
 
 MIN_PASSWORD_LENGTH = 4
@@ -15,6 +29,7 @@ MIN_PASSWORD_LENGTH = 4
 
 KEY_WORD_USERNAME = "username"
 KEY_WORD_PASSWORD = "password"
+KEY_WORD_TOKEN = "token"
 KEY_WORD_BASE = "base"
 KEY_WORD_CURRENCY = "currency"
 KEY_WORD_AMOUNT = "amount"
@@ -22,17 +37,34 @@ KEY_WORD_FROM = "from"
 KEY_WORD_TO = "to"
 KEY_WORD_SOURCE = 'source'
 KEY_WORD_TOP = 'top'
+KEY_WORD_SIDE = "side"
+KEY_WORD_PRICE = "price"
+KEY_WORD_ID = "id"
+KEY_WORD_SINCE = "since"
+KEY_WORD_INTERVAL = "interval"
+KEY_WORD_PROFILE = "profile"
+KEY_WORD_UNTIL = "until"
+KEY_WORD_MEMPROFILE = "memprofile"
+KEY_WORD_PAGE = "page"
+KEY_WORD_PAGE_SIZE = "page-size"
+KEY_WORD_DATASETS = "datasets"
+KEY_WORD_FORMAT = "format"
+KEY_WORD_OUT = "out"
+KEY_WORD_USERS = "users"
+KEY_WORD_PAIR = "pair"
+KEY_WORD_SHARDS = "shards"
+KEY_WORD_FILE = "file"
+KEY_WORD_WINDOW = "window"
+KEY_WORD_REBUILD = "rebuild"
 
-CURRENCY = (
-    "USD",
-    "EUR",
-    "RUB",
-    "BTC",
-    "ETH",
-)
+SIDE_BUY = "buy"
+SIDE_SELL = "sell"
 
 LOG_ACTION_LOGIN = "LOGIN"
 LOG_ACTION_REGISTER = "REGISTER"
 LOG_ACTION_BUY = "BUY"
 LOG_ACTION_SELL = "SELL"
 LOG_ACTION_API = "API"
+LOG_ACTION_ORDER = "ORDER"
+LOG_ACTION_FILL = "FILL"
+LOG_ACTION_DROPPED = "LOG_DROPPED"
@@ -0,0 +1,150 @@
+"""
+Массовая регистрация пользователей из CSV
+
+Имена проверяются по множеству уже занятых за O(1), пароли хешируются
+блоками в пуле процессов, каждый блок получает непрерывный диапазон id.
+users.json и portfolios.json читаются и записываются один раз на весь файл.
+"""
+
+import csv
+import time
+
+import src.valutatrade_hub.const as const
+import src.valutatrade_hub.core.utils as utils
+
+
+class BulkResult:
+    """Итог массовой регистрации"""
+
+    __slots__ = ("created", "rejected", "hash_seconds", "total_seconds")
+
+    def __init__(self):
+        self.created = 0
+        # (номер строки, имя пользователя, причина)
+        self.rejected: list[tuple[int, str, str]] = []
+        self.hash_seconds = 0.0
+        self.total_seconds = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Аккаунтов в секунду за все время регистрации"""
+        return self.created / self.total_seconds if self.total_seconds else 0.0
+
+
+def read_accounts(
+    path: str, taken: set[str], result: BulkResult
+) -> list[tuple[str, str]]:
+    """
+    Читает и проверяет CSV с колонками username,password
+
+    Неподходящие строки попадают в result.rejected, имена принятых
+    добавляются в taken, поэтому повторы внутри файла тоже отклоняются.
+    """
+    accounts = []
+    with open(path, encoding="utf-8", newline="") as file:
+        reader = csv.DictReader(file)
+        if not reader.fieldnames or not {"username", "password"} <= set(
+            reader.fieldnames
+        ):
+            raise ValueError("В файле должны быть колонки username и password")
+
+        for row in reader:
+            line = reader.line_num
+            username = (row.get("username") or "").strip()
+            password = row.get("password") or ""
+
+            if not username or not password.strip():
+                result.rejected.append((line, username, "пустое имя или пароль"))
+            elif len(password.strip()) < const.MIN_PASSWORD_LENGTH:
+                result.rejected.append((line, username, "короткий пароль"))
+            elif username in taken:
+                result.rejected.append((line, username, "имя уже занято"))
+            else:
+                taken.add(username)
+                accounts.append((username, password))
+    return accounts
+
+
+def _hash_block(
+    first_id: int, accounts: list[tuple[str, str]], hashing: dict | None
+) -> list[dict]:
+    """Записи пользователей блока с id начиная с first_id"""
+    users = []
+    for user_id, (username, password) in enumerate(accounts, first_id):
+        salt = utils.generate_salt()
+        users.append(
+            utils.create_user(
+                user_id,
+                username,
+                utils.hashed_password(password, salt, hashing),
+                salt,
+            )
+        )
+    return users
+
+
+def bulk_register(
+    db,
+    path: str,
+    users_file: str,
+    portfolios_file: str,
+    base_currency: str,
+    hashing: dict | None,
+    workers: int | None = None,
+    chunk_size: int = 256,
+) -> BulkResult:
+    """
+    Регистрирует пользователей из CSV одной записью файлов
+
+    Args:
+        db: менеджер базы данных
+        path: CSV с колонками username,password
+        users_file, portfolios_file: файлы пользователей и портфелей
+        base_currency: валюта начального кошелька
+        hashing: параметры KDF (PASSWORD_HASHING)
+        workers: количество процессов (по умолчанию - число ядер)
+        chunk_size: пользователей в блоке хеширования
+    """
+    started = time.perf_counter()
+    result = BulkResult()
+
+    users = db.load(users_file) or []
+    taken = {user["username"] for user in users}
+    accounts = read_accounts(path, taken, result)
+
+    # Блоки id выделяются заранее, поэтому процессы не согласуют номера
+    next_id = max((user["user_id"] for user in users), default=0) + 1
+    blocks = [
+        (next_id + start, accounts[start:start + chunk_size])
+        for start in range(0, len(accounts), chunk_size)
+    ]
+
+    hash_started = time.perf_counter()
+    if len(blocks) < 2 or workers == 1:
+        created = [_hash_block(first_id, block, hashing) for first_id, block in blocks]
+    else:
+        # multiprocessing импортируется, только когда блоков больше одного
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(_hash_block, first_id, block, hashing)
+                for first_id, block in blocks
+            ]
+            created = [future.result() for future in futures]
+    result.hash_seconds = time.perf_counter() - hash_started
+
+    if accounts:
+        portfolios = db.load(portfolios_file) or []
+        for block in created:
+            users.extend(block)
+            portfolios.extend(
+                utils.create_portfolio(user["user_id"], base_currency)
+                for user in block
+            )
+        db.save(users_file, users)
+        db.save(portfolios_file, portfolios)
+
+    result.created = len(accounts)
+    result.total_seconds = time.perf_counter() - started
+    return result
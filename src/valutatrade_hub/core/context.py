@@ -0,0 +1,112 @@
+import contextlib
+from contextvars import ContextVar
+from typing import Mapping
+
+from src.valutatrade_hub.core import models, snapshots, utils
+from src.valutatrade_hub.infra.settings import app_config
+
+
+class RequestContext:
+    """
+    Контекст одной команды
+
+    Создается в cli/interface.run на каждую команду и проходит через
+    check_auth, log_action и сценарий. Команда закрепляет один снимок курсов,
+    портфели читаются лениво и не больше одного раза; сценарий записывает сюда
+    фактически использованный курс, который затем попадает в лог.
+    Ошибки, перехваченные error_handler во время команды, собираются
+    в errors.
+    """
+
+    __slots__ = (
+        "db",
+        "user",
+        "rate",
+        "errors",
+        "_snapshot",
+        "_portfolios",
+        "_portfolio",
+    )
+
+    def __init__(self, db, user: models.User | None = None):
+        """
+        Args:
+            db: менеджер базы данных
+            user: текущий пользователь (None до входа)
+        """
+        self.db = db
+        self.user = user
+        self.rate: float | None = None
+        self.errors: list[Exception] = []
+        self._snapshot: snapshots.RateSnapshot | None = None
+        self._portfolios: list[dict] | None = None
+        self._portfolio: models.Portfolio | None = None
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Делает контекст текущим на время выполнения команды"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def fail(self, message: str):
+        """Ошибка команды вне сценария (неизвестная команда, сессия)"""
+        print(message)
+        self.errors.append(ValueError(message))
+
+    @property
+    def snapshot(self) -> snapshots.RateSnapshot:
+        """Снимок курсов, закрепленный за командой при первом обращении"""
+        if self._snapshot is None:
+            self._snapshot = snapshots.current(self.db)
+        return self._snapshot
+
+    @property
+    def snapshot_id(self) -> int | None:
+        """Номер закрепленного снимка (None, если курсы не читались)"""
+        return self._snapshot.id if self._snapshot is not None else None
+
+    @property
+    def pairs(self) -> Mapping[str, Mapping]:
+        """Курсы из снимка"""
+        return self.snapshot.pairs
+
+    @property
+    def portfolios(self) -> list[dict]:
+        """Записи portfolios.json; изменения видны до конца команды"""
+        if self._portfolios is None:
+            self._portfolios = (
+                self.db.load(app_config.get("PORTFOLIOS_FILE")) or []
+            )
+        return self._portfolios
+
+    def portfolio(self) -> models.Portfolio:
+        """Портфель пользователя команды"""
+        if self._portfolio is None:
+            if self.user is None:
+                raise ValueError("Пользователь не задан")
+            self._portfolio = utils.get_user_portfolio(
+                self.portfolios, self.user.user_id, models.Portfolio
+            )
+        return self._portfolio
+
+    def portfolio_record(self) -> dict:
+        """Запись портфеля пользователя в portfolios"""
+        if self.user is None:
+            raise ValueError("Пользователь не задан")
+        for record in self.portfolios:
+            if record.get("user_id") == self.user.user_id:
+                return record
+        raise ValueError("Портфель не найден")
+
+
+_current: ContextVar[RequestContext | None] = ContextVar(
+    "request_context", default=None
+)
+
+
+def current() -> RequestContext | None:
+    """Контекст выполняемой команды"""
+    return _current.get()
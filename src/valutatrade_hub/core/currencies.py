@@ -1,4 +1,7 @@
+import json
+import os
 from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping
 from typing import Dict
 
 from src.valutatrade_hub.core.exceptions import CurrencyNotFoundError
@@ -7,6 +10,8 @@ from src.valutatrade_hub.core.exceptions import CurrencyNotFoundError
 class Currency(ABC):
     """Абстрактный базовый класс для валют"""
 
+    __slots__ = ("name", "code")
+
     def __init__(self, name: str, code: str):
         self._validate_name(name)
         self._validate_code(code)
@@ -38,6 +43,8 @@ class Currency(ABC):
 class FiatCurrency(Currency):
     """Фиатная валюта"""
 
+    __slots__ = ("issuing_country",)
+
     def __init__(self, name: str, code: str, issuing_country: str):
         super().__init__(name, code)
         self._validate_issuing_country(issuing_country)
@@ -57,6 +64,8 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     """Криптовалюта"""
 
+    __slots__ = ("algorithm", "market_cap")
+
     def __init__(self, name: str, code: str, algorithm: str, market_cap: float = 0.0):
         super().__init__(name, code)
         self._validate_algorithm(algorithm)
@@ -91,13 +100,89 @@ class CryptoCurrency(Currency):
         return f"[CRYPTO] {self.code} — {self.name} (Algo: {self.algorithm}, MCAP: {mcap_str})" # noqa E501
 
 
-# Реестр валют
-_currency_registry: Dict[str, Currency] = {}
+# Классы валют по разделам файла реестра
+_KINDS = {"fiat": FiatCurrency, "crypto": CryptoCurrency}
+# Поля строки, которые не передаются в конструктор валюты
+_EXTRA_FIELDS = ("coingecko_id",)
+
+
+class CurrencyRegistry(Mapping):
+    """
+    Реестр валют только для чтения: код -> Currency
+
+    Строки файла хранятся как есть, объект валюты создается при первом
+    обращении к коду и кешируется на месте строки. Поиск по коду - один
+    словарь, перебор кодов не создает объектов валют.
+    """
+
+    def __init__(self, path: str | None = None):
+        """
+        Args:
+            path: JSON-файл реестра (по умолчанию - CURRENCIES_FILE из конфига)
+        """
+        self._path = path
+        self._entries: Dict[str, Currency | tuple] | None = None
+        self._coingecko_ids: Dict[str, str] = {}
+
+    def _load(self) -> Dict[str, Currency | tuple]:
+        """Читает файл реестра при первом обращении"""
+        if self._entries is None:
+            # Импорт здесь: конфиг читается только когда нужен реестр
+            from src.valutatrade_hub.infra.settings import app_config
+
+            path = self._path or app_config.get("CURRENCIES_FILE")
+            with open(os.path.abspath(path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            entries = {}
+            for kind, section in data.items():
+                if kind not in _KINDS:
+                    raise ValueError(f"Неизвестный тип валют '{kind}' в {path}")
+                fields = section["fields"]
+                for row in section["rows"]:
+                    values = dict(zip(fields, row))
+                    code = values["code"].strip().upper()
+                    if values.get("coingecko_id"):
+                        self._coingecko_ids[code] = values["coingecko_id"]
+                    entries[code] = (kind, values)
+            self._entries = entries
+        return self._entries
+
+    def __getitem__(self, code: str) -> Currency:
+        entries = self._load()
+        entry = entries[code]
+        if isinstance(entry, tuple):
+            kind, values = entry
+            kwargs = {k: v for k, v in values.items() if k not in _EXTRA_FIELDS}
+            entry = entries[code] = _KINDS[kind](**kwargs)
+        return entry
+
+    def __contains__(self, code: object) -> bool:
+        return code in self._load()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def register(self, currency: Currency):
+        """Добавляет или заменяет валюту в реестре"""
+        self._load()[currency.code] = currency
+
+    def coingecko_ids(self) -> Dict[str, str]:
+        """Идентификаторы CoinGecko для криптовалют: код -> id"""
+        self._load()
+        return self._coingecko_ids
+
+
+# Реестр валют (файл читается при первом обращении)
+_currency_registry = CurrencyRegistry()
 
 
 def register_currency(currency: Currency):
     """Регистрирует валюту в реестре"""
-    _currency_registry[currency.code] = currency
+    _currency_registry.register(currency)
 
 
 def get_currency(code: str) -> Currency:
@@ -108,32 +193,11 @@ def get_currency(code: str) -> Currency:
     return _currency_registry[code]
 
 
-def get_all_currencies() -> Dict[str, Currency]:
-    """Возвращает все зарегистрированные валюты"""
-    return _currency_registry.copy()
-
-
-# Предзаполнение реестра популярными валютами
-def _initialize_currencies():
-    """Инициализация реестра популярными валютами"""
-
-    # Фиатные валюты
-    fiats = [
-        FiatCurrency("US Dollar", "USD", "United States"),
-        FiatCurrency("Euro", "EUR", "Eurozone"),
-        FiatCurrency("Russian Ruble", "RUB", "Russia"),
-    ]
-
-    # Криптовалюты
-    cryptos = [
-        CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12),
-        CryptoCurrency("Ethereum", "ETH", "Ethash", 4.5e11),
-    ]
-
-    # Регистрация всех валют
-    for currency in fiats + cryptos:
-        register_currency(currency)
+def is_supported(code: str | None) -> bool:
+    """Есть ли валюта с таким кодом в реестре (код в верхнем регистре)"""
+    return code in _currency_registry
 
 
-# Инициализируем реестр при импорте
-_initialize_currencies()
+def get_all_currencies() -> Mapping[str, Currency]:
+    """Возвращает все зарегистрированные валюты (представление без копии)"""
+    return _currency_registry
@@ -0,0 +1,293 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from src.valutatrade_hub.core import models, retention, utils
+from src.valutatrade_hub.infra.settings import app_config
+
+_INTERVAL_RE = re.compile(r"^(\d+)([mhd])$")
+_INTERVAL_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def record_balances(db, changes: dict[int, dict[str, float]]):
+    """
+    Дописывает новые балансы кошельков в журнал
+
+    Журнал хранит балансы после каждой сделки и служит временной шкалой
+    портфеля для portfolio-history.
+
+    Args:
+        db: менеджер базы данных
+        changes: словарь {user_id: {currency: balance}}
+    """
+    timestamp = datetime.now().isoformat()
+    events = [
+        {
+            "user_id": user_id,
+            "timestamp": timestamp,
+            "currency": currency,
+            "balance": balance,
+        }
+        for user_id, balances in changes.items()
+        for currency, balance in balances.items()
+    ]
+
+    # Журнал только растет: новые события дописываются в конец файла
+    db.append_array(app_config.get("LEDGER_FILE"), events)
+
+
+def parse_interval(interval: str) -> int:
+    """Переводит интервал вида 15m/1h/1d в секунды"""
+    match = _INTERVAL_RE.match(interval.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Некорректный интервал '{interval}', пример: 15m, 1h, 1d")
+    return int(match.group(1)) * _INTERVAL_UNITS[match.group(2)]
+
+
+def _align(moment: datetime, step: int) -> datetime:
+    """Округляет момент вверх до границы интервала"""
+    epoch = datetime(1970, 1, 1)
+    seconds = int((moment - epoch).total_seconds())
+    return epoch + timedelta(seconds=-(-seconds // step) * step)
+
+
+def _grid(start: datetime, end: datetime, step: int) -> list[str]:
+    """Границы интервалов в [start, end] в формате ISO"""
+    points = []
+    moment = _align(start, step)
+    while moment <= end:
+        points.append(moment.isoformat())
+        moment += timedelta(seconds=step)
+    return points
+
+
+class _AsOfState:
+    """Балансы и курсы на текущий момент прохода по временной шкале"""
+
+    def __init__(
+        self,
+        balances: dict | None = None,
+        prices: dict | None = None,
+        unknown: set | None = None,
+    ):
+        self.balances: dict[str, float] = balances or {}
+        self.prices: dict[str, float] = prices or {}
+        # Валюты, баланс которых до первого события журнала неизвестен
+        self.unknown: set[str] = unknown or set()
+
+    def value(self, trade_currency: str, base_currency: str) -> float | None:
+        """
+        Стоимость портфеля в base_currency или None, если курса нет или
+        баланс какой-то валюты еще неизвестен
+        """
+        if self.unknown:
+            return None
+
+        prices = self.prices
+        prices[trade_currency] = 1.0
+
+        base_price = prices.get(base_currency)
+        if not base_price:
+            return None
+
+        total = 0.0
+        for currency, balance in self.balances.items():
+            if not balance:
+                continue
+            price = prices.get(currency)
+            if price is None:
+                return None
+            total += balance * price
+
+        return total / base_price
+
+
+def as_of_join(
+    grid: list[str],
+    events: list[dict],
+    ticks: list[dict],
+    state: _AsOfState,
+    trade_currency: str,
+    base_currency: str,
+) -> list[float | None]:
+    """
+    As-of соединение временной шкалы балансов с историей курсов
+
+    Все три последовательности упорядочены по времени, поэтому соединение
+    выполняется за один проход слиянием: на каждой точке сетки к состоянию
+    применяются события и тики с меткой не позже этой точки.
+    """
+    values = []
+    i = j = 0
+
+    for point in grid:
+        while i < len(events) and events[i]["timestamp"] <= point:
+            state.balances[events[i]["currency"]] = events[i]["balance"]
+            state.unknown.discard(events[i]["currency"])
+            i += 1
+        while j < len(ticks) and ticks[j]["timestamp"] <= point:
+            state.prices[ticks[j]["from_currency"]] = ticks[j]["rate"]
+            j += 1
+        values.append(state.value(trade_currency, base_currency))
+
+    return values
+
+
+def portfolio_value_series(
+    db,
+    user_id: int,
+    since: datetime,
+    interval: str,
+    base_currency: str,
+    now: datetime | None = None,
+) -> list[tuple[str, float | None]]:
+    """
+    Стоимость портфеля на границах интервалов начиная с since
+
+    Балансы меняются только сделками, которые пишутся в журнал. Валюты,
+    которых нет в журнале, лежат в портфеле с тех же сумм, что и сейчас;
+    баланс остальных до их первого события неизвестен, и стоимость в таких
+    точках - None.
+
+    Значения в уже закрытых интервалах не меняются (журнал и история
+    только дописываются), поэтому они кешируются вместе с состоянием на
+    конец закрытого участка, и повторный запрос досчитывает только новые
+    интервалы. Точки с неизвестными балансами не кешируются. Пока версии
+    журнала и истории курсов совпадают с записанными в кеше, файлы не
+    читаются: события и тики после участка хранятся в самом кеше.
+    """
+    step = parse_interval(interval)
+    now = now or datetime.now()
+    grid = _grid(since, now, step)
+    if not grid:
+        return []
+
+    trade_currency = app_config.get("BASE_CURRENCY")
+    cache_file = app_config.get("HISTORY_CACHE_FILE")
+    cache = db.load(cache_file) or {}
+    # Версия в ключе отсекает участки, где балансы до первой сделки
+    # считались нулевыми
+    cache_key = f"{user_id}:{step}:{base_currency}:2"
+    cached = cache.get(cache_key)
+
+    # Версии журнала и истории курсов, по которым посчитан кеш
+    versions = [list(db.version(filename)) for filename in _sources()]
+
+    # Закешированный участок применим, если запрос начинается внутри него
+    if cached and cached["start"] <= grid[0] <= cached["end"]:
+        reused = cached["values"][_steps(cached["start"], grid[0], step) :]
+        pending = grid[len(reused) :]
+        if not pending:
+            # Все точки в закешированном участке: файлы не читаются
+            return list(zip(grid, reused))
+        state = _AsOfState(cached["balances"], cached["prices"])
+        known_from = 0
+        if cached.get("versions") == versions:
+            # Файлы не менялись: события и тики после участка сохранены в кеше
+            events, ticks = cached["events"], cached["ticks"]
+        else:
+            events, ticks = _load_after(db, user_id, trade_currency, cached["end"])
+    else:
+        cached = None
+        reused = []
+        pending = grid
+        events, ticks = _load_after(db, user_id, trade_currency, None)
+        state = _initial_state(db, user_id, events)
+        # Первая точка, в которой известны балансы всех валют
+        first_events: dict[str, str] = {}
+        for event in events:
+            first_events.setdefault(event["currency"], event["timestamp"])
+        known_from = bisect_left(pending, max(first_events.values(), default=""))
+
+    values = as_of_join(pending, events, ticks, state, trade_currency, base_currency)
+
+    # Кешируем, только если все посчитанные точки уже в прошлом
+    if known_from < len(pending) and pending[-1] < now.isoformat():
+        end = pending[-1]
+        cache[cache_key] = {
+            "start": cached["start"] if cached else pending[known_from],
+            "end": end,
+            "values": (cached["values"] if cached else []) + values[known_from:],
+            "balances": state.balances,
+            "prices": state.prices,
+            "versions": versions,
+            "events": _tail(events, end, now.isoformat(), "currency"),
+            "ticks": _tail(ticks, end, now.isoformat(), "from_currency"),
+        }
+        db.save(cache_file, cache)
+
+    return list(zip(grid, reused + values))
+
+
+def _sources() -> list[str]:
+    """Файлы, из которых считается стоимость портфеля"""
+    return [
+        app_config.get(key)
+        for key in (
+            "LEDGER_FILE",
+            "HISTORY_FILE",
+            "HISTORY_HOURLY_FILE",
+            "HISTORY_DAILY_FILE",
+        )
+    ]
+
+
+def _load_after(
+    db, user_id: int, trade_currency: str, after: str | None
+) -> tuple[list[dict], list[dict]]:
+    """События пользователя и тики к валюте расчетов позже after"""
+    events = [
+        event
+        for event in db.load(app_config.get("LEDGER_FILE")) or []
+        if event["user_id"] == user_id
+    ]
+    # Старая история прорежена до часовых и дневных курсов закрытия
+    ticks = [
+        tick
+        for tick in retention.read_ticks(db)
+        if tick["to_currency"] == trade_currency
+    ]
+    if after is not None:
+        events = events[bisect_right(events, after, key=_timestamp) :]
+        ticks = ticks[bisect_right(ticks, after, key=_timestamp) :]
+    return events, ticks
+
+
+def _tail(records: list[dict], end: str, now: str, field: str) -> list[dict]:
+    """
+    Записи позже end, нужные для следующих точек сетки
+
+    Следующая точка после end позже now, поэтому из записей в (end, now]
+    нужна только последняя по каждому значению field.
+    """
+    start = bisect_right(records, end, key=_timestamp)
+    split = bisect_right(records, now, key=_timestamp)
+    latest = {record[field]: record for record in records[start:split]}
+    return sorted(latest.values(), key=_timestamp) + records[split:]
+
+
+def _initial_state(db, user_id: int, events: list[dict]) -> _AsOfState:
+    """Состояние до первого события журнала пользователя"""
+    traded = {event["currency"] for event in events}
+    portfolios = db.load(app_config.get("PORTFOLIOS_FILE")) or []
+    try:
+        portfolio = utils.get_user_portfolio(portfolios, user_id, models.Portfolio)
+    except ValueError:
+        return _AsOfState(unknown=traded)
+
+    balances = {
+        currency: balance
+        for currency, balance in portfolio.wallets.items()
+        if currency not in traded
+    }
+    return _AsOfState(balances, unknown=traded)
+
+
+def _timestamp(record: dict) -> str:
+    return record["timestamp"]
+
+
+def _steps(start: str, point: str, step: int) -> int:
+    """Количество интервалов между двумя границами"""
+    delta = datetime.fromisoformat(point) - datetime.fromisoformat(start)
+    return int(delta.total_seconds()) // step
@@ -1,15 +1,25 @@
 from datetime import datetime
-from typing import Any
+from types import MappingProxyType
+from typing import Mapping
 
 from src.valutatrade_hub.core import utils
 from src.valutatrade_hub.core.exceptions import InsufficientFundsError
 from src.valutatrade_hub.core.utils import hashed_password, validate_positive_number
 from src.valutatrade_hub.decorators import error_handler
+from src.valutatrade_hub.infra.settings import app_config
 
 
 class User:
     """Пользователь"""
 
+    __slots__ = (
+        "_user_id",
+        "_username",
+        "_hashed_password",
+        "_salt",
+        "_registration_date",
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -60,6 +70,27 @@ class User:
     def registration_date(self) -> datetime:
         return self._registration_date
 
+    @classmethod
+    def from_record(cls, record: dict) -> "User":
+        """Создает пользователя из записи users.json"""
+        return cls(
+            record["user_id"],
+            record["username"],
+            record["hashed_password"],
+            record["salt"],
+            record["registration_date"],
+        )
+
+    def to_record(self) -> dict:
+        """Возвращает запись для users.json"""
+        return {
+            "user_id": self._user_id,
+            "username": self._username,
+            "hashed_password": self._hashed_password,
+            "salt": self._salt,
+            "registration_date": self._registration_date,
+        }
+
     def get_user_info(self):
         """Возвращает информацию о пользователе (без пароля и соли)"""
         return {
@@ -79,17 +110,21 @@ class User:
             raise ValueError("Пароль должен содержать не менее 4 символов")
 
         # Хешируем новый пароль с существующей солью
-        self._hashed_password = hashed_password(new_password, self._salt)
+        self._hashed_password = hashed_password(
+            new_password, self._salt, app_config.get("PASSWORD_HASHING")
+        )
         pass
 
     def verify_password(self, password: str) -> bool:
         """Проверяет пароль пользователя"""
-        return self._hashed_password == hashed_password(password, self._salt)
+        return utils.verify_password(password, self._salt, self._hashed_password)
 
 
 class Wallet:
     """Кошелек пользователя"""
 
+    __slots__ = ("_currency_code", "_balance")
+
     def __init__(self, currency_code: str, balance=0.0):
         """
         Инициализация кошелька
@@ -136,28 +171,52 @@ class Wallet:
 class Portfolio:
     """Портфель пользователя"""
 
-    def __init__(self, user_id: int, wallets: dict[str, Any]):
+    __slots__ = ("_user_id", "_wallets")
+
+    def __init__(self, user_id: int, wallets: dict[str, float]):
         """
         Инициализация портфеля
 
         Args:
             user_id: уникальный идентификатор пользователя
-            wallets: кошельки пользователя
+            wallets: балансы кошельков в формате {"USD": 100.0}
         """
         self._user_id = user_id
         self._wallets = wallets
 
+    @classmethod
+    def from_record(cls, record: dict) -> "Portfolio":
+        """
+        Создает портфель из записи portfolios.json
+
+        Плоский формат {"USD": 100.0} используется без копирования,
+        устаревший {"USD": {"balance": 100.0}} переводится в плоский.
+        """
+        wallets = record["wallets"]
+        for value in wallets.values():
+            if isinstance(value, dict):
+                wallets = {
+                    code: value.get("balance", 0.0) for code, value in wallets.items()
+                }
+            break
+        return cls(record["user_id"], wallets)
+
+    def to_record(self) -> dict:
+        """Возвращает запись для portfolios.json"""
+        return {"user_id": self._user_id, "wallets": self._wallets}
+
     @property
     def user_id(self):
         return self._user_id
 
     @property
     def user(self):
-        return {"user_id": self._user_id, "wallets": self._wallets}
+        return self.to_record()
 
     @property
-    def wallets(self):
-        return self._wallets.copy()
+    def wallets(self) -> Mapping[str, float]:
+        """Балансы кошельков (представление только для чтения, без копирования)"""
+        return MappingProxyType(self._wallets)
 
     def add_currency(self, currency_code: str):
         """Добавляет валюту в портфель"""
@@ -168,7 +227,7 @@ class Portfolio:
         if currency_code in self._wallets:
             raise ValueError("Валюта уже добавлена в портфель")
 
-        self._wallets[currency_code] = {"balance": 0.0}
+        self._wallets[currency_code] = 0.0
 
     def get_total_value(
         self,
@@ -178,10 +237,8 @@ class Portfolio:
         """Возвращает общую стоимость портфеля в указанной валюте"""
 
         total_value = 0.0
-        for key, value in self._wallets.items():
-            wallet_value = utils.convert_currency(
-                value.get("balance"), key, base_currency, rates
-            )
+        for key, balance in self._wallets.items():
+            wallet_value = utils.convert_currency(balance, key, base_currency, rates)
 
             if wallet_value is None:
                 total_value = None
@@ -191,9 +248,13 @@ class Portfolio:
 
         return total_value
 
-    def get_wallet(self, currency_code: str):
+    def get_wallet(self, currency_code: str) -> Wallet:
         """Возвращает кошелек пользователя по коду валюты"""
 
         if currency_code not in self._wallets:
-            raise ValueError("Валюта не найдена в портфеле")
-        return self._wallets[currency_code]
+            raise ValueError("Валюта не найдена в портфеле")
+        return Wallet(currency_code, self._wallets[currency_code])
+
+    def save_wallet(self, wallet: Wallet):
+        """Сохраняет баланс кошелька в портфель"""
+        self._wallets[wallet.currency_code] = wallet.balance
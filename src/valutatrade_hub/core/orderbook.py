@@ -0,0 +1,386 @@
+import heapq
+import threading
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Iterable
+
+from src.valutatrade_hub.const import SIDE_BUY
+from src.valutatrade_hub.core import history, models, pnl
+from src.valutatrade_hub.core.exceptions import InsufficientFundsError
+
+STATUS_OPEN = "open"
+STATUS_FILLED = "filled"
+STATUS_CANCELLED = "cancelled"
+STATUS_REJECTED = "rejected"
+
+
+class LimitOrder:
+    """Лимитная заявка на покупку или продажу валюты"""
+
+    def __init__(
+        self,
+        order_id: int,
+        user_id: int,
+        side: str,
+        currency: str,
+        base_currency: str,
+        amount: float,
+        price: float,
+        created_at: str | None = None,
+        status: str = STATUS_OPEN,
+    ):
+        """
+        Инициализация заявки
+
+        Args:
+            order_id: уникальный идентификатор заявки
+            user_id: идентификатор владельца
+            side: направление заявки (buy/sell)
+            currency: код торгуемой валюты
+            base_currency: код валюты расчетов
+            amount: количество валюты
+            price: лимитная цена в базовой валюте
+            created_at: дата создания в формате ISO
+            status: статус заявки
+        """
+        self.order_id = order_id
+        self.user_id = user_id
+        self.side = side
+        self.currency = currency.upper()
+        self.base_currency = base_currency.upper()
+        self.amount = amount
+        self.price = price
+        self.created_at = created_at or datetime.now().isoformat()
+        self.status = status
+
+    @property
+    def pair(self) -> str:
+        return f"{self.currency}_{self.base_currency}"
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == STATUS_OPEN
+
+    def crosses(self, rate: float) -> bool:
+        """Проверяет, достигнута ли лимитная цена при данном курсе"""
+        if self.side == SIDE_BUY:
+            return rate <= self.price
+        return rate >= self.price
+
+    def to_record(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "side": self.side,
+            "currency": self.currency,
+            "base_currency": self.base_currency,
+            "amount": self.amount,
+            "price": self.price,
+            "created_at": self.created_at,
+            "status": self.status,
+        }
+
+    @classmethod
+    def from_record(cls, record: dict) -> "LimitOrder":
+        return cls(
+            order_id=record["order_id"],
+            user_id=record["user_id"],
+            side=record["side"],
+            currency=record["currency"],
+            base_currency=record["base_currency"],
+            amount=record["amount"],
+            price=record["price"],
+            created_at=record.get("created_at"),
+            status=record.get("status", STATUS_OPEN),
+        )
+
+
+class OrderBook:
+    """
+    Книга заявок одной валютной пары
+
+    Заявки сгруппированы по ценовым уровням (FIFO внутри уровня).
+    Цены уровней хранятся в кучах: для покупок - max-куча, для продаж -
+    min-куча. Новый курс снимает с вершины только пересеченные уровни,
+    остальные заявки не просматриваются.
+    """
+
+    def __init__(self, pair: str):
+        self.pair = pair
+        self._bid_prices: list[float] = []  # цены со знаком минус
+        self._ask_prices: list[float] = []
+        self._bids: dict[float, deque[LimitOrder]] = {}
+        self._asks: dict[float, deque[LimitOrder]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, order: LimitOrder):
+        """Добавляет заявку в книгу"""
+        if order.side == SIDE_BUY:
+            levels, prices, key = self._bids, self._bid_prices, -order.price
+        else:
+            levels, prices, key = self._asks, self._ask_prices, order.price
+
+        level = levels.get(order.price)
+        if level is None:
+            level = levels[order.price] = deque()
+            heapq.heappush(prices, key)
+
+        level.append(order)
+        self._size += 1
+
+    def discard(self, order: LimitOrder):
+        """
+        Учитывает снятие заявки
+
+        Сама заявка остается на своем уровне и пропускается при
+        исполнении, поэтому отмена не требует перестройки кучи.
+        """
+        self._size -= 1
+
+    def match(self, rate: float) -> list[LimitOrder]:
+        """Снимает из книги заявки, пересеченные курсом"""
+        crossed: list[LimitOrder] = []
+
+        while self._bid_prices and -self._bid_prices[0] >= rate:
+            price = -heapq.heappop(self._bid_prices)
+            crossed.extend(o for o in self._bids.pop(price) if o.is_open)
+
+        while self._ask_prices and self._ask_prices[0] <= rate:
+            price = heapq.heappop(self._ask_prices)
+            crossed.extend(o for o in self._asks.pop(price) if o.is_open)
+
+        self._size -= len(crossed)
+        return crossed
+
+
+class OrderBooks:
+    """Набор книг заявок по валютным парам"""
+
+    def __init__(self, orders: Iterable[LimitOrder] = (), next_id: int = 1):
+        self._books: dict[str, OrderBook] = {}
+        self._orders: dict[int, LimitOrder] = {}
+        self._next_id = next_id
+
+        for order in orders:
+            self.add(order)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def next_id(self) -> int:
+        """Выделяет идентификатор для новой заявки"""
+        order_id = self._next_id
+        self._next_id += 1
+        return order_id
+
+    def add(self, order: LimitOrder):
+        """Добавляет открытую заявку в книгу ее пары"""
+        if not order.is_open:
+            return
+
+        book = self._books.get(order.pair)
+        if book is None:
+            book = self._books[order.pair] = OrderBook(order.pair)
+
+        book.add(order)
+        self._orders[order.order_id] = order
+        self._next_id = max(self._next_id, order.order_id + 1)
+
+    def get(self, order_id: int) -> LimitOrder:
+        """Возвращает открытую заявку по идентификатору"""
+        if order_id not in self._orders:
+            raise ValueError(f"Заявка #{order_id} не найдена")
+        return self._orders[order_id]
+
+    def cancel(self, order_id: int) -> LimitOrder:
+        """Отменяет открытую заявку"""
+        order = self.get(order_id)
+        order.status = STATUS_CANCELLED
+        self._books[order.pair].discard(order)
+        del self._orders[order_id]
+        return order
+
+    def open_orders(self, user_id: int | None = None) -> list[LimitOrder]:
+        """Возвращает открытые заявки (опционально одного пользователя)"""
+        return [
+            order
+            for order in self._orders.values()
+            if user_id is None or order.user_id == user_id
+        ]
+
+    def match(self, rates: dict[str, float]) -> list[tuple[LimitOrder, float]]:
+        """
+        Сопоставляет книги с новыми курсами
+
+        Args:
+            rates: словарь в формате {"BTC_USD": 59337.21, ...}
+
+        Returns:
+            Список пар (заявка, курс исполнения)
+        """
+        crossed = []
+        for pair, rate in rates.items():
+            book = self._books.get(pair)
+            if not book:
+                continue
+            for order in book.match(rate):
+                del self._orders[order.order_id]
+                crossed.append((order, rate))
+        return crossed
+
+    def to_record(self) -> dict:
+        return {
+            "next_id": self._next_id,
+            "orders": [order.to_record() for order in self._orders.values()],
+        }
+
+    @classmethod
+    def from_record(cls, record: dict | None) -> "OrderBooks":
+        record = record or {}
+        return cls(
+            (LimitOrder.from_record(order) for order in record.get("orders", [])),
+            next_id=record.get("next_id", 1),
+        )
+
+
+def fill_order(portfolio_record: dict, order: LimitOrder, rate: float) -> float:
+    """
+    Исполняет заявку по курсу через кошельки пользователя
+
+    Returns:
+        Сумма сделки в базовой валюте
+    """
+    user_portfolio = models.Portfolio.from_record(portfolio_record)
+
+    if order.currency not in user_portfolio.wallets:
+        user_portfolio.add_currency(order.currency)
+
+    cur_wallet = user_portfolio.get_wallet(order.currency)
+    base_wallet = user_portfolio.get_wallet(order.base_currency)
+    base_amount = float(order.amount * rate)
+
+    if order.side == SIDE_BUY:
+        base_wallet.withdraw(base_amount)
+        cur_wallet.deposit(order.amount)
+    else:
+        cur_wallet.withdraw(order.amount)
+        base_wallet.deposit(base_amount)
+
+    user_portfolio.save_wallet(cur_wallet)
+    user_portfolio.save_wallet(base_wallet)
+
+    portfolio_record.update(user_portfolio.to_record())
+    pnl.record_trade(
+        portfolio_record, order.side, order.currency, order.amount, rate
+    )
+
+    return base_amount
+
+
+class _BooksCache:
+    """
+    Книги заявок, построенные из файла, и версия файла
+
+    Кучи строятся один раз: пока orders.json не изменили другой процесс,
+    команда вне сопоставления (в том числе в буфере пакетного режима) или
+    откат, сопоставление работает с книгами в памяти.
+    """
+
+    def __init__(self):
+        self.version: tuple[int, int, int] | None = None
+        self.books: OrderBooks | None = None
+        self.lock = threading.Lock()
+
+
+# Кеш книг по менеджеру базы и файлу заявок
+_caches: "weakref.WeakKeyDictionary[object, dict[str, _BooksCache]]" = (
+    weakref.WeakKeyDictionary()
+)
+_caches_lock = threading.Lock()
+
+
+def _books_cache(db, filename: str) -> _BooksCache:
+    with _caches_lock:
+        caches = _caches.get(db)
+        if caches is None:
+            caches = _caches[db] = {}
+        cache = caches.get(filename)
+        if cache is None:
+            cache = caches[filename] = _BooksCache()
+        return cache
+
+
+class OrderMatcher:
+    """
+    Исполняет лимитные заявки при обновлении курсов
+
+    Книги держатся в памяти процесса между обновлениями, поэтому курс без
+    пересечений стоит O(число снятых уровней) и не читает orders.json.
+    Файл перечитывается, только если его изменил другой процесс, и
+    записывается, только если заявки исполнились.
+    """
+
+    def __init__(self, db, orders_file: str, portfolios_file: str):
+        self.db = db
+        self.orders_file = orders_file
+        self.portfolios_file = portfolios_file
+        self._cache = _books_cache(db, orders_file)
+
+    def match(self, rates: dict[str, float]) -> list[tuple[LimitOrder, float]]:
+        """
+        Исполняет заявки, пересеченные новыми курсами
+
+        Returns:
+            Список пар (заявка, курс), статус заявки - filled или rejected
+        """
+        cache = self._cache
+        with cache.lock:
+            version = self.db.version(self.orders_file)
+            if cache.books is None or cache.version != version:
+                cache.books = OrderBooks.from_record(self.db.load(self.orders_file))
+                cache.version = version
+            try:
+                return self._match(cache, rates)
+            except BaseException:
+                # Книги в памяти могли разойтись с файлом
+                cache.books = cache.version = None
+                raise
+
+    def _match(self, cache: _BooksCache, rates: dict[str, float]):
+        books = cache.books
+        crossed = books.match(rates)
+
+        if not crossed:
+            return []
+
+        portfolios = self.db.load(self.portfolios_file) or []
+        portfolios_index = {record["user_id"]: record for record in portfolios}
+        balance_changes: dict[int, dict[str, float]] = {}
+
+        for order, rate in crossed:
+            record = portfolios_index.get(order.user_id)
+            try:
+                if record is None:
+                    raise ValueError("Портфель не найден")
+                fill_order(record, order, rate)
+                order.status = STATUS_FILLED
+            except (InsufficientFundsError, ValueError):
+                order.status = STATUS_REJECTED
+                continue
+
+            balances = balance_changes.setdefault(order.user_id, {})
+            for currency in (order.currency, order.base_currency):
+                balances[currency] = record["wallets"][currency]
+
+        self.db.save(self.portfolios_file, portfolios)
+        self.db.save(self.orders_file, books.to_record())
+        cache.version = self.db.version(self.orders_file)
+
+        if balance_changes:
+            history.record_balances(self.db, balance_changes)
+
+        return crossed
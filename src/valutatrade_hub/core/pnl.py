@@ -0,0 +1,149 @@
+from src.valutatrade_hub.const import SIDE_BUY
+from src.valutatrade_hub.infra.settings import app_config
+
+METHOD_FIFO = "FIFO"
+METHOD_AVERAGE = "AVERAGE"
+
+
+class CostBasis:
+    """
+    Себестоимость позиции в одной валюте
+
+    Хранится в записи портфеля в виде
+    {"lots": [[amount, price], ...], "amount": ..., "cost": ..., "realized": ...}.
+    Агрегаты amount/cost/realized обновляются на каждой сделке, поэтому
+    запрос P&L не требует обхода лотов.
+    """
+
+    def __init__(self, record: dict, method: str = METHOD_FIFO):
+        """
+        Args:
+            record: запись позиции из портфеля (изменяется на месте)
+            method: метод учета себестоимости (FIFO или AVERAGE)
+        """
+        if method not in (METHOD_FIFO, METHOD_AVERAGE):
+            raise ValueError(f"Неизвестный метод учета себестоимости '{method}'")
+
+        record.setdefault("lots", [])
+        record.setdefault("amount", 0.0)
+        record.setdefault("cost", 0.0)
+        record.setdefault("realized", 0.0)
+        self._record = record
+        self._method = method
+
+    @property
+    def amount(self) -> float:
+        return self._record["amount"]
+
+    @property
+    def cost(self) -> float:
+        return self._record["cost"]
+
+    @property
+    def realized(self) -> float:
+        return self._record["realized"]
+
+    @property
+    def average_price(self) -> float:
+        return self.cost / self.amount if self.amount else 0.0
+
+    def buy(self, amount: float, price: float):
+        """Учитывает покупку: добавляет лот"""
+        record = self._record
+        record["amount"] += amount
+        record["cost"] += amount * price
+
+        if self._method == METHOD_FIFO:
+            record["lots"].append([amount, price])
+        else:
+            record["lots"] = [[record["amount"], self.average_price]]
+
+    def sell(self, amount: float, price: float) -> float:
+        """
+        Учитывает продажу: списывает лоты
+
+        Returns:
+            Реализованный результат сделки
+        """
+        record = self._record
+        # Количество сверх учтенного (например, начисленное до начала учета)
+        # не имеет себестоимости и в результат не входит
+        amount = min(amount, record["amount"])
+        if amount <= 0:
+            return 0.0
+
+        if self._method == METHOD_FIFO:
+            released_cost = self._consume_lots(amount)
+        else:
+            released_cost = amount * self.average_price
+
+        realized = amount * price - released_cost
+        record["amount"] -= amount
+        record["cost"] -= released_cost
+        record["realized"] += realized
+
+        if record["amount"] <= 1e-12:
+            record["amount"] = 0.0
+            record["cost"] = 0.0
+            record["lots"] = []
+        elif self._method == METHOD_AVERAGE:
+            record["lots"] = [[record["amount"], self.average_price]]
+
+        return realized
+
+    def unrealized(self, rate: float) -> float:
+        """Нереализованный результат при текущем курсе"""
+        return self.amount * rate - self.cost
+
+    def _consume_lots(self, amount: float) -> float:
+        """Списывает лоты с начала очереди и возвращает их себестоимость"""
+        lots = self._record["lots"]
+        released_cost = 0.0
+        consumed = 0
+
+        for lot in lots:
+            if amount <= 0:
+                break
+            take = min(lot[0], amount)
+            released_cost += take * lot[1]
+            amount -= take
+            lot[0] -= take
+            if lot[0] <= 1e-12:
+                consumed += 1
+
+        del lots[:consumed]
+        return released_cost
+
+
+def get_cost_basis(
+    portfolio_record: dict, currency: str, method: str | None = None
+) -> CostBasis:
+    """Возвращает себестоимость позиции из записи портфеля"""
+    positions = portfolio_record.setdefault("cost_basis", {})
+    return CostBasis(
+        positions.setdefault(currency, {}),
+        method or app_config.get("COST_BASIS_METHOD"),
+    )
+
+
+def record_trade(
+    portfolio_record: dict,
+    side: str,
+    currency: str,
+    amount: float,
+    price: float,
+    method: str | None = None,
+) -> float:
+    """
+    Учитывает сделку в себестоимости позиции портфеля
+
+    Returns:
+        Реализованный результат (для покупки - 0)
+    """
+    cost_basis = get_cost_basis(portfolio_record, currency, method)
+
+    if side == SIDE_BUY:
+        cost_basis.buy(amount, price)
+        return 0.0
+
+    return cost_basis.sell(amount, price)
@@ -0,0 +1,142 @@
+import heapq
+import weakref
+
+
+def _split(key: str) -> tuple[str, str]:
+    currency, _, base = key.partition("_")
+    return currency, base
+
+
+class RateBook:
+    """
+    Курсы с индексами по валюте и по базе
+
+    Пара "BTC_USD" попадает в индекс валюты BTC и базы USD, поэтому фильтры
+    по валюте и базе - пересечение двух множеств, а не просмотр всех пар.
+    Первые N по курсу выбираются кучей, без сортировки всей выборки.
+    """
+
+    def __init__(self, pairs: dict | None = None, last_refresh: str | None = None):
+        """
+        Args:
+            pairs: курсы {"BTC_USD": {"rate": ..., "updated_at": ...}}
+            last_refresh: время последнего обновления курсов
+        """
+        self.pairs: dict[str, dict] = {}
+        self.last_refresh = last_refresh
+        # Номер снимка курсов, по которому построена книга
+        self.snapshot_id: int | None = None
+        self._by_currency: dict[str, set[str]] = {}
+        self._by_base: dict[str, set[str]] = {}
+        self.update(pairs or {}, last_refresh)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def _add(self, key: str, value: dict):
+        if key not in self.pairs:
+            currency, base = _split(key)
+            self._by_currency.setdefault(currency, set()).add(key)
+            self._by_base.setdefault(base, set()).add(key)
+        self.pairs[key] = value
+
+    def _remove(self, key: str):
+        currency, base = _split(key)
+        for index, name in ((self._by_currency, currency), (self._by_base, base)):
+            keys = index.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[name]
+        del self.pairs[key]
+
+    def update(self, pairs: dict, last_refresh: str | None = None):
+        """
+        Приводит книгу к новому набору курсов
+
+        Индексы меняются только для добавленных и удаленных пар,
+        у остальных обновляется значение.
+        """
+        for key in [key for key in self.pairs if key not in pairs]:
+            self._remove(key)
+        for key, value in pairs.items():
+            self._add(key, value)
+        if last_refresh is not None:
+            self.last_refresh = last_refresh
+
+    def select(self, currency: str | None = None, base: str | None = None):
+        """Ключи пар с заданной валютой и/или базой"""
+        if currency is None and base is None:
+            return self.pairs.keys()
+
+        candidates = [
+            index.get(name, set())
+            for index, name in ((self._by_currency, currency), (self._by_base, base))
+            if name is not None
+        ]
+        if len(candidates) == 1:
+            return candidates[0]
+        smaller, larger = sorted(candidates, key=len)
+        return {key for key in smaller if key in larger}
+
+    def query(
+        self,
+        currency: str | None = None,
+        base: str | None = None,
+        top: int | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> list[tuple[str, dict]]:
+        """
+        Выборка пар
+
+        Args:
+            currency, base: фильтры (вместе - пересечение)
+            top: только N пар с наибольшим курсом (по убыванию курса)
+            offset, limit: страница результата
+        """
+        keys = self.select(currency, base)
+        end = None if limit is None else offset + limit
+
+        if top is not None:
+            count = top if end is None else min(top, end)
+            ordered = heapq.nlargest(
+                count, keys, key=lambda key: self.pairs[key].get("rate") or 0
+            )
+        elif end is not None and end < len(keys):
+            ordered = heapq.nsmallest(end, keys)
+        else:
+            ordered = sorted(keys)
+
+        return [(key, self.pairs[key]) for key in ordered[offset:end]]
+
+
+# Книги по менеджерам базы: Storage.save_rates обновляет книгу на месте,
+# а чтение пересобирает индексы только для изменившихся пар
+_books: "weakref.WeakKeyDictionary[object, RateBook]" = weakref.WeakKeyDictionary()
+
+
+def get_book(db, snapshot) -> RateBook:
+    """
+    Книга для снимка курсов
+
+    Args:
+        db: менеджер базы данных
+        snapshot: снимок курсов (snapshots.RateSnapshot)
+    """
+    book = _books.get(db)
+    if book is None:
+        book = _books[db] = RateBook(snapshot.pairs, snapshot.last_refresh)
+        book.snapshot_id = snapshot.id
+    elif book.snapshot_id != snapshot.id:
+        book.update(snapshot.pairs, snapshot.last_refresh)
+        book.snapshot_id = snapshot.id
+    return book
+
+
+def on_rates_saved(db, snapshot):
+    """Обновляет книгу после публикации снимка курсов"""
+    book = _books.get(db)
+    if book is not None:
+        book.update(snapshot.pairs, snapshot.last_refresh)
+        book.snapshot_id = snapshot.id
@@ -0,0 +1,226 @@
+"""
+Хранение истории курсов с прореживанием
+
+Сырые тики (exchange_rates.json) хранятся за окно HISTORY_RETENTION.raw.
+Закрытые часы старше окна сворачиваются в часовые OHLC-бары
+(HISTORY_HOURLY_FILE), а закрытые дни старше HISTORY_RETENTION.hourly -
+из часовых баров в дневные (HISTORY_DAILY_FILE). Объем истории за годы
+ограничен: сырые тики и часовые бары - размером окон, дневные бары - одной
+записью на пару в день.
+
+Сжатие инкрементально: граница уже свернутых данных - конец периода
+последнего бара, каждый прогон обрабатывает только периоды после нее.
+Бары записываются раньше, чем из исходного файла удаляются свернутые
+данные, а каждая запись файла атомарна. Если сжатие прервано между
+записями, читатели отбрасывают данные до границы, а следующий прогон
+удаляет их, не учитывая повторно.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from src.valutatrade_hub.core import history
+from src.valutatrade_hub.infra.settings import app_config
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+class CompactionResult:
+    """Итог сжатия истории"""
+
+    __slots__ = ("ticks", "hourly", "daily", "raw_left")
+
+    def __init__(self):
+        # Сколько тиков свернуто в часовые бары
+        self.ticks = 0
+        # Сколько часовых баров добавлено и сколько свернуто в дневные
+        self.hourly = 0
+        self.daily = 0
+        self.raw_left = 0
+
+
+def _timestamp(record: dict) -> str:
+    return record["timestamp"]
+
+
+def _hour(timestamp: str) -> str:
+    """Начало часа в формате ISO: 2026-01-02T13:45:00 -> 2026-01-02T13:00:00"""
+    return f"{timestamp[:13]}:00:00"
+
+
+def _day(timestamp: str) -> str:
+    return f"{timestamp[:10]}T00:00:00"
+
+
+def _end(bars: list[dict], period: timedelta) -> str | None:
+    """Конец периода последнего бара - граница свернутых данных"""
+    if not bars:
+        return None
+    return (datetime.fromisoformat(bars[-1]["timestamp"]) + period).isoformat()
+
+
+def _trim(daily: list[dict], hourly: list[dict], raw: list[dict]):
+    """Отбрасывает часовые бары и тики, уже свернутые прерванным прогоном"""
+    daily_end = _end(daily, DAY)
+    if daily_end:
+        hourly = hourly[bisect_left(hourly, daily_end, key=_timestamp) :]
+    done = max(filter(None, (_end(hourly, HOUR), daily_end)), default=None)
+    if done:
+        raw = raw[bisect_left(raw, done, key=_timestamp) :]
+    return hourly, raw
+
+
+def _ohlc(records, period_of, price_of) -> list[dict]:
+    """
+    Сворачивает упорядоченные по времени записи в OHLC-бары
+
+    Args:
+        records: тики или бары
+        period_of: начало периода по метке времени записи
+        price_of: запись -> (open, high, low, close, count)
+    """
+    bars: dict[tuple[str, str, str], dict] = {}
+    for record in records:
+        key = (
+            record["from_currency"],
+            record["to_currency"],
+            period_of(record["timestamp"]),
+        )
+        open_, high, low, close, count = price_of(record)
+        if open_ is None:
+            continue
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {
+                "from_currency": key[0],
+                "to_currency": key[1],
+                "timestamp": key[2],
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "count": count,
+            }
+        else:
+            bar["high"] = max(bar["high"], high)
+            bar["low"] = min(bar["low"], low)
+            bar["close"] = close
+            bar["count"] += count
+    return list(bars.values())
+
+
+def _tick_price(tick: dict):
+    rate = tick.get("rate")
+    return rate, rate, rate, rate, 1
+
+
+def _bar_price(bar: dict):
+    return bar["open"], bar["high"], bar["low"], bar["close"], bar["count"]
+
+
+def cutoffs(now: datetime | None = None) -> tuple[str, str]:
+    """
+    Границы сжатия для момента now
+
+    Returns:
+        (тики раньше - в часовые бары, часовые бары раньше - в дневные)
+    """
+    retention = app_config.get("HISTORY_RETENTION")
+    now = now or datetime.now()
+    raw_cutoff = now - timedelta(seconds=history.parse_interval(retention["raw"]))
+    raw_cutoff = raw_cutoff.replace(minute=0, second=0, microsecond=0)
+    hourly_cutoff = now - timedelta(
+        seconds=history.parse_interval(retention["hourly"])
+    )
+    # В дневные бары попадают только дни, тики которых уже свернуты
+    hourly_cutoff = min(hourly_cutoff, raw_cutoff).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return raw_cutoff.isoformat(), hourly_cutoff.isoformat()
+
+
+def compact_ticks(
+    db, ticks: list[dict], now: datetime | None = None
+) -> tuple[list[dict], CompactionResult]:
+    """
+    Сворачивает старые тики и часовые бары, сохраняя файлы баров
+
+    Тики упорядочены по времени. Если свернуть нечего, файлы баров
+    не читаются.
+
+    Returns:
+        Оставшиеся тики (их сохраняет вызывающий) и итог сжатия
+    """
+    result = CompactionResult()
+    raw_cutoff, hourly_cutoff = cutoffs(now)
+    if not ticks or ticks[0]["timestamp"] >= raw_cutoff:
+        result.raw_left = len(ticks)
+        return ticks, result
+
+    total = len(ticks)
+    hourly_file = app_config.get("HISTORY_HOURLY_FILE")
+    daily_file = app_config.get("HISTORY_DAILY_FILE")
+    daily = db.load(daily_file) or []
+    hourly, ticks = _trim(daily, db.load(hourly_file) or [], ticks)
+
+    split = bisect_left(ticks, raw_cutoff, key=_timestamp)
+    new_hourly = _ohlc(ticks[:split], _hour, _tick_price)
+    ticks = ticks[split:]
+    # Вместе с тиками, свернутыми прерванным прогоном
+    result.ticks = total - len(ticks)
+    result.hourly = len(new_hourly)
+    hourly.extend(new_hourly)
+
+    split = bisect_left(hourly, hourly_cutoff, key=_timestamp)
+    if split:
+        daily.extend(_ohlc(hourly[:split], _day, _bar_price))
+        # Дневные бары записываются раньше, чем удаляются часовые
+        db.save(daily_file, daily)
+        hourly = hourly[split:]
+        result.daily = split
+    db.save(hourly_file, hourly)
+
+    result.raw_left = len(ticks)
+    return ticks, result
+
+
+def compact(db, now: datetime | None = None) -> CompactionResult:
+    """Сжимает историю курсов в HISTORY_FILE"""
+    history_file = app_config.get("HISTORY_FILE")
+    ticks = db.load(history_file) or []
+    left, result = compact_ticks(db, ticks, now)
+    if len(left) != len(ticks):
+        db.save(history_file, left)
+    return result
+
+
+def read_ticks(db) -> list[dict]:
+    """
+    История курсов от старых данных к новым: дневные бары, часовые бары,
+    затем сырые тики
+
+    Бар представлен тиком с курсом закрытия на конец периода, поэтому
+    as-of соединение не видит курс раньше, чем он стал известен.
+    """
+    daily = db.load(app_config.get("HISTORY_DAILY_FILE")) or []
+    hourly, raw = _trim(
+        daily,
+        db.load(app_config.get("HISTORY_HOURLY_FILE")) or [],
+        db.load(app_config.get("HISTORY_FILE")) or [],
+    )
+
+    result = []
+    for bars, period in ((daily, DAY), (hourly, HOUR)):
+        for bar in bars:
+            end = datetime.fromisoformat(bar["timestamp"]) + period
+            result.append(
+                {
+                    "from_currency": bar["from_currency"],
+                    "to_currency": bar["to_currency"],
+                    "rate": bar["close"],
+                    "timestamp": end.isoformat(),
+                }
+            )
+    result.extend(raw)
+    return result
@@ -0,0 +1,250 @@
+"""
+Скользящая статистика курсов по парам
+
+Статистика обновляется на каждом курсе при загрузке, поэтому вопрос
+"максимум, минимум, среднее и волатильность BTC_USD за 24 часа" не требует
+просмотра exchange_rates.json. Для каждого окна хранятся:
+
+- курсы внутри окна и среднее/дисперсия по Уэлфорду с добавлением
+  и удалением значения за O(1);
+- монотонные очереди максимумов и минимумов: экстремум окна - первый
+  элемент очереди, амортизированно O(1) на курс;
+- EWMA с постоянной времени, равной длине окна.
+"""
+
+import math
+from collections import deque
+from datetime import datetime
+
+from src.valutatrade_hub.core import history
+from src.valutatrade_hub.infra.settings import app_config
+
+
+class RollingWindow:
+    """Статистика курса одной пары за скользящее окно"""
+
+    __slots__ = (
+        "seconds",
+        "count",
+        "mean",
+        "m2",
+        "samples",
+        "highs",
+        "lows",
+        "ewma",
+        "ewma_at",
+    )
+
+    def __init__(self, seconds: int):
+        """
+        Args:
+            seconds: длина окна в секундах
+        """
+        self.seconds = seconds
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # (время в секундах, курс) в порядке поступления
+        self.samples: deque[tuple[float, float]] = deque()
+        # Кандидаты в максимум (курсы убывают) и минимум (курсы возрастают)
+        self.highs: deque[tuple[float, float]] = deque()
+        self.lows: deque[tuple[float, float]] = deque()
+        self.ewma: float | None = None
+        self.ewma_at: float | None = None
+
+    def add(self, at: float, rate: float):
+        """Учитывает курс на момент at (секунды с эпохи)"""
+        if self.samples and at <= self.samples[-1][0]:
+            # Курс того же или более раннего времени уже учтен
+            return
+        self.evict(at)
+
+        self.samples.append((at, rate))
+        self.count += 1
+        delta = rate - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (rate - self.mean)
+
+        while self.highs and self.highs[-1][1] <= rate:
+            self.highs.pop()
+        self.highs.append((at, rate))
+        while self.lows and self.lows[-1][1] >= rate:
+            self.lows.pop()
+        self.lows.append((at, rate))
+
+        if self.ewma is None:
+            self.ewma = rate
+        else:
+            # Вес нового курса зависит от времени с прошлого курса
+            alpha = 1 - math.exp(-(at - self.ewma_at) / self.seconds)
+            self.ewma += alpha * (rate - self.ewma)
+        self.ewma_at = at
+
+    def evict(self, now: float):
+        """Удаляет курсы старше окна, заканчивающегося в now"""
+        cutoff = now - self.seconds
+        while self.samples and self.samples[0][0] <= cutoff:
+            _, rate = self.samples.popleft()
+            self.count -= 1
+            if self.count == 0:
+                self.mean = self.m2 = 0.0
+            else:
+                delta = rate - self.mean
+                self.mean -= delta / self.count
+                self.m2 = max(self.m2 - delta * (rate - self.mean), 0.0)
+        while self.highs and self.highs[0][0] <= cutoff:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] <= cutoff:
+            self.lows.popleft()
+
+    @property
+    def high(self) -> float | None:
+        return self.highs[0][1] if self.highs else None
+
+    @property
+    def low(self) -> float | None:
+        return self.lows[0][1] if self.lows else None
+
+    @property
+    def last(self) -> float | None:
+        return self.samples[-1][1] if self.samples else None
+
+    @property
+    def std(self) -> float:
+        """Выборочное стандартное отклонение курса"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_record(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "samples": list(self.samples),
+            "highs": list(self.highs),
+            "lows": list(self.lows),
+            "ewma": self.ewma,
+            "ewma_at": self.ewma_at,
+        }
+
+    @classmethod
+    def from_record(cls, seconds: int, record: dict) -> "RollingWindow":
+        window = cls(seconds)
+        window.count = record["count"]
+        window.mean = record["mean"]
+        window.m2 = record["m2"]
+        window.samples = deque(tuple(item) for item in record["samples"])
+        window.highs = deque(tuple(item) for item in record["highs"])
+        window.lows = deque(tuple(item) for item in record["lows"])
+        window.ewma = record.get("ewma")
+        window.ewma_at = record.get("ewma_at")
+        return window
+
+
+class RollingStats:
+    """Скользящая статистика всех пар по набору окон"""
+
+    def __init__(self, windows: dict[str, int]):
+        """
+        Args:
+            windows: окна {"1h": 3600, "24h": 86400}
+        """
+        self.windows = windows
+        self.pairs: dict[str, dict[str, RollingWindow]] = {}
+
+    def add(self, pair: str, at: float, rate: float):
+        """Учитывает курс пары во всех окнах"""
+        pair_windows = self.pairs.get(pair)
+        if pair_windows is None:
+            pair_windows = self.pairs[pair] = {
+                name: RollingWindow(seconds) for name, seconds in self.windows.items()
+            }
+        for window in pair_windows.values():
+            window.add(at, rate)
+
+    def add_rates(self, rates: dict):
+        """Учитывает курсы в формате rates.json (rate и updated_at по паре)"""
+        for pair, value in rates.items():
+            rate = value.get("rate")
+            if rate is None:
+                continue
+            self.add(pair, timestamp(value.get("updated_at")), rate)
+
+    def get(self, pair: str) -> dict[str, RollingWindow] | None:
+        return self.pairs.get(pair)
+
+    def to_record(self) -> dict:
+        return {
+            "windows": self.windows,
+            "pairs": {
+                pair: {name: window.to_record() for name, window in windows.items()}
+                for pair, windows in self.pairs.items()
+            },
+        }
+
+    @classmethod
+    def from_record(
+        cls, record: dict | None, windows: dict[str, int]
+    ) -> "RollingStats":
+        """
+        Восстанавливает статистику; окна, которых нет в записи или длина
+        которых изменилась, начинаются заново
+        """
+        stats = cls(windows)
+        if not record:
+            return stats
+        saved = record.get("windows") or {}
+        for pair, pair_windows in (record.get("pairs") or {}).items():
+            stats.pairs[pair] = {
+                name: (
+                    RollingWindow.from_record(seconds, pair_windows[name])
+                    if name in pair_windows and saved.get(name) == seconds
+                    else RollingWindow(seconds)
+                )
+                for name, seconds in windows.items()
+            }
+        return stats
+
+
+def timestamp(value: str | None) -> float:
+    """Время в формате ISO в секундах с эпохи (без времени - текущее)"""
+    if not value:
+        return datetime.now().timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+def configured_windows() -> dict[str, int]:
+    """Окна из RATE_STATS_WINDOWS: {"1h": 3600, ...}"""
+    return {
+        name: history.parse_interval(name)
+        for name in app_config.get("RATE_STATS_WINDOWS")
+    }
+
+
+def load(db) -> RollingStats:
+    """Статистика из RATE_STATS_FILE"""
+    return RollingStats.from_record(
+        db.load(app_config.get("RATE_STATS_FILE")), configured_windows()
+    )
+
+
+def update(db, rates: dict) -> RollingStats:
+    """Учитывает новые курсы и сохраняет статистику"""
+    stats = load(db)
+    stats.add_rates(rates)
+    db.save(app_config.get("RATE_STATS_FILE"), stats.to_record())
+    return stats
+
+
+def rebuild(db) -> RollingStats:
+    """Пересчитывает статистику по истории курсов (exchange_rates.json) потоково"""
+    stats = RollingStats(configured_windows())
+    for record in db.iter_array(app_config.get("HISTORY_FILE")):
+        rate = record.get("rate")
+        if rate is not None:
+            stats.add(
+                f"{record['from_currency']}_{record['to_currency']}",
+                timestamp(record.get("timestamp")),
+                rate,
+            )
+    db.save(app_config.get("RATE_STATS_FILE"), stats.to_record())
+    return stats
@@ -0,0 +1,111 @@
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+
+from src.valutatrade_hub.core import models
+
+
+def _token_key(token: str) -> str:
+    """В файле хранится хеш токена, а не сам токен"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SessionManager:
+    """
+    Сессии пользователей
+
+    После входа выдается токен, который отображается на закешированный
+    объект User. Кеш ограничен по размеру (LRU) и по времени жизни
+    сессии, поэтому повторные команды с токеном не перечитывают
+    users.json и не вычисляют KDF. Сессии также сохраняются в файл, чтобы
+    токен работал в новых процессах.
+    """
+
+    def __init__(
+        self,
+        db,
+        sessions_file: str,
+        users_file: str,
+        ttl_seconds: int = 3600,
+        max_size: int = 1024,
+    ):
+        """
+        Args:
+            db: менеджер базы данных
+            sessions_file: файл с сохраненными сессиями
+            users_file: файл с пользователями
+            ttl_seconds: время жизни сессии
+            max_size: максимальное число сессий в памяти
+        """
+        self.db = db
+        self.sessions_file = sessions_file
+        self.users_file = users_file
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._cache: OrderedDict[str, tuple[models.User, float]] = OrderedDict()
+
+    def create(self, user: models.User) -> str:
+        """Создает сессию для пользователя и возвращает токен"""
+        token = secrets.token_urlsafe(32)
+        expires_at = time.time() + self.ttl_seconds
+
+        sessions = self._load_sessions()
+        now = time.time()
+        # Заодно вычищаем истекшие сессии
+        sessions = {
+            key: value for key, value in sessions.items()
+            if value["expires_at"] > now
+        }
+        sessions[_token_key(token)] = {
+            "user_id": user.user_id,
+            "expires_at": expires_at,
+        }
+        self.db.save(self.sessions_file, sessions)
+
+        self._remember(token, user, expires_at)
+        return token
+
+    def get(self, token: str) -> models.User | None:
+        """Возвращает пользователя по токену или None, если сессия недействительна"""
+        cached = self._cache.get(token)
+
+        if cached is not None:
+            user, expires_at = cached
+            if expires_at > time.time():
+                self._cache.move_to_end(token)
+                return user
+            del self._cache[token]
+            return None
+
+        session = self._load_sessions().get(_token_key(token))
+        if not session or session["expires_at"] <= time.time():
+            return None
+
+        user = self._load_user(session["user_id"])
+        if user is not None:
+            self._remember(token, user, session["expires_at"])
+        return user
+
+    def revoke(self, token: str):
+        """Завершает сессию"""
+        self._cache.pop(token, None)
+
+        sessions = self._load_sessions()
+        if sessions.pop(_token_key(token), None) is not None:
+            self.db.save(self.sessions_file, sessions)
+
+    def _remember(self, token: str, user: models.User, expires_at: float):
+        self._cache[token] = (user, expires_at)
+        self._cache.move_to_end(token)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _load_sessions(self) -> dict:
+        return self.db.load(self.sessions_file) or {}
+
+    def _load_user(self, user_id: int) -> models.User | None:
+        for record in self.db.load(self.users_file) or []:
+            if record["user_id"] == user_id:
+                return models.User.from_record(record)
+        return None
@@ -0,0 +1,188 @@
+"""
+Версионированные снимки курсов
+
+Каждое сохранение курсов публикует неизменяемый снимок с номером
+(snapshot_id в rates.json), последние снимки держатся в кольцевом буфере.
+Команда закрепляет один снимок и читает курсы только из него, поэтому
+сделка и ее запись в журнал видят один и тот же набор курсов.
+
+Читатели не берут блокировку: текущий снимок - одна ссылка, которая
+заменяется целиком после построения нового снимка.
+"""
+
+import threading
+import weakref
+from collections import deque
+from types import MappingProxyType
+from typing import Mapping
+
+from src.valutatrade_hub.infra import rate_client
+from src.valutatrade_hub.infra.settings import app_config
+
+
+class RateSnapshot:
+    """Неизменяемый набор курсов с номером"""
+
+    __slots__ = ("id", "pairs", "last_refresh")
+
+    def __init__(self, snapshot_id: int, pairs: dict, last_refresh: str | None):
+        """
+        Args:
+            snapshot_id: номер снимка
+            pairs: курсы {"BTC_USD": {"rate": ..., "updated_at": ...}}
+            last_refresh: время обновления курсов
+        """
+        self.id = snapshot_id
+        self.pairs: Mapping[str, Mapping] = MappingProxyType(
+            {key: MappingProxyType(dict(value)) for key, value in pairs.items()}
+        )
+        self.last_refresh = last_refresh
+
+
+class SnapshotStore:
+    """Кольцевой буфер последних снимков курсов одного менеджера базы"""
+
+    def __init__(self, db, filename: str, size: int = 16):
+        """
+        Args:
+            db: менеджер базы данных
+            filename: файл курсов (rates.json)
+            size: сколько последних снимков хранить
+        """
+        self.db = db
+        self.filename = filename
+        self._ring: deque[RateSnapshot] = deque(maxlen=max(size, 1))
+        self._latest: RateSnapshot | None = None
+        # Версия файла курсов (mtime в наносекундах, размер, изменения в
+        # буфере), из которой построен последний снимок
+        self._version: tuple[int, int, int] | None = None
+        self._lock = threading.Lock()
+
+    def next_id(self, file_id: int | None) -> int:
+        """Номер следующего снимка: больше номера в файле и в буфере"""
+        latest = self._latest
+        return max(file_id or 0, latest.id if latest is not None else 0) + 1
+
+    def publish(
+        self, pairs: dict, last_refresh: str | None, snapshot_id: int | None = None
+    ) -> RateSnapshot:
+        """
+        Публикует новый снимок
+
+        Args:
+            pairs: курсы
+            last_refresh: время обновления
+            snapshot_id: номер из rates.json (по умолчанию - следующий)
+        """
+        with self._lock:
+            return self._publish(pairs, last_refresh, snapshot_id)
+
+    def _publish(self, pairs, last_refresh, snapshot_id) -> RateSnapshot:
+        latest = self._latest
+        if latest is not None and snapshot_id == latest.id:
+            if pairs == latest.pairs and last_refresh == latest.last_refresh:
+                # Снимок уже построен читателем из записанного файла
+                self._version = self.db.version(self.filename)
+                return latest
+            # Другой процесс записал другие курсы под тем же номером: снимок
+            # получает новый номер, иначе кеши по номеру их не увидят
+            snapshot_id = latest.id + 1
+        if snapshot_id is None or (latest is not None and snapshot_id < latest.id):
+            snapshot_id = (latest.id + 1) if latest is not None else 1
+        snapshot = RateSnapshot(snapshot_id, pairs, last_refresh)
+        self._ring.append(snapshot)
+        self._version = self.db.version(self.filename)
+        # Ссылка заменяется последней: читатели видят либо старый снимок,
+        # либо полностью построенный новый
+        self._latest = snapshot
+        return snapshot
+
+    def current(self) -> RateSnapshot:
+        """
+        Последний снимок
+
+        Если файл курсов изменил другой процесс, снимок перестраивается.
+        Когда снимок уже публикуется, читатель не ждет и получает предыдущий.
+        """
+        latest = self._latest
+        if latest is not None and self.db.version(self.filename) == self._version:
+            return latest
+
+        if not self._lock.acquire(blocking=latest is None):
+            return latest
+        try:
+            latest = self._latest
+            if latest is not None and self.db.version(self.filename) == self._version:
+                return latest
+            rates = self.db.load(self.filename) or {}
+            return self._publish(
+                rates.get("pairs") or {},
+                rates.get("last_refresh"),
+                rates.get("snapshot_id"),
+            )
+        finally:
+            self._lock.release()
+
+    def current_remote(self, client: "rate_client.RateClient") -> RateSnapshot:
+        """
+        Последний снимок сервера курсов
+
+        Курсы передаются, только если номер снимка сервера отличается
+        от последнего снимка процесса.
+
+        Raises:
+            RateServerError: сервер недоступен
+        """
+        latest = self._latest
+        reply = client.rates(latest.id if latest is not None else None)
+        if reply.get("unchanged") and latest is not None:
+            return latest
+        with self._lock:
+            return self._publish(
+                reply["pairs"], reply["last_refresh"], reply["snapshot_id"]
+            )
+
+    def get(self, snapshot_id: int) -> RateSnapshot | None:
+        """Снимок по номеру, если он еще в буфере"""
+        for snapshot in reversed(self._ring):
+            if snapshot.id == snapshot_id:
+                return snapshot
+        return None
+
+
+_stores: "weakref.WeakKeyDictionary[object, SnapshotStore]" = (
+    weakref.WeakKeyDictionary()
+)
+_stores_lock = threading.Lock()
+
+
+def store(db) -> SnapshotStore:
+    """Хранилище снимков для менеджера базы"""
+    snapshot_store = _stores.get(db)
+    if snapshot_store is None:
+        with _stores_lock:
+            snapshot_store = _stores.get(db)
+            if snapshot_store is None:
+                snapshot_store = _stores[db] = SnapshotStore(
+                    db,
+                    app_config.get("RATES_FILE"),
+                    app_config.get("RATE_SNAPSHOTS"),
+                )
+    return snapshot_store
+
+
+def current(db) -> RateSnapshot:
+    """
+    Последний опубликованный снимок курсов
+
+    При запущенном сервере курсов снимок берется у него, иначе - из файла
+    курсов.
+    """
+    snapshot_store = store(db)
+    client = rate_client.get_client()
+    if client is not None:
+        try:
+            return snapshot_store.current_remote(client)
+        except rate_client.RateServerError:
+            pass
+    return snapshot_store.current()
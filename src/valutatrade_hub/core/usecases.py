@@ -1,16 +1,30 @@
+import heapq
+import os
+from datetime import datetime, timedelta
+
 import src.valutatrade_hub.const as const
 import src.valutatrade_hub.core.utils as utils
-from src.valutatrade_hub.core import currencies, models
+from src.valutatrade_hub.core import (
+    currencies,
+    history,
+    models,
+    orderbook,
+    pnl,
+    ratebook,
+    retention,
+    rolling,
+    snapshots,
+    valuation,
+)
+from src.valutatrade_hub.core.context import RequestContext
 from src.valutatrade_hub.core.exceptions import InsufficientFundsError
+from src.valutatrade_hub.core.sessions import SessionManager
 from src.valutatrade_hub.decorators import check_auth, error_handler, log_domain_action
+from src.valutatrade_hub.infra import metrics, rate_client, stats
 from src.valutatrade_hub.infra.database import DatabaseManager
+from src.valutatrade_hub.infra.memory import MemoryProfiler
+from src.valutatrade_hub.infra.profiler import CommandProfiler
 from src.valutatrade_hub.infra.settings import app_config
-from src.valutatrade_hub.parser_service import updater
-from src.valutatrade_hub.parser_service.api_client import (
-    CoinGeckoClient,
-    ExchangeRateApiClient,
-)
-from src.valutatrade_hub.parser_service.storage import Storage
 
 
 def exit():
@@ -20,14 +34,29 @@ def exit():
 
 def help():
     print("Доступные команды:")
-    print("register --username <username> --password <password> - регистрация нового пользователя")
-    print("login --username <username> --password <password> - авторизация пользователя")
-    print("show-portfolio --base <optional base_currency>  - показать портфель")
+    print("register --username <username> --password <password> - регистрация нового пользователя")  # noqa E501
+    print("bulk-register --file <users.csv> - зарегистрировать пользователей из CSV (username,password)")  # noqa E501
+    print("login --username <username> --password <password> - авторизация пользователя")  # noqa E501
+    print("logout - завершить сессию")
+    print("<любая команда> --token <token> - выполнить команду в сессии без повторного входа")  # noqa E501
+    print("show-portfolio --base <optional base_currency[,base_currency...]>  - показать портфель (несколько баз - колонками)")  # noqa E501
     print("buy --currency <currency> --amount <amount>   - купить валюту")
     print("sell --currency <currency> --amount <amount>  - продать валюту")
     print("get-rate --from <from_currency> --to <to_currency> - получить курс валюты")
     print("update-rates --source <optional source> - обновить курсы валют")
-    print("show-rates --currency <optional currency> --base <optional base_currency> --top <optional top> - показать курсы валют")
+    print("show-rates --currency <optional currency> --base <optional base_currency> --top <optional top> --page <optional page> --page-size <optional size> - показать курсы валют")  # noqa E501
+    print("place-order --side <buy|sell> --currency <currency> --amount <amount> --price <price> - выставить лимитную заявку")  # noqa E501
+    print("orders - показать открытые заявки")
+    print("pnl --base <optional base_currency> - показать прибыль и убыток по позициям")
+    print("portfolio-history --since <date> --interval <15m|1h|1d> --base <optional base_currency> - стоимость портфеля во времени")  # noqa E501
+    print("cancel-order --id <order_id> - отменить заявку")
+    print("stats - задержки операций (p50/p95/p99)")
+    print("profile <on|off> - профилировать каждую команду; <команда> --profile - одну команду")  # noqa E501
+    print("memprofile <on|off> - замерять память каждой команды; <команда> --memprofile - одной команды")  # noqa E501
+    print("log-report --since <optional date> --until <optional date> --top <optional top> - сводка по журналу операций")  # noqa E501
+    print("compact-history - свернуть старую историю курсов в часовые и дневные бары")  # noqa E501
+    print("rate-stats --pair <pair> --window <optional 1h|24h|7d> --rebuild <optional> - скользящая статистика курса")  # noqa E501
+    print("export --datasets <optional users,portfolios,ledger,history,history_1h,history_1d> --format <optional csv|parquet> --out <optional dir> --users <optional from-to> --pair <optional pair> --since <optional date> --until <optional date> --shards <optional count> - выгрузить данные")  # noqa E501
     print("exit - выход из программы")
 
 
@@ -54,7 +83,9 @@ def register(username: str | None, password: str | None, db: DatabaseManager):
     # Создаем нового пользователя
     id = len(users) + 1
     salt = utils.generate_salt()
-    hashed_password = utils.hashed_password(password, salt)
+    hashed_password = utils.hashed_password(
+        password, salt, app_config.get("PASSWORD_HASHING")
+    )
     user = utils.create_user(id, username, hashed_password, salt)
     users.append(user)
     result = db.save(app_config.get("USERS_FILE"), users)
@@ -74,6 +105,47 @@ def register(username: str | None, password: str | None, db: DatabaseManager):
         raise RuntimeError("Произошла ошибка при сохранении данных")
 
 
+@error_handler
+def bulk_register(path: str | None, db: DatabaseManager):
+    """Регистрация пользователей из CSV с колонками username,password"""
+
+    if not path:
+        raise ValueError("Укажите файл: bulk-register --file <users.csv>")
+
+    # Пул процессов и логгер нужны только этой команде
+    from src.valutatrade_hub.core import bulk
+    from src.valutatrade_hub.logging_config import get_action_logger
+
+    settings = app_config.get("BULK_REGISTER")
+    try:
+        result = bulk.bulk_register(
+            db,
+            path,
+            app_config.get("USERS_FILE"),
+            app_config.get("PORTFOLIOS_FILE"),
+            app_config.get("BASE_CURRENCY"),
+            app_config.get("PASSWORD_HASHING"),
+            workers=settings.get("workers"),
+            chunk_size=settings.get("chunk_size", 256),
+        )
+    except FileNotFoundError:
+        raise ValueError(f"Файл '{path}' не найден")
+
+    get_action_logger().info(
+        f"Bulk registration from {path}: {result.created} created, "
+        f"{len(result.rejected)} rejected",
+        extra={"action": const.LOG_ACTION_REGISTER},
+    )
+
+    print(
+        f"Зарегистрировано: {result.created}, отклонено: {len(result.rejected)} "
+        f"за {result.total_seconds:.2f} с ({result.rate:.1f} аккаунтов/с, "
+        f"хеширование {result.hash_seconds:.2f} с)"
+    )
+    for line, username, reason in result.rejected:
+        print(f"- строка {line}: '{username}' - {reason}")
+
+
 @error_handler
 @log_domain_action(const.LOG_ACTION_LOGIN)
 def login(username: str | None, password: str | None, db: DatabaseManager):
@@ -94,85 +166,251 @@ def login(username: str | None, password: str | None, db: DatabaseManager):
     if not current_user:
         raise ValueError(f"Пользователь '{username}' не найден")
 
-    hashed_password = utils.hashed_password(password, current_user["salt"])
-
-    if current_user["hashed_password"] != hashed_password:
+    if not utils.verify_password(
+        password, current_user["salt"], current_user["hashed_password"]
+    ):
         raise ValueError("Неверный пароль")
 
+    # Переводим хеш на текущие параметры KDF (в т.ч. устаревший SHA-256)
+    hash_params = app_config.get("PASSWORD_HASHING")
+    if utils.needs_rehash(current_user["hashed_password"], hash_params):
+        current_user["hashed_password"] = utils.hashed_password(
+            password, current_user["salt"], hash_params
+        )
+        db.save(app_config.get("USERS_FILE"), users)
+
     print(f"Вы вошли как '{username}'")
 
-    return models.User(
-        user_id=current_user["user_id"],
-        username=current_user["username"],
-        hashed_password=current_user["hashed_password"],
-        salt=current_user["salt"],
-        registration_date=current_user["registration_date"],
+    return models.User.from_record(current_user)
+
+
+@error_handler
+def start_session(user: models.User, sessions: SessionManager) -> str:
+    """Выдать токен сессии после входа"""
+
+    token = sessions.create(user)
+    print(
+        f"Токен сессии: {token} (действует {sessions.ttl_seconds} с). "
+        "Передавайте --token вместо повторного входа"
     )
+    return token
+
+
+@error_handler
+def logout(token: str | None, sessions: SessionManager):
+    """Выход из сессии"""
+
+    if not token:
+        raise ValueError("Нет активной сессии")
+
+    sessions.revoke(token)
+    print("Сессия завершена")
 
 
 @error_handler
 @check_auth
 def show_portfolio(
-    user: models.User, db, base_currency=app_config.get("BASE_CURRENCY")
+    user: models.User,
+    db,
+    base_currency: str | None = None,
+    ctx: RequestContext | None = None,
 ):
-    """Показать портфель"""
+    """
+    Показать портфель
 
-    portfolios = db.load(app_config.get("PORTFOLIOS_FILE")) or []
-    user_portfolio = utils.get_user_portfolio(
-        portfolios, user.user_id, models.Portfolio
-    )
+    base_currency - одна база или несколько через запятую (USD,EUR,BTC):
+    все колонки считаются по одному снимку курсов за один проход
+    (по умолчанию - BASE_CURRENCY)
+    """
+    if base_currency is None:
+        base_currency = app_config.get("BASE_CURRENCY")
+
+    ctx = ctx or RequestContext(db, user)
+    user_portfolio = ctx.portfolio()
 
     if not user_portfolio.wallets:
         raise ValueError("В портфеле нет кошельков")
 
-    if base_currency not in const.CURRENCY:
-        raise ValueError(f"Неизвестная базовая валюта '{base_currency}'")
+    bases = list(
+        dict.fromkeys(
+            code.strip().upper() for code in base_currency.split(",") if code.strip()
+        )
+    )
+    for base in bases:
+        if not currencies.is_supported(base):
+            raise ValueError(f"Неизвестная базовая валюта '{base}'")
+    if not bases:
+        raise ValueError("Укажите базовую валюту")
+
+    rows, totals, missing = valuation.value_table(
+        user_portfolio.wallets, ctx.pairs, bases, app_config.get("BASE_CURRENCY")
+    )
 
-    rates = db.load(app_config.get("RATES_FILE")) or {}
-    pairs = rates.get("pairs") or {}
+    # Стоимость в криптовалюте нужна с большей точностью
+    digits = [
+        8 if isinstance(currencies.get_currency(base), currencies.CryptoCurrency)
+        else 2
+        for base in bases
+    ]
 
-    print(f"Портфель пользователя '{user.username}' (база: {base_currency}):")
+    def cell(value: float | None, precision: int) -> str:
+        return "н/д" if value is None else f"{value:,.{precision}f}"
 
-    for key, value in user_portfolio.wallets.items():
-        converted_currency = utils.convert_currency(
-            value.get("balance"), key, base_currency, pairs
+    print(f"Портфель пользователя '{user.username}' (база: {', '.join(bases)}):")
+    print(f"{'Валюта':<8}{'Баланс':>20}" + "".join(f"{base:>20}" for base in bases))
+    for code, balance, values in rows:
+        print(
+            f"{code:<8}{balance:>20,.8g}"
+            + "".join(
+                f"{cell(value, precision):>20}"
+                for value, precision in zip(values, digits)
+            )
         )
-        if converted_currency is not None:
+    print("-" * (28 + 20 * len(bases)))
+    print(
+        f"{'ИТОГО':<28}"
+        + "".join(
+            f"{cell(total, precision):>20}" for total, precision in zip(totals, digits)
+        )
+    )
+    for base, codes in zip(bases, missing):
+        if codes:
+            print(f"Нет курса к {base} (н/д, не входят в итог): {', '.join(codes)}")
+
+
+@error_handler
+@check_auth
+def show_pnl(
+    user: models.User,
+    db: DatabaseManager,
+    base_currency: str | None = None,
+    ctx: RequestContext | None = None,
+):
+    """Показать реализованный и нереализованный результат по позициям"""
+    if base_currency is None:
+        base_currency = app_config.get("BASE_CURRENCY")
+
+    ctx = ctx or RequestContext(db, user)
+    portfolio_record = ctx.portfolio_record()
+
+    positions = portfolio_record.get("cost_basis") or {}
+
+    if not positions:
+        raise ValueError("Сделок по портфелю еще не было")
+
+    pairs = ctx.pairs
+    trade_currency = app_config.get("BASE_CURRENCY")
+    # Себестоимость учитывается в валюте расчетов, для вывода - пересчет в base
+    factor = utils.get_conversion_rate(trade_currency, base_currency, pairs)
+
+    print(f"P&L пользователя '{user.username}' (база: {base_currency}):")
+
+    total_realized = 0.0
+    total_unrealized = 0.0
+
+    for currency in positions:
+        cost_basis = pnl.get_cost_basis(portfolio_record, currency)
+        realized = cost_basis.realized * factor
+        total_realized += realized
+
+        try:
+            rate = utils.get_rate(currency, trade_currency, pairs)
+        except ValueError:
             print(
-                f"- {key}: {value.get("balance")}  → {converted_currency} {base_currency}"  # noqa E501
+                f"- {currency}: {cost_basis.amount} по средней цене "
+                f"{cost_basis.average_price * factor:.2f}, курс недоступен, "
+                f"реализовано {realized:.2f}"
             )
+            continue
+
+        unrealized = cost_basis.unrealized(rate) * factor
+        total_unrealized += unrealized
+        print(
+            f"- {currency}: {cost_basis.amount} по средней цене "
+            f"{cost_basis.average_price * factor:.2f}, "
+            f"нереализовано {unrealized:+.2f}, реализовано {realized:+.2f}"
+        )
 
     print("---------------------------------")
+    print(f"Реализовано: {total_realized:+.2f} {base_currency}")
+    print(f"Нереализовано: {total_unrealized:+.2f} {base_currency}")
 
-    total_value = user_portfolio.get_total_value(pairs, base_currency)
 
-    if total_value is not None:
-        print(f"ИТОГО: {total_value} {base_currency}")
+@error_handler
+@check_auth
+def show_portfolio_history(
+    user: models.User,
+    since: str | None,
+    interval: str | None,
+    base_currency: str | None,
+    db: DatabaseManager,
+):
+    """Показать стоимость портфеля на границах интервалов"""
+
+    try:
+        since_date = (
+            datetime.fromisoformat(since)
+            if since
+            else datetime.now() - timedelta(days=30)
+        )
+    except ValueError:
+        raise ValueError(f"Некорректная дата '{since}', пример: 2025-10-01")
+
+    base_currency = base_currency or app_config.get("BASE_CURRENCY")
+    currencies.get_currency(base_currency)
+
+    series = history.portfolio_value_series(
+        db, user.user_id, since_date, interval or "1d", base_currency
+    )
+
+    if not series:
+        raise ValueError("Нет точек в выбранном периоде")
+
+    print(f"История портфеля '{user.username}' (база: {base_currency}):")
+    for timestamp, value in series:
+        if value is None:
+            print(f"- {timestamp}: н/д")
+        else:
+            print(f"- {timestamp}: {value:.2f} {base_currency}")
+
+
+def _check_not_base(currency: str):
+    """Базовая валюта - сторона расчетов, ее нельзя купить или продать"""
+    if currency == app_config.get("BASE_CURRENCY"):
+        raise ValueError(
+            f"{currency} - валюта расчетов, ее нельзя купить или продать за себя"
+        )
 
 
 @error_handler
 @log_domain_action(const.LOG_ACTION_BUY)
 @check_auth
-def buy(user: models.User, currency: str, amount: float, db):
+def buy(
+    user: models.User,
+    currency: str,
+    amount: float,
+    db,
+    ctx: RequestContext | None = None,
+):
     """Купить валюту"""
 
     currencies.get_currency(currency)
+    _check_not_base(currency)
 
     utils.validate_positive_number(amount, "количества валюты", no_zero=True)
 
-    portfolios = db.load(app_config.get("PORTFOLIOS_FILE")) or []
-    user_portfolio = utils.get_user_portfolio(
-        portfolios, user.user_id, models.Portfolio
-    )
-
-    if currency not in user_portfolio.wallets:
-        user_portfolio.add_currency(currency)
+    ctx = ctx or RequestContext(db, user)
+    user_portfolio = ctx.portfolio()
 
-    cur_wallet_data = user_portfolio.get_wallet(currency)
-    usd_wallet_data = user_portfolio.get_wallet(app_config.get("BASE_CURRENCY"))
+    # Кошельки - копии балансов: портфель меняется только после всех
+    # проверок и получения курса
+    if currency in user_portfolio.wallets:
+        cur_wallet = user_portfolio.get_wallet(currency)
+    else:
+        cur_wallet = models.Wallet(currency)
+    usd_wallet = user_portfolio.get_wallet(app_config.get("BASE_CURRENCY"))
 
-    rates = db.load(app_config.get("RATES_FILE")) or {}
-    pairs = rates.get("pairs") or {}
+    pairs = ctx.pairs
     usd_amount = utils.convert_currency(
         amount, currency, app_config.get("BASE_CURRENCY"), pairs
     )
@@ -180,35 +418,42 @@ def buy(user: models.User, currency: str, amount: float, db):
     if usd_amount is None:
         raise ValueError(f"Невозможно приобрести {amount} {currency}")
 
-    if usd_wallet_data.get("balance") < usd_amount:
+    if usd_wallet.balance < usd_amount:
         raise InsufficientFundsError(f"для приобретения {amount} {currency}")
 
-    usd_wallet = models.Wallet(
-        app_config.get("BASE_CURRENCY"), usd_wallet_data.get("balance")
-    )
-    usd_wallet.withdraw(usd_amount)
+    rate = utils.get_rate(currency, app_config.get("BASE_CURRENCY"), pairs)
 
-    cur_wallet = models.Wallet(currency, cur_wallet_data.get("balance"))
+    old_balance = cur_wallet.balance
+    usd_wallet.withdraw(usd_amount)
     cur_wallet.deposit(amount)
 
-    rate = utils.get_rate(currency, app_config.get("BASE_CURRENCY"), pairs)
-
-    for _portfolio in portfolios:
-        if _portfolio.get("user_id") == user.user_id:
-            _portfolio.get("wallets")[currency] = {"balance": cur_wallet.balance}
-            _portfolio.get("wallets")[app_config.get("BASE_CURRENCY")] = {
-                "balance": usd_wallet.balance
+    if currency not in user_portfolio.wallets:
+        user_portfolio.add_currency(currency)
+    user_portfolio.save_wallet(usd_wallet)
+    user_portfolio.save_wallet(cur_wallet)
+    ctx.rate = rate
+
+    portfolio_record = ctx.portfolio_record()
+    portfolio_record.update(user_portfolio.to_record())
+    pnl.record_trade(portfolio_record, const.SIDE_BUY, currency, amount, rate)
+
+    db.save(app_config.get("PORTFOLIOS_FILE"), ctx.portfolios)
+    history.record_balances(
+        db,
+        {
+            user.user_id: {
+                currency: cur_wallet.balance,
+                app_config.get("BASE_CURRENCY"): usd_wallet.balance,
             }
-            break
-
-    db.save(app_config.get("PORTFOLIOS_FILE"), portfolios)
+        },
+    )
 
     print(
-        f"Покупка выполнена: {amount} {currency} по курсу {rate} {app_config.get("BASE_CURRENCY")}/{currency}"  # noqa E501
+        f"Покупка выполнена: {amount} {currency} по курсу {rate} {app_config.get("BASE_CURRENCY")}/{currency} (снимок курсов #{ctx.snapshot_id})"  # noqa E501
     )
     print("Изменения в портфеле:")
     print(
-        f"- {currency}: было {cur_wallet_data.get('balance')} → стало {cur_wallet.balance}"  # noqa E501
+        f"- {currency}: было {old_balance} → стало {cur_wallet.balance}"
     )
     print(f"Оценочная стоимость покупки: {usd_amount} USD")
 
@@ -216,95 +461,114 @@ def buy(user: models.User, currency: str, amount: float, db):
 @error_handler
 @log_domain_action(const.LOG_ACTION_SELL)
 @check_auth
-def sell(user: models.User, currency: str, amount: float, db: DatabaseManager):
+def sell(
+    user: models.User,
+    currency: str,
+    amount: float,
+    db: DatabaseManager,
+    ctx: RequestContext | None = None,
+):
     """Продать валюту"""
 
     currencies.get_currency(currency)
+    _check_not_base(currency)
 
     utils.validate_positive_number(amount, "количества валюты", no_zero=True)
 
-    portfolios = db.load(app_config.get("PORTFOLIOS_FILE")) or []
-    user_portfolio = utils.get_user_portfolio(
-        portfolios, user.user_id, models.Portfolio
-    )
+    ctx = ctx or RequestContext(db, user)
+    user_portfolio = ctx.portfolio()
 
     try:
-        cur_wallet_data = user_portfolio.get_wallet(currency)
+        cur_wallet = user_portfolio.get_wallet(currency)
     except ValueError:
         raise ValueError(
             f"У вас нет кошелька '{currency}'. Добавьте валюту: она создаётся автоматически при первой покупке."  # noqa E501
         )
 
-    usd_wallet_data = user_portfolio.get_wallet(app_config.get("BASE_CURRENCY"))
+    usd_wallet = user_portfolio.get_wallet(app_config.get("BASE_CURRENCY"))
 
-    if cur_wallet_data.get("balance") < amount:
+    if cur_wallet.balance < amount:
         raise InsufficientFundsError(
-            f"доступно {cur_wallet_data.get("balance")} {currency}, требуется {amount} {currency}"  # noqa E501
+            f"доступно {cur_wallet.balance} {currency}, требуется {amount} {currency}"  # noqa E501
         )
 
-    cur_wallet = models.Wallet(currency, cur_wallet_data.get("balance"))
-    cur_wallet.withdraw(amount)
-
-    rates = db.load(app_config.get("RATES_FILE")) or {}
-    pairs = rates.get("pairs")
+    pairs = ctx.pairs
     rate = utils.get_rate(currency, app_config.get("BASE_CURRENCY"), pairs)
 
     usd_amount = utils.convert_currency(
         amount, currency, app_config.get("BASE_CURRENCY"), pairs
     )
 
-    usd_wallet = models.Wallet(
-        app_config.get("BASE_CURRENCY"), usd_wallet_data.get("balance")
-    )
-    usd_wallet.withdraw(usd_amount)
-
-    for _portfolio in portfolios:
-        if _portfolio.get("user_id") == user.user_id:
-            _portfolio.get("wallets")[currency] = {"balance": cur_wallet.balance}
-            _portfolio.get("wallets")[app_config.get("BASE_CURRENCY")] = {
-                "balance": usd_wallet.balance
+    old_balance = cur_wallet.balance
+    cur_wallet.withdraw(amount)
+    usd_wallet.deposit(usd_amount)
+
+    user_portfolio.save_wallet(cur_wallet)
+    user_portfolio.save_wallet(usd_wallet)
+    ctx.rate = rate
+
+    portfolio_record = ctx.portfolio_record()
+    portfolio_record.update(user_portfolio.to_record())
+    pnl.record_trade(portfolio_record, const.SIDE_SELL, currency, amount, rate)
+
+    db.save(app_config.get("PORTFOLIOS_FILE"), ctx.portfolios)
+    history.record_balances(
+        db,
+        {
+            user.user_id: {
+                currency: cur_wallet.balance,
+                app_config.get("BASE_CURRENCY"): usd_wallet.balance,
             }
-            break
-
-    db.save(app_config.get("PORTFOLIOS_FILE"), portfolios)
+        },
+    )
 
     print(
-        f"Продажа выполнена: {amount} {currency} по курсу {rate} {app_config.get("BASE_CURRENCY")}/{currency}"  # noqa E501
+        f"Продажа выполнена: {amount} {currency} по курсу {rate} {app_config.get("BASE_CURRENCY")}/{currency} (снимок курсов #{ctx.snapshot_id})"  # noqa E501
     )
     print("Изменения в портфеле:")
     print(
-        f"- {currency}: было {cur_wallet_data.get('balance')} → стало {cur_wallet.balance}"  # noqa E501
+        f"- {currency}: было {old_balance} → стало {cur_wallet.balance}"
     )
     print(f"Оценочная выручка: {usd_amount} USD")
 
 @error_handler
 def update_rates(source: str | None, db: DatabaseManager):
-
-    clients = []
-        
-    match source:
-        case "coingecko":
-            clients = [CoinGeckoClient()]
-        case "exchangerate":
-            clients = [ExchangeRateApiClient()]    
-        case _:
-            clients = [CoinGeckoClient(), ExchangeRateApiClient()]   
-        
-    storage = Storage(db)
-    rates_updater = updater.RatesUpdater(clients, storage)
-    rates_updater.run_update()
+    # При запущенном сервере курсов провайдеров опрашивает только он
+    client = rate_client.get_client()
+    if client is not None:
+        try:
+            reply = client.refresh(source)
+        except rate_client.RateServerUnavailable:
+            # Сервер не отвечает - курсы запрашиваются напрямую
+            pass
+        except rate_client.RateServerError as e:
+            # Сервер работает, но провайдеры не ответили: повторный запрос
+            # из процесса обошел бы ограничение частоты запросов сервера
+            raise RuntimeError(f"Сервер курсов не обновил курсы: {e}") from e
+        else:
+            # Одновременные запросы процессов обслуживаются одним обновлением
+            state = "обновлены" if reply["fetched"] else "уже обновлены"
+            print(f"Курсы {state} сервером курсов (снимок #{reply['snapshot_id']})")
+            return
+
+    # Клиенты API (requests, dotenv) импортируются только при обновлении
+    from src.valutatrade_hub.parser_service import updater
+
+    updater.create_updater(db, source).run_update()
 
 @error_handler
 def get_rate_action(
     from_currency: str | None, to_currency: str | None, db: DatabaseManager
 ):
-    if (from_currency not in const.CURRENCY) or (to_currency not in const.CURRENCY):
+    if not (
+        currencies.is_supported(from_currency)
+        and currencies.is_supported(to_currency)
+    ):
         raise ValueError(
             f"Невозможно конвертировать валюту {from_currency} в {to_currency}"
         )
 
-    rates = db.load(app_config.get("RATES_FILE")) or {}
-    pairs = rates.get("pairs") or {}
+    pairs = snapshots.current(db).pairs
     rate_key = f"{from_currency}_{to_currency}"
     rate_data = pairs.get(rate_key) or {}
     is_old = utils.is_old_update(
@@ -313,8 +577,9 @@ def get_rate_action(
 
     if not pairs or is_old:
         update_rates(None, db)
-        get_rate_action(from_currency, to_currency, db)
-        return
+        rate_data = snapshots.current(db).pairs.get(rate_key) or {}
+        if rate_data.get("rate") is None:
+            raise ValueError(f"Курс {rate_key} недоступен")
 
     print(
         f"Курс {rate_key}: {rate_data.get('rate')} (обновлено: {rate_data.get("updated_at")})"  # noqa E501
@@ -323,26 +588,420 @@ def get_rate_action(
 
 
 @error_handler
-def show_rates(currency_filter: str | None, top_filter: int | None, base_currency: str | None, db: DatabaseManager): # noqa E501
-    rates = db.load(app_config.get("RATES_FILE")) or {}
-    pairs = rates.get("pairs") or {}
+def show_rates(
+    currency_filter: str | None,
+    top_filter: int | None,
+    base_currency: str | None,
+    db: DatabaseManager,
+    page: int | None = None,
+    page_size: int | None = None,
+):
+    """
+    Показать курсы из кеша
 
-    if not pairs:
+    Фильтры по валюте и базе работают вместе; --top оставляет пары
+    с наибольшим курсом, --page/--page-size разбивают результат на страницы.
+    """
+    snapshot = snapshots.current(db)
+
+    if not snapshot.pairs:
         print("Файл кеша пуст или не найден →")
         print(f"Локальный кеш курсов пуст. Выполните '{const.CMD_UPDATE_RATES}', чтобы загрузить данные.") # noqa E501
-    
-    if currency_filter:
-        pairs = {key: value for key, value in pairs.items() if key.startswith(currency_filter)} # noqa E501
+        return
+
+    book = ratebook.get_book(db, snapshot)
+
+    offset, limit = 0, None
+    if page is not None or page_size is not None:
+        page = page or 1
+        page_size = page_size or app_config.get("RATES_PAGE_SIZE")
+        if page < 1 or page_size < 1:
+            raise ValueError("Номер и размер страницы должны быть положительными")
+        offset, limit = (page - 1) * page_size, page_size
+
+    pairs = book.query(
+        currency=currency_filter or None,
+        base=base_currency or None,
+        top=top_filter or None,
+        offset=offset,
+        limit=limit,
+    )
 
-        if not pairs:
+    if not pairs:
+        if currency_filter:
             raise ValueError(f"\nВалюта не найдена →\nКурс для '{currency_filter}' не найден в кеше.") # noqa E501
+        print("Нет курсов для выбранных фильтров")
+        return
 
-    if top_filter:
-        pairs = dict(sorted(pairs.items(), key=lambda item: item[1].get("rate"), reverse=True)[:top_filter])  # noqa E501
-        print(f"Rates from cache (updated at {pairs.get('last_refresh')}):")
+    print(f"Rates from cache (updated at {book.last_refresh}):")
+    for key, value in pairs:
+        print(f"- {key}: {value.get('rate')}")
 
-    if base_currency:
-        pairs = {key: value for key, value in pairs.items() if key.endswith(base_currency)}  # noqa E501    
 
-    for key, value in pairs.items():
-        print(f"- {key}: {value.get('rate')}")
+@error_handler
+@log_domain_action(const.LOG_ACTION_ORDER)
+@check_auth
+def place_order(
+    user: models.User,
+    side: str | None,
+    currency: str,
+    amount: float,
+    price: float,
+    db: DatabaseManager,
+):
+    """Выставить лимитную заявку"""
+
+    if side not in (const.SIDE_BUY, const.SIDE_SELL):
+        raise ValueError(
+            f"Направление заявки должно быть {const.SIDE_BUY} или {const.SIDE_SELL}" # noqa E501
+        )
+
+    currencies.get_currency(currency)
+    base_currency = app_config.get("BASE_CURRENCY")
+
+    if currency == base_currency:
+        raise ValueError(f"Нельзя выставить заявку на базовую валюту {base_currency}")
+
+    utils.validate_positive_number(amount, "количества валюты", no_zero=True)
+    utils.validate_positive_number(price, "цены", no_zero=True)
+
+    books = orderbook.OrderBooks.from_record(db.load(app_config.get("ORDERS_FILE")))
+    order = orderbook.LimitOrder(
+        order_id=books.next_id(),
+        user_id=user.user_id,
+        side=side,
+        currency=currency,
+        base_currency=base_currency,
+        amount=amount,
+        price=price,
+    )
+    books.add(order)
+    db.save(app_config.get("ORDERS_FILE"), books.to_record())
+
+    condition = "≤" if side == const.SIDE_BUY else "≥"
+    print(
+        f"Заявка #{order.order_id} выставлена: {side} {amount} {currency}, "
+        f"когда {order.pair} {condition} {price}"
+    )
+
+
+@error_handler
+@check_auth
+def show_orders(user: models.User, db: DatabaseManager):
+    """Показать открытые заявки пользователя"""
+
+    books = orderbook.OrderBooks.from_record(db.load(app_config.get("ORDERS_FILE")))
+    orders = books.open_orders(user.user_id)
+
+    if not orders:
+        print("Открытых заявок нет")
+        return
+
+    print(f"Открытые заявки пользователя '{user.username}':")
+    for order in orders:
+        print(
+            f"- #{order.order_id}: {order.side} {order.amount} {order.currency} "
+            f"по {order.price} {order.base_currency} (создана {order.created_at})"
+        )
+
+
+@error_handler
+@check_auth
+def cancel_order(user: models.User, order_id: int, db: DatabaseManager):
+    """Отменить заявку"""
+
+    books = orderbook.OrderBooks.from_record(db.load(app_config.get("ORDERS_FILE")))
+
+    if books.get(order_id).user_id != user.user_id:
+        raise ValueError(f"Заявка #{order_id} не найдена")
+
+    books.cancel(order_id)
+    db.save(app_config.get("ORDERS_FILE"), books.to_record())
+
+    print(f"Заявка #{order_id} отменена")
+
+
+@error_handler
+def show_stats():
+    """Показать задержки доменных операций и их фаз"""
+
+    if not stats.registry.enabled:
+        print("Сбор статистики выключен (STATS_ENABLED)")
+        return
+
+    summary = stats.registry.summary()
+    if not summary:
+        print("Операций еще не было")
+        return
+
+    print(
+        f"{'Операция':<24}{'Кол-во':>8}{'p50, мс':>10}{'p95, мс':>10}"
+        f"{'p99, мс':>10}{'max, мс':>10}"
+    )
+    for item in summary:
+        print(
+            f"{item['name']:<24}{item['count']:>8}"
+            f"{item['p50_ns'] / 1e6:>10.3f}{item['p95_ns'] / 1e6:>10.3f}"
+            f"{item['p99_ns'] / 1e6:>10.3f}{item['max_ns'] / 1e6:>10.3f}"
+        )
+
+
+@error_handler
+def set_profiling(profiler: CommandProfiler, state: str | None):
+    """Включить или выключить профилирование команд"""
+
+    if state not in ("on", "off"):
+        raise ValueError("Использование: profile on|off")
+
+    profiler.enabled = state == "on"
+    if profiler.enabled:
+        print(
+            f"Профилирование включено (доля команд: {profiler.sample_rate:.0%}), "
+            f"результаты в {profiler.directory}"
+        )
+    else:
+        print("Профилирование выключено")
+
+
+@error_handler
+def set_memory_profiling(memory_profiler: MemoryProfiler, state: str | None):
+    """Включить или выключить замер памяти команд"""
+
+    if state not in ("on", "off"):
+        raise ValueError("Использование: memprofile on|off")
+
+    memory_profiler.enabled = state == "on"
+    if memory_profiler.enabled:
+        print("Замер памяти включен")
+    else:
+        print("Замер памяти выключен")
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Некорректная дата '{value}', пример: 2025-10-01")
+
+
+@error_handler
+def show_log_report(since: str | None, until: str | None, top: str | None):
+    """Сводка по журналу операций, включая ротированные и сжатые файлы"""
+    from src.valutatrade_hub.infra import log_report
+
+    since_date = _parse_date(since)
+    until_date = _parse_date(until)
+    if until and until_date and len(until) <= 10:
+        # Дата без времени включает весь день
+        until_date += timedelta(days=1) - timedelta(seconds=1)
+
+    try:
+        top_count = int(top) if top else 10
+    except ValueError:
+        top_count = 0
+    if top_count <= 0:
+        raise ValueError("Значение top должно быть положительным целым числом")
+
+    settings = app_config.get("LOGGING")
+    report = log_report.build_report(
+        settings.get("dir", "logs"),
+        since_date,
+        until_date,
+        settings.get("report_workers"),
+    )
+
+    if not report.actions:
+        print("В журнале нет записей за выбранный период")
+        return
+
+    print(f"Журнал операций: {report.first} - {report.last}")
+    print(f"Записей: {report.lines}, нераспознанных строк: {report.skipped}")
+
+    print(f"{'Операция':<12}{'Кол-во':>10}{'Ошибок':>10}{'Доля':>8}")
+    for action, (total, errors) in sorted(report.actions.items()):
+        print(f"{action:<12}{total:>10}{errors:>10}{errors / total:>8.1%}")
+
+    if report.errors:
+        print("Ошибки по типу:")
+        for error_type, count in sorted(
+            report.errors.items(), key=lambda item: item[1], reverse=True
+        ):
+            print(f"- {error_type}: {count}")
+
+    if report.users:
+        print(f"Самые активные пользователи (топ {top_count}):")
+        users = heapq.nlargest(
+            top_count, report.users.items(), key=lambda item: item[1]
+        )
+        for username, count in users:
+            print(f"- {username}: {count}")
+
+    if report.volume:
+        print("Объем сделок по валютам (куплено / продано):")
+        for currency, (bought, sold) in sorted(report.volume.items()):
+            print(f"- {currency}: {bought:.4f} / {sold:.4f}")
+
+
+@error_handler
+def compact_history(db: DatabaseManager):
+    """Сворачивает старые тики истории курсов в часовые и дневные бары"""
+    result = retention.compact(db)
+    if not result.ticks and not result.daily:
+        print("История курсов уже сжата: свернуть нечего")
+        return
+    print(f"Тиков свернуто в часовые бары: {result.ticks} (баров: {result.hourly})")
+    print(f"Часовых баров свернуто в дневные: {result.daily}")
+    print(f"Осталось тиков: {result.raw_left}")
+
+
+@error_handler
+def show_rate_stats(
+    pair: str | None, window: str | None, rebuild: bool, db: DatabaseManager
+):
+    """Скользящие максимум, минимум, среднее, волатильность и EWMA пары"""
+
+    if rebuild:
+        stats = rolling.rebuild(db)
+        print(f"Статистика пересчитана по истории: пар {len(stats.pairs)}")
+        if not pair:
+            return
+    else:
+        stats = rolling.load(db)
+
+    if not pair:
+        raise ValueError("Укажите пару: rate-stats --pair BTC_USD")
+    pair = pair.strip().upper()
+
+    pair_windows = stats.get(pair)
+    if pair_windows is None:
+        raise ValueError(
+            f"Нет статистики для '{pair}'. Выполните '{const.CMD_UPDATE_RATES}' "
+            f"или '{const.CMD_RATE_STATS} --rebuild'"
+        )
+    if window and window not in pair_windows:
+        raise ValueError(
+            f"Неизвестное окно '{window}', доступны: {', '.join(pair_windows)}"
+        )
+
+    now = datetime.now().timestamp()
+    print(f"Статистика {pair}:")
+    print(
+        f"{'Окно':<6}{'Курсов':>8}{'Мин':>16}{'Макс':>16}{'Среднее':>16}"
+        f"{'Ст. откл.':>14}{'Вол.':>8}{'EWMA':>16}"
+    )
+    for name, stat in pair_windows.items():
+        if window and name != window:
+            continue
+        # Окно заканчивается сейчас: курсы старше окна отбрасываются
+        stat.evict(now)
+        if not stat.count:
+            print(f"{name:<6}{0:>8}  нет курсов за окно")
+            continue
+        volatility = stat.std / stat.mean if stat.mean else 0.0
+        print(
+            f"{name:<6}{stat.count:>8}{stat.low:>16.6f}{stat.high:>16.6f}"
+            f"{stat.mean:>16.6f}{stat.std:>14.6f}{volatility:>8.2%}{stat.ewma:>16.6f}"
+        )
+
+
+def _parse_user_range(value: str | None) -> tuple[int | None, int | None]:
+    """Диапазон user_id вида 100-200, 100-, -200 или 100"""
+    if not value:
+        return None, None
+    first, separator, last = value.partition("-")
+    try:
+        user_from = int(first) if first else None
+        user_to = int(last) if last else None
+    except ValueError:
+        raise ValueError(f"Некорректный диапазон пользователей '{value}', пример: 1-1000") # noqa E501
+    if not separator:
+        user_to = user_from
+    return user_from, user_to
+
+
+@error_handler
+def export_data(
+    datasets: str | None,
+    fmt: str | None,
+    out_dir: str | None,
+    users: str | None,
+    pair: str | None,
+    since: str | None,
+    until: str | None,
+    shards: str | None,
+    db: DatabaseManager,
+):
+    """Выгрузка пользователей, портфелей, журнала и истории курсов в CSV/Parquet"""
+    from src.valutatrade_hub.infra import export
+
+    settings = app_config.get("EXPORT")
+
+    since_date = _parse_date(since)
+    until_date = _parse_date(until)
+    if until and until_date and len(until) <= 10:
+        # Дата без времени включает весь день
+        until_date += timedelta(days=1) - timedelta(microseconds=1)
+
+    user_from, user_to = _parse_user_range(users)
+    try:
+        shard_count = int(shards) if shards else settings.get("shards")
+    except ValueError:
+        shard_count = 0
+    if shard_count is not None and shard_count <= 0:
+        raise ValueError("Значение shards должно быть положительным целым числом")
+
+    names = (
+        [name.strip() for name in datasets.split(",") if name.strip()]
+        if datasets
+        else list(export.DATASETS)
+    )
+    out_dir = out_dir or settings.get("dir", "exports")
+
+    # Части читают файлы с диска: изменения пакетного режима записываются
+    db.flush()
+
+    started = datetime.now()
+    result = export.export(
+        db,
+        {name: app_config.get(key) for name, (key, _) in export.DATASETS.items()},
+        out_dir,
+        names,
+        fmt=fmt or settings.get("format", export.FORMAT_CSV),
+        flt=export.ExportFilter(
+            user_from,
+            user_to,
+            pair.upper() if pair else None,
+            since_date.isoformat() if since_date else None,
+            until_date.isoformat() if until_date else None,
+        ),
+        shards=shard_count,
+        min_shard_bytes=int(settings.get("min_shard_mb", 16) * (1 << 20)),
+        batch_size=settings.get("batch_size", 65536),
+    )
+    elapsed = (datetime.now() - started).total_seconds()
+
+    print(f"Выгрузка в {os.path.abspath(out_dir)} за {elapsed:.2f} с:")
+    for name, (rows, paths) in result.items():
+        print(f"- {name}: {rows} строк, частей: {len(paths)}")
+
+
+@error_handler
+def save_metrics():
+    """Выгружает метрики в файл Prometheus (METRICS.file)"""
+    path = app_config.get("METRICS").get("file")
+    if path:
+        metrics.registry.write(path)
+
+
+def save_stats(db: DatabaseManager):
+    """Сохраняет гистограммы в файл статистики"""
+    if stats.registry.enabled and stats.registry.histograms:
+        db.save(
+            app_config.get("STATS_FILE"),
+            {
+                "saved_at": datetime.now().isoformat(),
+                "histograms": stats.registry.to_record(),
+            },
+        )
@@ -1,9 +1,11 @@
 import hashlib
+import hmac
 import os
 from datetime import datetime, timedelta
 from typing import Any
 
 from src.valutatrade_hub.decorators import error_handler
+from src.valutatrade_hub.infra import stats
 
 
 def validate_positive_number(value: float, entity_name: str, no_zero: bool = False):
@@ -28,10 +30,77 @@ def welcome():
     print("\n")
 
 
-def hashed_password(password: str, salt: str) -> str:
-    """Хеширование пароля"""
-    password_salted = password + salt
-    return hashlib.sha256(password_salted.encode()).hexdigest()
+def hashed_password(password: str, salt: str, params: dict | None = None) -> str:
+    """
+    Хеширование пароля
+
+    Args:
+        password: пароль
+        salt: соль
+        params: параметры KDF, например
+            {"algorithm": "pbkdf2_sha256", "iterations": 200000} или
+            {"algorithm": "scrypt", "n": 16384, "r": 8, "p": 1}.
+            Без параметров используется устаревший формат (один SHA-256)
+
+    Returns:
+        Хеш в формате "<algorithm>$<параметры>$<hex>" (устаревший - просто hex)
+    """
+    if not params:
+        password_salted = password + salt
+        return hashlib.sha256(password_salted.encode()).hexdigest()
+
+    algorithm = params.get("algorithm")
+
+    match algorithm:
+        case "pbkdf2_sha256":
+            iterations = int(params.get("iterations", 200000))
+            digest = hashlib.pbkdf2_hmac(
+                "sha256", password.encode(), salt.encode(), iterations
+            )
+            return f"{algorithm}${iterations}${digest.hex()}"
+        case "scrypt":
+            n = int(params.get("n", 16384))
+            r = int(params.get("r", 8))
+            p = int(params.get("p", 1))
+            digest = hashlib.scrypt(
+                password.encode(),
+                salt=salt.encode(),
+                n=n,
+                r=r,
+                p=p,
+                maxmem=128 * n * r * p + 1024 * 1024,
+            )
+            return f"{algorithm}${n}:{r}:{p}${digest.hex()}"
+        case _:
+            raise ValueError(f"Неизвестный алгоритм хеширования '{algorithm}'")
+
+
+def _hash_params(stored_hash: str) -> dict | None:
+    """Восстанавливает параметры KDF из сохраненного хеша"""
+    if "$" not in stored_hash:
+        return None
+
+    algorithm, cost, _ = stored_hash.split("$", 2)
+
+    if algorithm == "scrypt":
+        n, r, p = cost.split(":")
+        return {"algorithm": algorithm, "n": int(n), "r": int(r), "p": int(p)}
+
+    return {"algorithm": algorithm, "iterations": int(cost)}
+
+
+def verify_password(password: str, salt: str, stored_hash: str) -> bool:
+    """Проверяет пароль по сохраненному хешу любого поддерживаемого формата"""
+    candidate = hashed_password(password, salt, _hash_params(stored_hash))
+    return hmac.compare_digest(candidate, stored_hash)
+
+
+def needs_rehash(stored_hash: str, params: dict) -> bool:
+    """Проверяет, отличаются ли параметры хеша от текущих настроек"""
+    current = _hash_params(stored_hash)
+    if current is None:
+        return True
+    return any(current.get(key) != value for key, value in params.items())
 
 
 def generate_salt():
@@ -76,7 +145,7 @@ def create_portfolio(user_id: int, base_currency: str):
     return {
         "user_id": user_id,
         "wallets": {
-            base_currency: {"balance": 0.0},
+            base_currency: 0.0,
         },
     }
 
@@ -88,10 +157,7 @@ def get_user_portfolio(portfolios, user_id: int, portfolio_class):
 
     for _portfolio in portfolios:
         if _portfolio["user_id"] == user_id:
-            user_portfolio = portfolio_class(
-                user_id=_portfolio["user_id"],
-                wallets=_portfolio["wallets"],
-            )
+            user_portfolio = portfolio_class.from_record(_portfolio)
             break
 
     if not user_portfolio:
@@ -100,6 +166,7 @@ def get_user_portfolio(portfolios, user_id: int, portfolio_class):
     return user_portfolio
 
 
+@stats.timed_phase(stats.PHASE_RATE)
 def get_rate(from_currency: str, to_currency: str, rates):
     rate_key = f"{from_currency}_{to_currency}"
 
@@ -111,6 +178,19 @@ def get_rate(from_currency: str, to_currency: str, rates):
     return rates[rate_key]["rate"]
 
 
+@stats.timed_phase(stats.PHASE_RATE)
+def get_conversion_rate(from_currency: str, to_currency: str, rates) -> float:
+    """Возвращает курс конвертации, используя обратную пару при необходимости"""
+    if from_currency == to_currency:
+        return 1.0
+
+    inverse_key = f"{to_currency}_{from_currency}"
+    if f"{from_currency}_{to_currency}" not in rates and inverse_key in rates:
+        return 1 / rates[inverse_key]["rate"]
+
+    return get_rate(from_currency, to_currency, rates)
+
+
 def convert_currency(amount: float, from_currency: str, to_currency: str, rates):
     """Конвертирует валюту"""
     if from_currency == to_currency:
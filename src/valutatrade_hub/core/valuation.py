@@ -0,0 +1,74 @@
+"""
+Стоимость портфеля сразу в нескольких базовых валютах
+
+Для каждой базы по снимку курсов строится вектор коэффициентов - курс
+каждой валюты портфеля к базе. Стоимость всех колонок считается за один
+проход по кошелькам: баланс умножается на коэффициенты всех баз.
+"""
+
+
+def _direct(pairs: dict, from_currency: str, to_currency: str) -> float | None:
+    """Курс по прямой или обратной паре"""
+    if from_currency == to_currency:
+        return 1.0
+    rate = (pairs.get(f"{from_currency}_{to_currency}") or {}).get("rate")
+    if rate:
+        return rate
+    rate = (pairs.get(f"{to_currency}_{from_currency}") or {}).get("rate")
+    if rate:
+        return 1 / rate
+    return None
+
+
+def conversion_vector(
+    pairs: dict, codes: list[str], base: str, pivot: str
+) -> list[float | None]:
+    """
+    Коэффициенты перевода валют codes в base
+
+    Если прямой или обратной пары нет, курс считается через pivot
+    (валюту, к которой загружаются курсы). None - курс недоступен.
+    """
+    to_base_from_pivot = _direct(pairs, pivot, base)
+    vector = []
+    for code in codes:
+        rate = _direct(pairs, code, base)
+        if rate is None and to_base_from_pivot is not None:
+            to_pivot = _direct(pairs, code, pivot)
+            if to_pivot is not None:
+                rate = to_pivot * to_base_from_pivot
+        vector.append(rate)
+    return vector
+
+
+def value_table(
+    wallets: dict[str, float], pairs: dict, bases: list[str], pivot: str
+) -> tuple[list[tuple[str, float, list[float | None]]], list[float], list[list[str]]]:
+    """
+    Стоимость кошельков во всех базах
+
+    Returns:
+        Строки (валюта, баланс, стоимости по базам), итоги по базам и
+        для каждой базы - валюты без курса (в итог они не входят)
+    """
+    codes = list(wallets)
+    vectors = [conversion_vector(pairs, codes, base, pivot) for base in bases]
+
+    rows = []
+    totals = [0.0] * len(bases)
+    missing: list[list[str]] = [[] for _ in bases]
+    # Коэффициенты одной валюты во всех базах - строка транспонированных векторов
+    for code, rates in zip(codes, zip(*vectors)):
+        balance = wallets[code]
+        values = []
+        for column, rate in enumerate(rates):
+            if rate is None:
+                values.append(None)
+                missing[column].append(code)
+            else:
+                value = balance * rate
+                values.append(value)
+                totals[column] += value
+        rows.append((code, balance, values))
+
+    return rows, totals, missing
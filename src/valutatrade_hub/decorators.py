@@ -1,4 +1,5 @@
 import functools
+import time
 from typing import Any, Callable, TypeVar
 
 from src.valutatrade_hub import const
@@ -8,6 +9,16 @@ from src.valutatrade_hub.core.exceptions import (
     InsufficientFundsError,
     NotAuthorizedError,
 )
+from src.valutatrade_hub.infra import metrics, stats
+
+
+def _record_error(error: Exception):
+    """Сохраняет ошибку в контексте команды для пакетного режима"""
+    from src.valutatrade_hub.core import context
+
+    ctx = context.current()
+    if ctx is not None:
+        ctx.errors.append(error)
 
 
 def error_handler(func):
@@ -15,32 +26,43 @@ def error_handler(func):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
-        except RuntimeError as e:
-            print(f"Системная ошибка: {e}")
-        except NotAuthorizedError:
-            print("Сначала выполните login")
-        except InsufficientFundsError as e:
-            print(f"Недостаточно средств: {e}")
-        except CurrencyNotFoundError as e:
-            print(e)
-        except FileNotFoundError as e:
-            print(f"Файл не найден: {e}")
-        except KeyError as e:
-            print(f"Ключ не найден: {e}")
-        except ValueError as e:
-            print(f"Ошибка валидации: {e}")
         except Exception as e:
-            print(f"Неожиданная ошибка: {e}")
+            _record_error(e)
+            print(_error_message(e))
 
     return wrapper
 
 
+def _error_message(error: Exception) -> str:
+    match error:
+        case RuntimeError():
+            return f"Системная ошибка: {error}"
+        case NotAuthorizedError():
+            return "Сначала выполните login"
+        case InsufficientFundsError():
+            return f"Недостаточно средств: {error}"
+        case CurrencyNotFoundError():
+            return str(error)
+        case FileNotFoundError():
+            return f"Файл не найден: {error}"
+        case KeyError():
+            return f"Ключ не найден: {error}"
+        case ValueError():
+            return f"Ошибка валидации: {error}"
+        case _:
+            return f"Неожиданная ошибка: {error}"
+
+
 T = TypeVar("T")
 
 
 def check_auth(func: Callable[..., T]) -> Callable[..., T]:
     @functools.wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> T:
+        # Пользователь может прийти из контекста команды
+        ctx = kwargs.get("ctx")
+        if args and args[0] is None and ctx is not None and ctx.user is not None:
+            args = (ctx.user, *args[1:])
         if not args or args[0] is None:
             raise NotAuthorizedError("Authentication required")
         return func(*args, **kwargs)
@@ -60,14 +82,26 @@ class log_action:
         def wrapper(*args, **kwargs) -> Any:
             # Импортируем здесь чтобы избежать циклических импортов
             try:
-                from .logging_config import action_logger
+                from .logging_config import get_action_logger
+
+                action_logger = get_action_logger()
             except ImportError:
                 import logging
 
                 action_logger = logging.getLogger("domain_actions")
 
-            # Извлекаем контекст из аргументов
-            log_context = self._extract_context(args, kwargs)
+            # Замер времени операции (None, если статистика выключена)
+            span = stats.registry.begin(self.action)
+            started = time.perf_counter()
+
+            # Сделки работают через контекст команды: данные читаются один
+            # раз, а в лог попадает курс, который использовал сценарий
+            if self.action in (const.LOG_ACTION_BUY, const.LOG_ACTION_SELL):
+                if kwargs.get("ctx") is None and len(args) > 3:
+                    from src.valutatrade_hub.core.context import RequestContext
+
+                    kwargs["ctx"] = RequestContext(args[3], args[0])
+
             result = "OK"
             error_type = ""
             error_message = ""
@@ -91,6 +125,17 @@ class log_action:
                 raise e
 
             finally:
+                stats.registry.end(span)
+                if self.action in (const.LOG_ACTION_BUY, const.LOG_ACTION_SELL):
+                    metrics.TRADE_DURATION.observe(
+                        time.perf_counter() - started,
+                        action=self.action.lower(),
+                        result=result.lower(),
+                    )
+
+                # Контекст извлекается после выполнения, когда курс известен
+                log_context = self._extract_context(args, kwargs)
+
                 # Формируем дополнительные поля
                 extra = {
                     "action": self.action,
@@ -100,6 +145,7 @@ class log_action:
                     "amount": log_context.get("amount", 0),
                     "rate": log_context.get("rate", 0),
                     "base_currency": log_context.get("base_currency", ""),
+                    "snapshot_id": log_context.get("snapshot_id"),
                     "result": result,
                     "error_type": error_type,
                     "error_message": error_message,
@@ -128,21 +174,31 @@ class log_action:
             case const.LOG_ACTION_REGISTER:
                 context["username"] = args[0]
             case const.LOG_ACTION_SELL | const.LOG_ACTION_BUY:
-                db = args[3]
-
-                # Извлекаем портфель
-                rates = db.load(app_config.get("RATES_FILE")) or []
-                try:
-                    rate = utils.get_rate(
-                        args[1], app_config.get("BASE_CURRENCY"), rates
-                    )
-                except ValueError:
-                    rate = 0
-                context["username"] = args[0].username if args[0] else "unknown"
+                ctx = kwargs.get("ctx")
+                rate = ctx.rate if ctx is not None else None
+
+                # Сделка не дошла до курса (ошибка) - берем его из снимка
+                if rate is None and ctx is not None:
+                    try:
+                        rate = utils.get_rate(
+                            args[1], app_config.get("BASE_CURRENCY"), ctx.pairs
+                        )
+                    except (ValueError, TypeError):
+                        rate = 0
+                user = args[0] or (ctx.user if ctx is not None else None)
+                context["username"] = user.username if user else "unknown"
                 context["currency_code"] = args[1]
                 context["amount"] = args[2]
                 context["base_currency"] = app_config.get("BASE_CURRENCY")
-                context["rate"] = rate
+                context["rate"] = rate or 0
+                # Курс сделки и курс в журнале - из одного снимка
+                context["snapshot_id"] = ctx.snapshot_id if ctx is not None else None
+            case const.LOG_ACTION_ORDER:
+                context["username"] = args[0].username if args[0] else "unknown"
+                context["currency_code"] = args[2]
+                context["amount"] = args[3]
+                context["rate"] = args[4]
+                context["base_currency"] = app_config.get("BASE_CURRENCY")
 
         return context
 
@@ -1,6 +1,36 @@
+import codecs
+import contextlib
 import json
 import os
-from typing import Any
+import tempfile
+from typing import Any, Iterator
+
+from src.valutatrade_hub.infra import stats
+
+# Размер блока при потоковом чтении JSON-массивов
+CHUNK_SIZE = 1 << 20
+
+# Пробелы и запятые между элементами массива
+_SEPARATORS = " \t\r\n,"
+
+# Файлы JSON Lines (запись на строку) дописываются без перезаписи
+LINES_SUFFIX = ".jsonl"
+
+
+def _is_lines(filename: str) -> bool:
+    return filename.endswith(LINES_SUFFIX)
+
+
+def _parse_line(line: bytes) -> Any:
+    """Запись строки JSON Lines или None для пустой строки"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        # Обрывок записи, прерванной сбоем или нехваткой места
+        return None
 
 
 class DatabaseManager:
@@ -12,25 +42,440 @@ class DatabaseManager:
             dir: директория, в которой будут сохраняться данные
         """
         self._dir = dir
+        # Буферизованный режим: файлы читаются один раз, изменения
+        # держатся в памяти до flush
+        self._buffered = False
+        self._cache: dict[str, Any] = {}
+        self._dirty: set[str] = set()
+        # Сколько записей дописано в буфере в файлы JSON Lines: при flush
+        # они дописываются, а не перезаписывают файл
+        self._appends: dict[str, int] = {}
+        # Состояние файлов до текущей команды: JSON измененных в буфере
+        # данных (None - данные совпадают с файлом на диске) и _appends
+        self._savepoint: dict[str, tuple[str | None, int | None]] | None = None
+        # Счетчик изменений в памяти - часть версии файла
+        self._generations: dict[str, int] = {}
+
+    @property
+    def data_dir(self) -> str:
+        """Директория с файлами данных"""
+        return self._dir
+
+    @contextlib.contextmanager
+    def buffered(self):
+        """
+        Буферизует чтение и запись на время блока (пакетный режим CLI)
+
+        load возвращает тот же объект, что был прочитан или передан в save,
+        поэтому изменения данных видны следующим командам без записи на диск.
+        Изменения команды, завершившейся ошибкой, отменяются через
+        savepoint/rollback. Все измененные файлы записываются один раз при
+        выходе из блока.
+        """
+        if self._buffered:
+            yield self
+            return
+
+        self._buffered = True
+        try:
+            yield self
+        finally:
+            try:
+                self.flush()
+            finally:
+                self._buffered = False
+                self._savepoint = None
+                self._cache.clear()
+                self._appends.clear()
+
+    def savepoint(self):
+        """
+        Запоминает состояние буфера перед командой пакетного режима
+
+        Данные файла копируются при первом обращении к нему после
+        savepoint, и только если они изменены в буфере: нетронутые файлы
+        при откате перечитываются с диска.
+        """
+        if self._buffered:
+            self._savepoint = {}
+
+    def release(self):
+        """Принимает изменения команды"""
+        self._savepoint = None
+
+    def rollback(self):
+        """Отменяет изменения буфера, сделанные после savepoint"""
+        saved, self._savepoint = self._savepoint, None
+        for filename, (data, appends) in (saved or {}).items():
+            if data is None:
+                self._cache.pop(filename, None)
+                self._dirty.discard(filename)
+            else:
+                self._cache[filename] = json.loads(data)
+            if appends is None:
+                self._appends.pop(filename, None)
+            else:
+                self._appends[filename] = appends
+            self._changed(filename)
+
+    def _track(self, filename: str):
+        saved = self._savepoint
+        if saved is None or filename in saved:
+            return
+        data = None
+        if filename in self._dirty:
+            data = json.dumps(self._cache[filename], ensure_ascii=False)
+        saved[filename] = (data, self._appends.get(filename))
 
+    def _changed(self, filename: str):
+        self._generations[filename] = self._generations.get(filename, 0) + 1
+
+    def version(self, filename: str) -> tuple[int, int, int]:
+        """
+        Версия файла для кешей поверх load
+
+        Меняется при записи файла, в том числе другим процессом, и при
+        изменениях в буфере, которые еще не записаны на диск.
+        """
+        try:
+            stat = os.stat(self._path(filename))
+        except FileNotFoundError:
+            mtime = size = -1
+        else:
+            mtime, size = stat.st_mtime_ns, stat.st_size
+        return mtime, size, self._generations.get(filename, 0)
+
+    def flush(self):
+        """Записывает на диск файлы, измененные в буферизованном режиме"""
+        for filename in sorted(self._dirty):
+            data = self._cache[filename]
+            appends = self._appends.pop(filename, None)
+            if appends is not None:
+                self._append_lines(filename, data[len(data) - appends :])
+            else:
+                self._write(filename, data)
+        self._dirty.clear()
+
+    @stats.timed_phase(stats.PHASE_DB_SAVE)
     def save(self, filename: str, data: Any):
         """Сохранение данных в файл"""
 
+        if self._buffered:
+            self._track(filename)
+            self._cache[filename] = data
+            self._dirty.add(filename)
+            self._appends.pop(filename, None)
+            self._changed(filename)
+            return True
+
+        self._write(filename, data)
+
+        return True
+
+    @stats.timed_phase(stats.PHASE_DB_SAVE)
+    def append_array(self, filename: str, records: list):
+        """
+        Дописывает записи в конец массива записей файла
+
+        Файл JSON Lines дописывается одной операцией записи под
+        блокировкой, не перезаписываясь; JSON-массив перезаписывается
+        целиком через временный файл.
+        """
+        if not records:
+            return
+        if self._buffered:
+            data = self.load(filename)
+            if data is None:
+                data = self._cache[filename] = []
+            if not isinstance(data, list):
+                raise ValueError(f"{filename}: ожидался массив записей")
+            if _is_lines(filename) and (
+                filename not in self._dirty or filename in self._appends
+            ):
+                self._appends[filename] = self._appends.get(filename, 0) + len(records)
+            data.extend(records)
+            self._dirty.add(filename)
+            self._changed(filename)
+            return
+
+        if _is_lines(filename):
+            self._append_lines(filename, records)
+            return
+
+        data = self.load(filename)
+        if data is None:
+            data = []
+        if not isinstance(data, list):
+            raise ValueError(f"{filename}: ожидался массив записей")
+        self._write(filename, data + records)
+
+    def _append_lines(self, filename: str, records: list):
+        import fcntl
+
+        path = self._path(filename)
+        payload = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in records
+        ).encode()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._open_locked(path, "a+b", fcntl.LOCK_EX) as file:
+            size = file.seek(0, os.SEEK_END)
+            if size:
+                file.seek(size - 1)
+                if file.read(1) != b"\n":
+                    # Обрывок прерванной записи остается отдельной строкой
+                    payload = b"\n" + payload
+            file.write(payload)
+
+    @staticmethod
+    def _open_locked(path: str, mode: str, operation: int):
+        """
+        Открывает файл и блокирует его через flock
+
+        Файл, замененный через os.replace, пока процесс ждал блокировку,
+        открывается заново: запись в старый файл была бы потеряна.
+        """
+        import fcntl
+
+        while True:
+            file = open(path, mode)
+            fcntl.flock(file, operation)
+            try:
+                current = os.stat(path).st_ino == os.fstat(file.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return file
+            file.close()
+
+    def _write(self, filename: str, data: Any):
         file_path = os.path.join(self._dir, filename)
 
         # Создаем директорию, если она не существует
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-        with open(file_path, "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False)
+        # Запись во временный файл и замена: читатели видят либо старый,
+        # либо новый файл целиком, но не наполовину записанный
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(file_path),
+            prefix=f".{os.path.basename(file_path)}.",
+            suffix=".tmp",
+        )
+        try:
+            # json.dumps кодирует на C, а json.dump с файлом - по частям на Python
+            with open(fd, "w", encoding="utf-8") as file:
+                if _is_lines(filename):
+                    file.write(
+                        "".join(
+                            json.dumps(record, ensure_ascii=False) + "\n"
+                            for record in data
+                        )
+                    )
+                else:
+                    file.write(json.dumps(data, ensure_ascii=False))
+            if _is_lines(filename):
+                self._replace_locked(tmp_path, file_path)
+            else:
+                os.replace(tmp_path, file_path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
 
-        return True
+    def _replace_locked(self, tmp_path: str, path: str):
+        """Заменяет файл JSON Lines, пока никто не дописывает в него"""
+        import fcntl
 
+        try:
+            file = self._open_locked(path, "rb", fcntl.LOCK_EX)
+        except FileNotFoundError:
+            os.replace(tmp_path, path)
+            return
+        with file:
+            os.replace(tmp_path, path)
+
+    @stats.timed_phase(stats.PHASE_DB_LOAD)
     def load(self, filename: str):
         """Загрузка данных из файла"""
 
+        if self._buffered:
+            self._track(filename)
+            if filename in self._cache:
+                return self._cache[filename]
+
+        if _is_lines(filename):
+            data = list(self._iter_lines(filename)) if self._exists(filename) else None
+        else:
+            try:
+                with open(self._path(filename), "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            except FileNotFoundError:
+                data = None
+
+        if self._buffered:
+            self._cache[filename] = data
+        return data
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self._dir, filename)
+
+    def _exists(self, filename: str) -> bool:
+        return os.path.exists(self._path(filename))
+
+    def _iter_lines(
+        self, filename: str, start: int = 0, end: int | None = None
+    ) -> Iterator[Any]:
+        """
+        Записи файла JSON Lines в диапазоне байт
+
+        Под общей блокировкой фиксируется только длина файла: записи
+        только дописываются, поэтому все до этой границы уже записано
+        целиком, а замена файла не затрагивает открытый дескриптор.
+        """
+        import fcntl
+
         try:
-            with open(os.path.join(self._dir, filename), "r", encoding="utf-8") as file:
-                return json.load(file)
+            file = self._open_locked(self._path(filename), "rb", fcntl.LOCK_SH)
         except FileNotFoundError:
-            return None
+            return
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            fcntl.flock(file, fcntl.LOCK_UN)
+            end = size if end is None else min(end, size)
+            file.seek(start)
+            position = start
+            for line in file:
+                if position >= end:
+                    break
+                position += len(line)
+                record = _parse_line(line)
+                if record is not None:
+                    yield record
+
+    def array_shards(self, filename: str, shards: int) -> list[tuple[int, int | None]]:
+        """
+        Делит JSON-массив записей на диапазоны байт по границам записей
+
+        Граница - начало записи: '{' и ее первый ключ, как у первой записи
+        файла. Внутри строк JSON кавычка экранируется, поэтому такая
+        последовательность встречается только в начале объекта. В файле
+        JSON Lines граница - начало строки.
+
+        Returns:
+            Список (начало, конец) для iter_array; конец последнего - None
+        """
+        try:
+            size = os.path.getsize(self._path(filename))
+        except FileNotFoundError:
+            return []
+
+        if _is_lines(filename):
+            with open(self._path(filename), "rb") as file:
+                starts = [0]
+                for index in range(1, max(shards, 1)):
+                    newline = self._find(file, b"\n", size * index // shards)
+                    if newline is None or newline + 1 >= size:
+                        break
+                    if newline + 1 > starts[-1]:
+                        starts.append(newline + 1)
+            return list(zip(starts, starts[1:] + [None]))
+
+        with open(self._path(filename), "rb") as file:
+            head = file.read(CHUNK_SIZE)
+            first = head.find(b"{", head.find(b"[") + 1)
+            key_end = head.find(b'"', first + 2)
+            if first < 0 or key_end < 0 or head[first + 1:first + 2] != b'"':
+                return [(0, None)]
+            marker = head[first:key_end + 1]
+
+            starts = [first]
+            for index in range(1, max(shards, 1)):
+                start = self._find(file, marker, size * index // shards)
+                if start is None:
+                    break
+                if start > starts[-1]:
+                    starts.append(start)
+
+        return list(zip(starts, starts[1:] + [None]))
+
+    @staticmethod
+    def _find(file, marker: bytes, offset: int) -> int | None:
+        """Позиция первого вхождения marker не раньше offset"""
+        while True:
+            file.seek(offset)
+            block = file.read(CHUNK_SIZE)
+            if len(block) < len(marker):
+                return None
+            position = block.find(marker)
+            if position >= 0:
+                return offset + position
+            offset += len(block) - len(marker) + 1
+
+    def iter_array(
+        self, filename: str, start: int = 0, end: int | None = None
+    ) -> Iterator[Any]:
+        """
+        Потоково читает элементы JSON-массива или файла JSON Lines, не
+        загружая файл целиком
+
+        Args:
+            filename: файл с JSON-массивом
+            start, end: диапазон байт из array_shards (по умолчанию - весь файл)
+        """
+        if self._buffered and filename in self._cache:
+            if not start:
+                yield from self._cache[filename] or []
+            return
+
+        if _is_lines(filename):
+            yield from self._iter_lines(filename, start, end)
+            return
+
+        try:
+            file = open(self._path(filename), "rb")
+        except FileNotFoundError:
+            return
+
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        with file:
+            file.seek(start)
+            remaining = None if end is None else end - start
+            buffer = ""
+            position = 0
+            eof = False
+            opened = start > 0
+
+            while True:
+                while position < len(buffer) and buffer[position] in _SEPARATORS:
+                    position += 1
+                if not opened and position < len(buffer):
+                    if buffer[position] != "[":
+                        raise ValueError(f"{filename}: ожидался JSON-массив")
+                    opened = True
+                    position += 1
+                    continue
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+
+                if position < len(buffer):
+                    try:
+                        item, next_position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        # Число в конце блока могло быть прочитано не полностью
+                        if next_position < len(buffer) or eof:
+                            yield item
+                            position = next_position
+                            continue
+                elif eof:
+                    return
+
+                size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                block = file.read(size) if size else b""
+                if remaining is not None:
+                    remaining -= len(block)
+                eof = not block
+                buffer = buffer[position:] + text_decoder.decode(block, final=eof)
+                position = 0
@@ -0,0 +1,324 @@
+"""
+Выгрузка данных для аналитики
+
+Пользователи, портфели, журнал балансов и история курсов читаются из
+файлов DatabaseManager потоково и пишутся в CSV или Parquet построчно,
+поэтому память не зависит от размера данных. Большой файл делится на
+диапазоны байт по границам записей, каждый диапазон выгружается отдельным
+процессом в свою часть: <out>/<набор>/part-00000.csv
+"""
+
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.valutatrade_hub.infra.database import DatabaseManager
+
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+FORMATS = (FORMAT_CSV, FORMAT_PARQUET)
+
+# Часовые и дневные OHLC-бары истории курсов
+BAR_COLUMNS = (
+    ("from_currency", str),
+    ("to_currency", str),
+    ("timestamp", str),
+    ("open", float),
+    ("high", float),
+    ("low", float),
+    ("close", float),
+    ("count", int),
+)
+
+# Набор данных -> ключ файла в конфиге и колонки (имя, тип)
+DATASETS = {
+    "users": (
+        "USERS_FILE",
+        (("user_id", int), ("username", str), ("registration_date", str)),
+    ),
+    "portfolios": (
+        "PORTFOLIOS_FILE",
+        (("user_id", int), ("currency", str), ("balance", float)),
+    ),
+    "ledger": (
+        "LEDGER_FILE",
+        (
+            ("user_id", int),
+            ("timestamp", str),
+            ("currency", str),
+            ("balance", float),
+        ),
+    ),
+    "history": (
+        "HISTORY_FILE",
+        (
+            ("from_currency", str),
+            ("to_currency", str),
+            ("rate", float),
+            ("timestamp", str),
+            ("source", str),
+        ),
+    ),
+    "history_1h": ("HISTORY_HOURLY_FILE", BAR_COLUMNS),
+    "history_1d": ("HISTORY_DAILY_FILE", BAR_COLUMNS),
+}
+
+
+class ExportFilter:
+    """Фильтры выгрузки; None - без ограничения"""
+
+    __slots__ = ("user_from", "user_to", "pair", "since", "until")
+
+    def __init__(
+        self,
+        user_from: int | None = None,
+        user_to: int | None = None,
+        pair: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+    ):
+        """
+        Args:
+            user_from, user_to: диапазон user_id (включительно)
+            pair: пара истории курсов, например BTC_USD
+            since, until: окно по времени в формате ISO (включительно)
+        """
+        self.user_from = user_from
+        self.user_to = user_to
+        self.pair = pair
+        self.since = since
+        self.until = until
+
+    def user(self, user_id) -> bool:
+        if self.user_from is not None and user_id < self.user_from:
+            return False
+        if self.user_to is not None and user_id > self.user_to:
+            return False
+        return True
+
+    def time(self, timestamp: str | None) -> bool:
+        # Время в ISO-формате сравнивается как строка
+        timestamp = timestamp or ""
+        if self.since and timestamp < self.since:
+            return False
+        if self.until and timestamp > self.until:
+            return False
+        return True
+
+
+def _users(records, flt: ExportFilter):
+    for record in records:
+        if flt.user(record["user_id"]):
+            yield (
+                record["user_id"],
+                record["username"],
+                record.get("registration_date"),
+            )
+
+
+def _portfolios(records, flt: ExportFilter):
+    for record in records:
+        if not flt.user(record["user_id"]):
+            continue
+        for currency, balance in record["wallets"].items():
+            # Устаревший формат кошелька {"balance": ...}
+            if isinstance(balance, dict):
+                balance = balance.get("balance", 0.0)
+            yield record["user_id"], currency, balance
+
+
+def _ledger(records, flt: ExportFilter):
+    for record in records:
+        if flt.user(record["user_id"]) and flt.time(record.get("timestamp")):
+            yield (
+                record["user_id"],
+                record.get("timestamp"),
+                record["currency"],
+                record["balance"],
+            )
+
+
+def _history(records, flt: ExportFilter):
+    for record in records:
+        if flt.pair and (
+            f"{record['from_currency']}_{record['to_currency']}" != flt.pair
+        ):
+            continue
+        if flt.time(record.get("timestamp")):
+            yield (
+                record["from_currency"],
+                record["to_currency"],
+                record.get("rate"),
+                record.get("timestamp"),
+                record.get("source"),
+            )
+
+
+def _bars(records, flt: ExportFilter):
+    for record in records:
+        if flt.pair and (
+            f"{record['from_currency']}_{record['to_currency']}" != flt.pair
+        ):
+            continue
+        if flt.time(record["timestamp"]):
+            yield tuple(record[name] for name, _ in BAR_COLUMNS)
+
+
+_ROWS = {
+    "users": _users,
+    "portfolios": _portfolios,
+    "ledger": _ledger,
+    "history": _history,
+    "history_1h": _bars,
+    "history_1d": _bars,
+}
+
+
+def _write_csv(path: str, columns, rows) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow([name for name, _ in columns])
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _require_pyarrow():
+    """Parquet пишется через необязательную зависимость pyarrow"""
+    try:
+        import pyarrow  # type: ignore # noqa: F401
+    except ImportError:
+        raise ValueError(
+            "Для формата parquet нужен пакет pyarrow (pip install pyarrow)"
+        )
+
+
+def _write_parquet(path: str, columns, rows, batch_size: int) -> int:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+
+    count = 0
+    # Строки копятся по колонкам и пишутся группами по batch_size
+    batch: list[list] = [[] for _ in columns]
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in rows:
+            for values, value in zip(batch, row):
+                values.append(value)
+            count += 1
+            if len(batch[0]) >= batch_size:
+                writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                batch = [[] for _ in columns]
+        if batch[0] or not count:
+            writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+    return count
+
+
+def export_shard(
+    data_dir: str,
+    dataset: str,
+    filename: str,
+    start: int,
+    end: int | None,
+    path: str,
+    fmt: str,
+    flt: ExportFilter,
+    batch_size: int,
+) -> int:
+    """
+    Выгружает один диапазон файла набора данных в файл части
+
+    Returns:
+        Количество записанных строк
+    """
+    records = DatabaseManager(data_dir).iter_array(filename, start, end)
+    rows = _ROWS[dataset](records, flt)
+    columns = DATASETS[dataset][1]
+    if fmt == FORMAT_PARQUET:
+        return _write_parquet(path, columns, rows, batch_size)
+    return _write_csv(path, columns, rows)
+
+
+def export(
+    db: DatabaseManager,
+    files: dict[str, str],
+    out_dir: str,
+    datasets: list[str],
+    fmt: str = FORMAT_CSV,
+    flt: ExportFilter | None = None,
+    shards: int | None = None,
+    min_shard_bytes: int = 1 << 24,
+    batch_size: int = 65536,
+) -> dict[str, tuple[int, list[str]]]:
+    """
+    Выгружает наборы данных в out_dir
+
+    Args:
+        db: менеджер базы данных
+        files: набор данных -> имя файла в директории данных
+        out_dir: директория выгрузки
+        datasets: имена наборов из DATASETS
+        fmt: csv или parquet
+        flt: фильтры
+        shards: наибольшее число частей на набор (по умолчанию - число ядер)
+        min_shard_bytes: файлы меньше этого размера не делятся
+        batch_size: строк в группе Parquet
+
+    Returns:
+        Набор данных -> (количество строк, файлы частей)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат '{fmt}', доступны: {', '.join(FORMATS)}")
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown:
+        raise ValueError(
+            f"Неизвестные наборы данных: {', '.join(unknown)}, "
+            f"доступны: {', '.join(DATASETS)}"
+        )
+
+    if fmt == FORMAT_PARQUET:
+        _require_pyarrow()
+
+    flt = flt or ExportFilter()
+    data_dir = db.data_dir
+    shards = shards or os.cpu_count() or 1
+
+    tasks = []
+    for dataset in datasets:
+        filename = files[dataset]
+        try:
+            size = os.path.getsize(os.path.join(data_dir, filename))
+        except FileNotFoundError:
+            size = 0
+        count = max(1, min(shards, size // min_shard_bytes))
+        ranges = db.array_shards(filename, count) or [(0, None)]
+
+        target = os.path.join(out_dir, dataset)
+        os.makedirs(target, exist_ok=True)
+        # Части прошлой выгрузки могли быть многочисленнее текущих
+        for stale in glob.glob(os.path.join(target, "part-*")):
+            os.remove(stale)
+
+        for index, (start, end) in enumerate(ranges):
+            path = os.path.join(target, f"part-{index:05d}.{fmt}")
+            tasks.append(
+                (data_dir, dataset, filename, start, end, path, fmt, flt, batch_size)
+            )
+
+    if len(tasks) < 2 or shards == 1:
+        counts = [export_shard(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(shards, len(tasks))) as pool:
+            futures = [pool.submit(export_shard, *task) for task in tasks]
+            counts = [future.result() for future in futures]
+
+    result: dict[str, tuple[int, list[str]]] = {}
+    for task, count in zip(tasks, counts):
+        rows, paths = result.get(task[1], (0, []))
+        result[task[1]] = (rows + count, paths + [task[5]])
+    return result
@@ -0,0 +1,415 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования
+
+Пишет пользователей, портфели, журнал балансов и историю курсов прямо в
+директорию данных в формате приложения, минуя register (он перезаписывает
+файлы на каждый вызов). Пользователи делятся на блоки фиксированного размера, блоки
+обрабатываются в пуле процессов, а каждый блок получает собственный
+генератор случайных чисел от seed - поэтому результат не зависит от числа
+процессов и повторяется при одинаковом seed.
+
+Запуск: generate-data --users 100000 --ticks 1000000 --seed 42
+"""
+
+import argparse
+import contextlib
+import heapq
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from src.valutatrade_hub.core import currencies, utils
+from src.valutatrade_hub.infra.database import LINES_SUFFIX
+from src.valutatrade_hub.infra.settings import app_config
+
+CHUNK_SIZE = 1000
+DEFAULT_PASSWORD = "password"
+
+# Стартовые цены в базовой валюте, если их нет в снимке курсов,
+# и дневная волатильность
+INITIAL_PRICES = {
+    "USD": 1.0,
+    "EUR": 1.08,
+    "RUB": 0.011,
+    "BTC": 60000.0,
+    "ETH": 3000.0,
+}
+FIAT_VOLATILITY = 0.005
+CRYPTO_VOLATILITY = 0.04
+
+# Распределение балансов: большинство кошельков небольшие,
+# немногие "киты" держат основную часть средств (закон Парето)
+PARETO_ALPHA = 1.16
+
+
+def _rng(seed: int, *parts) -> random.Random:
+    """Генератор, зависящий только от seed и имени потока данных"""
+    return random.Random(":".join(str(part) for part in (seed, *parts)))
+
+
+def _write_json_array(path: str, items):
+    """Пишет JSON-массив потоково, не держа все записи в памяти"""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[")
+        for index, item in enumerate(items):
+            if index:
+                file.write(",")
+            file.write(json.dumps(item, ensure_ascii=False))
+        file.write("]")
+
+
+def _read_lines(path: str):
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def _concat_parts(path: str, parts: list[str]):
+    """Склеивает части (JSON Lines) в один JSON-массив или файл JSON Lines"""
+    if path.endswith(LINES_SUFFIX):
+        with open(path, "wb") as file:
+            for part in parts:
+                with open(part, "rb") as part_file:
+                    shutil.copyfileobj(part_file, file)
+        return
+    _write_json_array(path, (item for part in parts for item in _read_lines(part)))
+
+
+def _base_prices(data_dir: str, base: str) -> dict[str, float]:
+    """
+    Стартовые цены валют в base: курсы текущего снимка, а для валют
+    без курса - INITIAL_PRICES
+
+    Валюты без известной цены в данные не попадают.
+    """
+    prices = dict(INITIAL_PRICES)
+    path = os.path.join(data_dir, app_config.get("RATES_FILE"))
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        with open(path, encoding="utf-8") as file:
+            pairs = json.load(file).get("pairs") or {}
+        for key, value in pairs.items():
+            code, _, to_currency = key.partition("_")
+            rate = value.get("rate")
+            if to_currency == base and rate and rate > 0:
+                prices[code] = rate
+    prices[base] = 1.0
+    return prices
+
+
+def _wallets(
+    rnd: random.Random, codes: list[str], base: str, prices: dict[str, float]
+) -> dict[str, float]:
+    """Кошельки с перекошенным распределением числа валют и балансов"""
+    wallets = {base: round(100 * rnd.paretovariate(PARETO_ALPHA), 2)}
+
+    # Число дополнительных валют убывает геометрически
+    others = [code for code in codes if code != base]
+    count = 0
+    while count < len(others) and rnd.random() < 0.5:
+        count += 1
+
+    for code in rnd.sample(others, count):
+        price = prices[code]
+        wallets[code] = round(100 * rnd.paretovariate(PARETO_ALPHA) / price, 8)
+
+    return wallets
+
+
+def _generate_users_chunk(
+    workdir: str,
+    chunk: int,
+    first_id: int,
+    last_id: int,
+    seed: int,
+    password: str,
+    hashing: dict | None,
+    shared_hash: bool,
+    prices: dict[str, float],
+) -> tuple[str, str, str]:
+    """Пишет пользователей, портфели и начальные балансы блока в файлы частей"""
+    rnd = _rng(seed, "users", chunk)
+    codes = sorted(prices)
+    base = app_config.get("BASE_CURRENCY")
+    start = datetime(2024, 1, 1)
+
+    users_part = os.path.join(workdir, f"users.{chunk:06d}.jsonl")
+    portfolios_part = os.path.join(workdir, f"portfolios.{chunk:06d}.jsonl")
+    ledger_part = os.path.join(workdir, f"ledger.{chunk:06d}.jsonl")
+
+    salt = password_hash = None
+    if shared_hash:
+        # Один хеш на блок: KDF не считается для каждого пользователя
+        salt = rnd.randbytes(16).hex()
+        password_hash = utils.hashed_password(password, salt, hashing)
+
+    with (
+        open(users_part, "w", encoding="utf-8") as users_file,
+        open(portfolios_part, "w", encoding="utf-8") as portfolios_file,
+        open(ledger_part, "w", encoding="utf-8") as ledger_file,
+    ):
+        for user_id in range(first_id, last_id + 1):
+            if not shared_hash:
+                salt = rnd.randbytes(16).hex()
+                password_hash = utils.hashed_password(password, salt, hashing)
+            registered = start + timedelta(seconds=rnd.randrange(365 * 86400))
+            wallets = _wallets(rnd, codes, base, prices)
+
+            users_file.write(
+                json.dumps(
+                    {
+                        "user_id": user_id,
+                        "username": f"user{user_id}",
+                        "hashed_password": password_hash,
+                        "salt": salt,
+                        "registration_date": registered.isoformat(),
+                    }
+                )
+                + "\n"
+            )
+            portfolios_file.write(
+                json.dumps({"user_id": user_id, "wallets": wallets}) + "\n"
+            )
+            # Начальные балансы в журнале - для portfolio-history
+            for currency, balance in wallets.items():
+                ledger_file.write(
+                    json.dumps(
+                        {
+                            "user_id": user_id,
+                            "timestamp": registered.isoformat(),
+                            "currency": currency,
+                            "balance": balance,
+                        }
+                    )
+                    + "\n"
+                )
+
+    return users_part, portfolios_part, ledger_part
+
+
+def _generate_rates(
+    workdir: str,
+    code: str,
+    ticks: int,
+    seed: int,
+    start: datetime,
+    step: timedelta,
+    price: float,
+) -> tuple[str, float]:
+    """Случайное блуждание курса одной валюты к базовой"""
+    rnd = _rng(seed, "rates", code)
+    base = app_config.get("BASE_CURRENCY")
+    currency = currencies.get_currency(code)
+    daily = (
+        CRYPTO_VOLATILITY
+        if isinstance(currency, currencies.CryptoCurrency)
+        else FIAT_VOLATILITY
+    )
+    # Волатильность одного шага из дневной
+    sigma = daily * math.sqrt(step.total_seconds() / 86400)
+
+    part = os.path.join(workdir, f"rates.{code}.jsonl")
+    with open(part, "w", encoding="utf-8") as file:
+        for index in range(ticks):
+            # Геометрическое блуждание: цена остается положительной
+            price *= math.exp(rnd.gauss(-sigma * sigma / 2, sigma))
+            timestamp = (start + step * index).isoformat()
+            file.write(
+                json.dumps(
+                    {
+                        "id": f"{code}_{base}_{timestamp}",
+                        "from_currency": code,
+                        "to_currency": base,
+                        "rate": price,
+                        "timestamp": timestamp,
+                        "source": "Generator",
+                    }
+                )
+                + "\n"
+            )
+
+    return part, price
+
+
+def generate(
+    data_dir: str,
+    users: int,
+    ticks: int,
+    seed: int = 42,
+    workers: int | None = None,
+    password: str = DEFAULT_PASSWORD,
+    shared_hash: bool = False,
+    step: timedelta = timedelta(minutes=1),
+    end: datetime | None = None,
+):
+    """
+    Генерирует набор данных в директории data_dir
+
+    Args:
+        data_dir: директория данных приложения
+        users: количество пользователей
+        ticks: общее количество записей истории курсов
+        seed: зерно генератора
+        workers: количество процессов (по умолчанию - число ядер)
+        password: пароль всех пользователей
+        shared_hash: один хеш пароля на блок пользователей вместо
+            хеша на каждого (быстро, но соли повторяются)
+        step: шаг истории курсов
+        end: время последнего тика (по умолчанию - текущая минута)
+    """
+    if users < 0 or ticks < 0:
+        raise ValueError("Количество пользователей и тиков не может быть отрицательным")
+
+    base = app_config.get("BASE_CURRENCY")
+    hashing = app_config.get("PASSWORD_HASHING")
+    # Снимок курсов читается до того, как генератор его перезапишет
+    prices = {
+        code: price
+        for code, price in _base_prices(data_dir, base).items()
+        if currencies.is_supported(code)
+    }
+    codes = sorted(code for code in prices if code != base)
+    end = end or datetime.now().replace(second=0, microsecond=0)
+    # Тики делятся между валютами поровну, последние получают остаток
+    per_code = -(-ticks // len(codes)) if codes else 0
+    counts = [max(0, min(per_code, ticks - per_code * i)) for i in range(len(codes))]
+
+    os.makedirs(data_dir, exist_ok=True)
+    # Заявки, сессии и кеш истории относятся к прежним пользователям,
+    # а бары и статистика курсов - к прежней истории
+    for filename in (
+        "ORDERS_FILE",
+        "SESSIONS_FILE",
+        "HISTORY_CACHE_FILE",
+        "HISTORY_HOURLY_FILE",
+        "HISTORY_DAILY_FILE",
+        "RATE_STATS_FILE",
+    ):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(data_dir, app_config.get(filename)))
+
+    workdir = tempfile.mkdtemp(dir=data_dir, prefix=".generate-")
+
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = [
+                pool.submit(
+                    _generate_users_chunk,
+                    workdir,
+                    chunk,
+                    first_id,
+                    min(first_id + CHUNK_SIZE - 1, users),
+                    seed,
+                    password,
+                    hashing,
+                    shared_hash,
+                    prices,
+                )
+                for chunk, first_id in enumerate(range(1, users + 1, CHUNK_SIZE))
+            ]
+            series = [
+                # Все ряды заканчиваются в end
+                pool.submit(
+                    _generate_rates,
+                    workdir,
+                    code,
+                    count,
+                    seed,
+                    end - step * max(count - 1, 0),
+                    step,
+                    prices[code],
+                )
+                for code, count in zip(codes, counts)
+            ]
+            parts = [future.result() for future in chunks]
+            rates = [future.result() for future in series]
+
+        _concat_parts(
+            os.path.join(data_dir, app_config.get("USERS_FILE")),
+            [users_part for users_part, _, _ in parts],
+        )
+        _concat_parts(
+            os.path.join(data_dir, app_config.get("PORTFOLIOS_FILE")),
+            [portfolios_part for _, portfolios_part, _ in parts],
+        )
+        _concat_parts(
+            os.path.join(data_dir, app_config.get("LEDGER_FILE")),
+            [ledger_part for _, _, ledger_part in parts],
+        )
+
+        # Ряды по валютам уже упорядочены, история - их слияние по времени
+        _write_json_array(
+            os.path.join(data_dir, app_config.get("HISTORY_FILE")),
+            heapq.merge(
+                *(_read_lines(part) for part, _ in rates),
+                key=lambda tick: tick["timestamp"],
+            ),
+        )
+
+        updated_at = end.isoformat()
+        with open(
+            os.path.join(data_dir, app_config.get("RATES_FILE")), "w", encoding="utf-8"
+        ) as file:
+            json.dump(
+                {
+                    "pairs": {
+                        f"{code}_{base}": {
+                            "rate": price,
+                            "source": "Generator",
+                            "updated_at": updated_at,
+                        }
+                        for code, count, (_, price) in zip(codes, counts, rates)
+                        if count
+                    },
+                    "last_refresh": updated_at,
+                },
+                file,
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Генерация синтетических пользователей, портфелей и истории курсов"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--ticks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--data-dir", default=app_config.get("DATA_FILE"))
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument(
+        "--shared-hash",
+        action="store_true",
+        help="один хеш пароля на блок пользователей",
+    )
+    parser.add_argument(
+        "--step", type=int, default=60, help="шаг истории курсов в секундах"
+    )
+    parser.add_argument("--end", default=None, help="время последнего тика, ISO")
+    args = parser.parse_args()
+
+    generate(
+        args.data_dir,
+        args.users,
+        args.ticks,
+        seed=args.seed,
+        workers=args.workers,
+        password=args.password,
+        shared_hash=args.shared_hash,
+        step=timedelta(seconds=args.step),
+        end=datetime.fromisoformat(args.end) if args.end else None,
+    )
+    print(
+        f"Сгенерировано: {args.users} пользователей, {args.ticks} курсов "
+        f"в {os.path.abspath(args.data_dir)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Отчет по журналу доменных операций
+
+Файлы logs/actions.log и его ротации (в том числе сжатые .gz) читаются
+построчно, поэтому память не зависит от размера журнала. Каждый файл
+обрабатывается отдельным процессом, частичные отчеты затем сливаются.
+"""
+
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from src.valutatrade_hub.const import LOG_ACTION_BUY, LOG_ACTION_SELL
+
+LOG_FILE = "actions.log"
+
+# Формат logging.Formatter.formatTime по умолчанию; строки такого вида
+# упорядочены так же, как даты, поэтому окно проверяется сравнением строк
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_TIMESTAMP_PREFIX = '{"timestamp": "'
+
+# Имя, которое логгер подставляет в записи без пользователя
+_UNKNOWN_USER = "unknown"
+
+_ROTATED = re.compile(rf"^{re.escape(LOG_FILE)}(?:\.(\d+))?(\.gz)?$")
+
+
+def log_files(log_dir: str) -> list[str]:
+    """Файлы журнала от самого старого к текущему"""
+    if not os.path.isdir(log_dir):
+        return []
+
+    found = []
+    for name in os.listdir(log_dir):
+        match = _ROTATED.match(name)
+        if match:
+            index = int(match.group(1) or 0)
+            found.append((-index, name))
+
+    return [os.path.join(log_dir, name) for _, name in sorted(found)]
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+class LogReport:
+    """Накопленные показатели; отчеты по разным файлам складываются merge"""
+
+    def __init__(self):
+        # Записи в окне отчета
+        self.lines = 0
+        self.skipped = 0
+        self.first: str | None = None
+        self.last: str | None = None
+        # action -> [всего, ошибок]
+        self.actions: dict[str, list[int]] = {}
+        # error_type -> количество
+        self.errors: dict[str, int] = {}
+        # username -> количество операций (без записей анонимных команд)
+        self.users: dict[str, int] = {}
+        # валюта -> [куплено, продано]
+        self.volume: dict[str, list[float]] = {}
+
+    def add(self, entry: dict):
+        """Учитывает одну запись журнала"""
+        timestamp = entry.get("timestamp") or ""
+        if self.first is None or timestamp < self.first:
+            self.first = timestamp
+        if self.last is None or timestamp > self.last:
+            self.last = timestamp
+
+        action = entry.get("action") or "UNKNOWN"
+        counts = self.actions.get(action)
+        if counts is None:
+            counts = self.actions[action] = [0, 0]
+        counts[0] += 1
+
+        if entry.get("result") == "ERROR" or entry.get("level") == "ERROR":
+            counts[1] += 1
+        error_type = entry.get("error_type")
+        if error_type:
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+        username = entry.get("username")
+        if username and username != _UNKNOWN_USER:
+            self.users[username] = self.users.get(username, 0) + 1
+
+        if action in (LOG_ACTION_BUY, LOG_ACTION_SELL) and entry.get("result") == "OK":
+            currency = entry.get("currency_code")
+            if currency:
+                volume = self.volume.get(currency)
+                if volume is None:
+                    volume = self.volume[currency] = [0.0, 0.0]
+                volume[action == LOG_ACTION_SELL] += float(entry.get("amount") or 0)
+
+    def merge(self, other: "LogReport"):
+        self.lines += other.lines
+        self.skipped += other.skipped
+        for bound in (other.first, other.last):
+            if bound is None:
+                continue
+            if self.first is None or bound < self.first:
+                self.first = bound
+            if self.last is None or bound > self.last:
+                self.last = bound
+
+        for action, (total, errors) in other.actions.items():
+            counts = self.actions.setdefault(action, [0, 0])
+            counts[0] += total
+            counts[1] += errors
+        for error_type, count in other.errors.items():
+            self.errors[error_type] = self.errors.get(error_type, 0) + count
+        for username, count in other.users.items():
+            self.users[username] = self.users.get(username, 0) + count
+        for currency, (bought, sold) in other.volume.items():
+            volume = self.volume.setdefault(currency, [0.0, 0.0])
+            volume[0] += bought
+            volume[1] += sold
+
+
+def scan_file(path: str, since: str | None = None, until: str | None = None):
+    """
+    Отчет по одному файлу журнала
+
+    Args:
+        path: файл журнала (.gz читается с распаковкой на лету)
+        since, until: границы окна в формате TIMESTAMP_FORMAT (включительно)
+    """
+    report = LogReport()
+    with _open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+
+            # JsonFormatter пишет время первым полем: строки вне окна
+            # отбрасываются без разбора JSON
+            if line.startswith(_TIMESTAMP_PREFIX):
+                start = len(_TIMESTAMP_PREFIX)
+                timestamp = line[start:start + 19]
+                if (since and timestamp < since) or (until and timestamp > until):
+                    continue
+
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                report.skipped += 1
+                continue
+            if not isinstance(entry, dict):
+                report.skipped += 1
+                continue
+
+            # Секунды сравниваются по префиксу, миллисекунды не нужны
+            timestamp = (entry.get("timestamp") or "")[:19]
+            if since and timestamp < since:
+                continue
+            if until and timestamp > until:
+                continue
+            report.lines += 1
+            report.add(entry)
+
+    return report
+
+
+def build_report(
+    log_dir: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    workers: int | None = None,
+) -> LogReport:
+    """
+    Отчет по всем файлам журнала за окно [since, until]
+
+    Args:
+        log_dir: директория журнала
+        since, until: границы окна (None - без ограничения)
+        workers: количество процессов (по умолчанию - число ядер)
+    """
+    paths = log_files(log_dir)
+    if since is not None:
+        # Все записи файла не новее времени его последнего изменения
+        paths = [
+            path
+            for path in paths
+            if datetime.fromtimestamp(os.path.getmtime(path)) >= since
+        ]
+
+    since_text = since.strftime(TIMESTAMP_FORMAT) if since else None
+    until_text = until.strftime(TIMESTAMP_FORMAT) if until else None
+
+    report = LogReport()
+    if len(paths) < 2 or workers == 1:
+        for path in paths:
+            report.merge(scan_file(path, since_text, until_text))
+        return report
+
+    with ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(paths))) as pool:
+        futures = [
+            pool.submit(scan_file, path, since_text, until_text) for path in paths
+        ]
+        for future in futures:
+            report.merge(future.result())
+
+    return report
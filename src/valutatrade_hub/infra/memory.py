@@ -0,0 +1,164 @@
+"""
+Профилирование памяти команд
+
+Команда выполняется под tracemalloc: снимки до и после показывают, сколько
+памяти осталось занято (retained) и какие строки ее выделили, а пик - сколько
+потребовалось на время выполнения. Для команд можно задать бюджет пика.
+"""
+
+import contextlib
+import linecache
+import os
+
+MB = 1024 * 1024
+
+
+def _budget_key(command: str) -> str:
+    # Команды CLI ("show-portfolio") и сценарии usecases ("show_portfolio")
+    # используют один бюджет
+    return command.replace("_", "-")
+
+
+def _short_path(filename: str) -> str:
+    """Путь относительно проекта; для стандартной библиотеки - пакет/файл"""
+    relative = os.path.relpath(filename)
+    if not relative.startswith(".."):
+        return relative
+    return os.path.join(
+        os.path.basename(os.path.dirname(filename)), os.path.basename(filename)
+    )
+
+
+class MemoryUsage:
+    """Результат замера одной команды"""
+
+    __slots__ = ("command", "peak", "retained", "top", "budget")
+
+    def __init__(self, command: str, budget: float | None = None):
+        self.command = command
+        self.peak = 0
+        self.retained = 0
+        # [(место выделения, прирост в байтах, прирост числа блоков)]
+        self.top: list[tuple[str, int, int]] = []
+        self.budget = budget
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.peak > self.budget * MB
+
+    def to_record(self) -> dict:
+        return {
+            "peak_mb": self.peak / MB,
+            "retained_mb": self.retained / MB,
+            "budget_mb": self.budget,
+            "top": [
+                {"site": site, "size_kb": size / 1024, "count": count}
+                for site, size, count in self.top
+            ],
+        }
+
+
+class MemoryProfiler:
+    """Замер памяти команд через tracemalloc"""
+
+    def __init__(
+        self,
+        top: int = 10,
+        frames: int = 1,
+        budgets: dict | None = None,
+        enabled: bool = False,
+    ):
+        """
+        Args:
+            top: сколько мест выделения выводить
+            frames: глубина стека, сохраняемая для каждого выделения
+            budgets: бюджет пика памяти в МБ по командам
+            enabled: замерять все команды
+        """
+        self.top = top
+        self.frames = frames
+        self.budgets = {
+            _budget_key(command): budget for command, budget in (budgets or {}).items()
+        }
+        self.enabled = enabled
+
+    def budget_for(self, command: str) -> float | None:
+        return self.budgets.get(_budget_key(command))
+
+    @contextlib.contextmanager
+    def measure(self, command: str):
+        """Замеряет блок; результат заполняется после выхода из него"""
+        import tracemalloc
+
+        usage = MemoryUsage(command, self.budget_for(command))
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(self.frames)
+
+        before = tracemalloc.take_snapshot()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            yield usage
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started_here:
+                tracemalloc.stop()
+
+            usage.peak = max(0, peak - baseline)
+            usage.retained = current - baseline
+            usage.top = self._top_sites(before, after)
+
+    def _top_sites(self, before, after) -> list[tuple[str, int, int]]:
+        import tracemalloc
+
+        # Выделения самого tracemalloc и профилировщика не интересны
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, linecache.__file__),
+        )
+        diff = after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), "lineno"
+        )
+        sites = []
+        for stat in diff:
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            site = f"{_short_path(frame.filename)}:{frame.lineno}"
+            sites.append((site, stat.size_diff, stat.count_diff))
+            if len(sites) >= self.top:
+                break
+        return sites
+
+    @contextlib.contextmanager
+    def profile(self, command: str, force: bool = False):
+        """
+        Замеряет блок, если замер включен (force - только для этой команды),
+        и выводит отчет
+        """
+        if not force and not self.enabled:
+            yield
+            return
+
+        with self.measure(command) as usage:
+            yield
+
+        # Команда, выключившая замер, в отчет не попадает
+        if force or self.enabled:
+            self.report(usage)
+
+    def report(self, usage: MemoryUsage):
+        print(
+            f"Память '{usage.command}': пик {usage.peak / MB:.2f} МБ, "
+            f"осталось занято {usage.retained / MB:.2f} МБ"
+        )
+        for site, size, count in usage.top:
+            print(f"  {size / 1024:>10.1f} КБ {count:>8} блоков  {site}")
+        if usage.over_budget:
+            print(
+                f"Превышен бюджет памяти для '{usage.command}': "
+                f"{usage.peak / MB:.2f} МБ > {usage.budget} МБ"
+            )
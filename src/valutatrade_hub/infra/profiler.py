@@ -0,0 +1,146 @@
+"""
+Профилирование команд CLI
+
+Каждая выбранная команда выполняется под cProfile; результат сохраняется
+в .pstats (для pstats/snakeviz) и в свернутые стеки .folded (для
+flamegraph.pl, speedscope), а в консоль выводится топ функций.
+"""
+
+import contextlib
+import os
+import random
+import re
+from datetime import datetime
+
+# Ограничения обхода графа вызовов при построении свернутых стеков
+MAX_STACK_DEPTH = 64
+MAX_STACKS = 100_000
+
+
+def _frame_name(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        # Встроенные функции: "<built-in method time.sleep>"
+        return name.strip("<>")
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats) -> list[str]:
+    """
+    Свернутые стеки "a;b;c <мкс>" из графа вызовов cProfile
+
+    cProfile хранит не стеки, а ребра вызывающий -> вызываемый, поэтому
+    собственное время функции в стеке берется из соответствующего ребра.
+    Рекурсивные циклы обрываются, глубина и число путей ограничены.
+    """
+    entries = stats.stats  # type: ignore[attr-defined]
+    children: dict[tuple, list[tuple]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller in callers:
+            children.setdefault(caller, []).append(func)
+
+    lines: dict[str, float] = {}
+    visited = 0
+
+    def walk(func: tuple, stack: list[str], own_time: float, seen: set):
+        nonlocal visited
+        visited += 1
+        if visited > MAX_STACKS:
+            return
+        stack = stack + [_frame_name(func)]
+        if own_time > 0:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0.0) + own_time
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for child in children.get(func, []):
+            if child in seen:
+                continue
+            # Время ребра: (примитивные вызовы, вызовы, собственное, общее)
+            edge = entries[child][4][func]
+            walk(child, stack, edge[2], seen | {child})
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    for root in roots:
+        walk(root, [], entries[root][2], {root})
+
+    return [
+        f"{stack} {round(seconds * 1e6)}"
+        for stack, seconds in lines.items()
+        if round(seconds * 1e6) > 0
+    ]
+
+
+class CommandProfiler:
+    """Профилировщик команд с выборкой доли команд"""
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float = 1.0,
+        top: int = 15,
+        enabled: bool = False,
+    ):
+        """
+        Args:
+            directory: директория для .pstats и .folded
+            sample_rate: доля профилируемых команд (0..1)
+            top: сколько функций выводить в сводке
+            enabled: профилировать все команды
+        """
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.top = top
+        self.enabled = enabled
+
+    def _sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @contextlib.contextmanager
+    def profile(self, command: str, force: bool = False):
+        """
+        Профилирует блок, если профилирование включено и команда попала
+        в выборку (force - профилировать без выборки)
+        """
+        if not force and not (self.enabled and self._sampled()):
+            yield
+            return
+
+        # cProfile и pstats нужны только при профилировании
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            # Команда, выключившая профилирование, в отчет не попадает
+            if force or self.enabled:
+                self._report(command, profiler)
+
+    def _report(self, command: str, profiler):
+        import io
+        import pstats
+
+        stats = pstats.Stats(profiler)
+        if not stats.stats:  # type: ignore[attr-defined]
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r"[^\w-]", "_", command or "command")
+        path = os.path.join(
+            self.directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}"
+        )
+
+        stats.dump_stats(f"{path}.pstats")
+        with open(f"{path}.folded", "w", encoding="utf-8") as file:
+            file.write("\n".join(collapsed_stacks(stats)) + "\n")
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats(
+            pstats.SortKey.CUMULATIVE
+        ).print_stats(self.top)
+        print(f"Профиль '{command}' ({stats.total_tt * 1000:.1f} мс):")  # type: ignore[attr-defined] # noqa E501
+        print(summary.getvalue().strip())
+        print(f"Сохранено: {path}.pstats, {path}.folded")
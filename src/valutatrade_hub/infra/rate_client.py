@@ -0,0 +1,156 @@
+"""
+Клиент сервера курсов
+
+Сервер курсов (parser_service/rate_server.py) держит текущий снимок курсов
+и один опрашивает провайдеров. Процессы обращаются к нему через Unix-сокет
+RATE_SERVER.socket строками JSON: запрос {"op": ..., ...} -> ответ
+{"ok": true, ...} или {"ok": false, "error": ...}.
+
+Если сокета нет или сервер не отвечает, get_client() возвращает None
+и вызывающий читает файлы данных сам.
+"""
+
+import json
+import os
+import threading
+
+from src.valutatrade_hub.infra.settings import app_config
+
+
+class RateServerError(Exception):
+    """Сервер курсов недоступен или вернул ошибку"""
+
+
+class RateServerUnavailable(RateServerError):
+    """Сервер курсов не отвечает: процесс может читать файлы данных сам"""
+
+
+class RateClient:
+    """Соединение процесса с сервером курсов"""
+
+    def __init__(self, socket_path: str, timeout: float = 2.0):
+        """
+        Args:
+            socket_path: путь к Unix-сокету сервера
+            timeout: время ожидания ответа в секундах
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # socket импортируется, только когда сервер запущен
+        import socket
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, op: str, **params) -> dict:
+        """
+        Выполняет запрос к серверу
+
+        Соединение держится между запросами; оборванное соединение
+        открывается заново один раз.
+
+        Raises:
+            RateServerUnavailable: сервер недоступен
+            RateServerError: сервер вернул ошибку
+        """
+        request = json.dumps({"op": op, **params}).encode() + b"\n"
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._file.write(request)
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("сервер закрыл соединение")
+                    break
+                except OSError as e:
+                    self._close()
+                    if attempt == 2:
+                        raise RateServerUnavailable(
+                            f"Сервер курсов недоступен: {e}"
+                        )
+
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise RateServerError(reply.get("error") or "ошибка сервера курсов")
+        return reply
+
+    def rates(self, known_id: int | None = None) -> dict:
+        """
+        Текущий снимок курсов
+
+        Returns:
+            {"snapshot_id", "last_refresh", "pairs"}; если номер снимка
+            равен known_id - {"snapshot_id", "unchanged": true} без курсов
+        """
+        return self.call("rates", known_id=known_id)
+
+    def lookup(self, pairs: list[str]) -> dict:
+        """Курсы пар {"BTC_USD": {"rate", "updated_at"} | None}"""
+        return self.call("lookup", pairs=pairs)["pairs"]
+
+    def convert(self, items: list[tuple[str, str, float]]) -> list[float | None]:
+        """
+        Пакетная конвертация по одному снимку
+
+        Args:
+            items: [(из валюты, в валюту, сумма)]
+
+        Returns:
+            Суммы в целевых валютах (None - курса нет)
+        """
+        return self.call("convert", items=[list(item) for item in items])["amounts"]
+
+    def refresh(self, source: str | None = None) -> dict:
+        """Просит сервер обновить курсы; одновременные просьбы дают один запрос"""
+        return self.call("refresh", source=source)
+
+
+_client: RateClient | None = None
+_client_lock = threading.Lock()
+_disabled = False
+
+
+def disable():
+    """Отключает обращения к серверу в текущем процессе (в самом сервере)"""
+    global _disabled
+    _disabled = True
+
+
+def get_client() -> RateClient | None:
+    """Клиент сервера курсов или None, если сервер не настроен или не запущен"""
+    settings = app_config.get("RATE_SERVER") or {}
+    path = settings.get("socket")
+    if _disabled or not path or not os.path.exists(path):
+        return None
+
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RateClient(path, settings.get("timeout", 2.0))
+    return _client
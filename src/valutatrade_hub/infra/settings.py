@@ -12,7 +12,8 @@ class SettingsLoader(metaclass=SingletonMeta):
     _config_path = "src/config.json"
 
     def __init__(self):
-        self._config = self._load_config()
+        # Файл читается при первом обращении к настройкам
+        self._config = None
 
     def _load_config(self):
         """Загрузка конфигурационного файла"""
@@ -25,6 +26,9 @@ class SettingsLoader(metaclass=SingletonMeta):
 
     def get(self, key: str):
         """Получение значения из конфигурационного файла"""
+        if self._config is None:
+            self._config = self._load_config()
+
         if not self._config:
             raise RuntimeError("Конфигурационный файл не загружен")
 
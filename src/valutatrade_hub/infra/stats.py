@@ -0,0 +1,189 @@
+"""
+Гистограммы задержек доменных операций
+
+log_action открывает замер на время операции, а загрузка/сохранение базы
+и поиск курса добавляют к нему время своих фаз. При выключенной статистике
+обертки сводятся к одной проверке флага.
+"""
+
+import functools
+import time
+
+# Точность гистограммы: 2^SUB_BUCKET_BITS значений на интервал [2^k, 2^(k+1)),
+# то есть относительная погрешность не больше 1/64
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+PHASE_DB_LOAD = "db_load"
+PHASE_DB_SAVE = "db_save"
+PHASE_RATE = "rate"
+
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """
+    Гистограмма в стиле HDR Histogram
+
+    Значения (в наносекундах) раскладываются по логарифмическим интервалам,
+    каждый из которых поделен на равные под-интервалы. Память зависит только
+    от диапазона значений, а не от их количества.
+    """
+
+    __slots__ = ("counts", "total", "max_value", "sum")
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.max_value = 0
+        self.sum = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        bucket = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return bucket * SUB_BUCKET_HALF + (value >> bucket)
+
+    @staticmethod
+    def _value(index: int) -> int:
+        """Верхняя граница под-интервала"""
+        if index < 2 * SUB_BUCKET_HALF:
+            return index
+        bucket = index // SUB_BUCKET_HALF - 1
+        sub = index - bucket * SUB_BUCKET_HALF
+        return ((sub + 1) << bucket) - 1
+
+    def record(self, value: int):
+        """Добавляет значение в наносекундах"""
+        value = max(0, value)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        if value > self.max_value:
+            self.max_value = value
+
+    def percentile(self, percent: float) -> int:
+        """Значение, не меньше которого percent% наблюдений"""
+        if not self.total:
+            return 0
+
+        threshold = max(1, -(-self.total * percent // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self._value(index), self.max_value)
+        return self.max_value
+
+    def to_record(self) -> dict:
+        return {
+            "count": self.total,
+            "sum_ns": self.sum,
+            "max_ns": self.max_value,
+            **{f"p{percent}_ns": self.percentile(percent) for percent in PERCENTILES},
+            "buckets": {str(index): count for index, count in self.counts.items()},
+        }
+
+
+class _Span:
+    """Замер одной операции: общее время и время по фазам"""
+
+    __slots__ = ("action", "started", "phases", "in_phase")
+
+    def __init__(self, action: str):
+        self.action = action
+        self.started = time.perf_counter_ns()
+        self.phases: dict[str, int] = {}
+        self.in_phase = False
+
+
+class StatsRegistry:
+    """Гистограммы по операциям и их фазам"""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self._spans: list[_Span] = []
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def begin(self, action: str) -> _Span | None:
+        """Начинает замер операции (None, если статистика выключена)"""
+        if not self.enabled:
+            return None
+        span = _Span(action)
+        self._spans.append(span)
+        return span
+
+    def end(self, span: _Span | None):
+        """Завершает замер и записывает время операции и ее фаз"""
+        if span is None:
+            return
+        elapsed = time.perf_counter_ns() - span.started
+        if self._spans and self._spans[-1] is span:
+            self._spans.pop()
+
+        self._histogram(span.action).record(elapsed)
+        for phase, duration in span.phases.items():
+            self._histogram(f"{span.action}.{phase}").record(duration)
+
+    def clear(self):
+        self.histograms.clear()
+
+    def summary(self) -> list[dict]:
+        """Сводка по гистограммам, отсортированная по имени"""
+        return [
+            {
+                "name": name,
+                "count": histogram.total,
+                "max_ns": histogram.max_value,
+                **{
+                    f"p{percent}_ns": histogram.percentile(percent)
+                    for percent in PERCENTILES
+                },
+            }
+            for name, histogram in sorted(self.histograms.items())
+        ]
+
+    def to_record(self) -> dict:
+        return {name: hist.to_record() for name, hist in self.histograms.items()}
+
+
+registry = StatsRegistry()
+
+
+def timed_phase(phase: str):
+    """
+    Декоратор для фазы операции (загрузка базы, поиск курса)
+
+    Время добавляется к текущему замеру log_action; вложенные фазы
+    не учитываются повторно.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled or not registry._spans:
+                return func(*args, **kwargs)
+
+            span = registry._spans[-1]
+            if span.in_phase:
+                return func(*args, **kwargs)
+
+            span.in_phase = True
+            started = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                span.phases[phase] = (
+                    span.phases.get(phase, 0) + time.perf_counter_ns() - started
+                )
+                span.in_phase = False
+
+        return wrapper
+
+    return decorator
@@ -1,20 +1,224 @@
+import atexit
 import json
 import logging
 import logging.handlers
+import queue
+import sys
+import threading
+import time
 from pathlib import Path
 
-from src.valutatrade_hub.const import LOG_ACTION_API
+from src.valutatrade_hub.const import LOG_ACTION_API, LOG_ACTION_DROPPED
+from src.valutatrade_hub.infra import metrics
+from src.valutatrade_hub.infra.settings import app_config
 
 
-def setup_action_logger():
-    """Настройка логгера для доменных операций"""
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Файловый обработчик, который пишет пачку записей одной операцией"""
+
+    def handle_batch(self, records: list[logging.LogRecord]):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+
+        data = self.terminator.join(lines) + self.terminator
+        # maxBytes - в байтах, а кириллица в UTF-8 занимает два байта
+        size = len(data.encode(self.encoding or "utf-8"))
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            # Ротация проверяется один раз на пачку
+            if self.maxBytes and self.stream.tell() + size >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(data)
+            self.stream.flush()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладет запись в очередь без форматирования
+
+    При переполнении очереди запись отбрасывается, а не блокирует
+    вызывающий код. Отброшенные записи считаются в dropped и метрике
+    valutatrade_action_log_dropped_total, а BatchQueueListener отмечает
+    их в журнале.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int = 10000):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Поля extra неизменяемые, поэтому копия записи не нужна;
+        # достаточно зафиксировать сообщение и исключение
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            metrics.ACTION_LOG_DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+
+
+class BatchQueueListener:
+    """
+    Фоновый поток, который забирает записи из очереди пачками
+
+    Пачка отдается обработчику целиком, поэтому запись в файл и проверка
+    ротации выполняются один раз на пачку, а не на каждую запись.
+    """
+
+    _sentinel = None
+
+    def __init__(
+        self,
+        log_queue: queue.SimpleQueue,
+        handler: BatchRotatingFileHandler,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+    ):
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Обработчик очереди, чьи отброшенные записи отмечаются в журнале
+        self.queue_handler: DroppingQueueHandler | None = None
+        self._reported = 0
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._monitor, name="action-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Дописывает оставшиеся записи и останавливает поток"""
+        if self._thread is None:
+            return
+        self.queue.put(self._sentinel)
+        self._thread.join()
+        self._thread = None
+        self.handler.close()
+        if self.queue_handler is not None and self.queue_handler.dropped:
+            print(
+                "Журнал операций: отброшено записей при переполнении очереди: "
+                f"{self.queue_handler.dropped}",
+                file=sys.stderr,
+            )
+
+    def _dropped_record(self) -> logging.LogRecord | None:
+        """Запись о потерях с прошлой пачки, чтобы пропуск был виден в журнале"""
+        if self.queue_handler is None:
+            return None
+        dropped = self.queue_handler.dropped
+        if dropped == self._reported:
+            return None
+        count, self._reported = dropped - self._reported, dropped
+        return logging.makeLogRecord(
+            {
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "Записи журнала отброшены",
+                "action": LOG_ACTION_DROPPED,
+                "result": "ERROR",
+                "error_type": "QueueFull",
+                "error_message": f"отброшено записей: {count}",
+            }
+        )
+
+    def _monitor(self):
+        while True:
+            batch = [self.queue.get()]
+            # Короткая пауза собирает пачку и не отнимает GIL у вызывающего
+            # потока, пока он выполняет операцию
+            if batch[0] is not self._sentinel and self.flush_interval:
+                time.sleep(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._sentinel in batch
+            records = [record for record in batch if record is not self._sentinel]
+            dropped = self._dropped_record()
+            if dropped is not None:
+                records.append(dropped)
+            if records:
+                self.handler.handle_batch(records)
+            if stop:
+                return
+
+
+class ApiSampler(logging.Filter):
+    """
+    Пропускает каждое N-е информационное сообщение API
+
+    Ошибки и предупреждения проходят всегда. Выборка детерминированная:
+    при sample_rate=0.1 проходит ровно каждое десятое сообщение.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self._credit = 0.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        if getattr(record, "action", None) != LOG_ACTION_API:
+            return True
+
+        self._credit += self.sample_rate
+        if self._credit >= 1.0:
+            self._credit -= 1.0
+            return True
+        return False
+
+
+def setup_action_logger(
+    log_dir: str | Path | None = None,
+    queued: bool | None = None,
+    console: bool = True,
+    name: str = "domain_actions",
+):
+    """
+    Настройка логгера для доменных операций
+
+    Args:
+        log_dir: директория логов (по умолчанию - LOGGING.dir)
+        queued: писать файл через очередь в фоновом потоке
+            (по умолчанию - из LOGGING в config.json)
+        console: выводить записи в консоль
+        name: имя логгера
+    """
+    settings = app_config.get("LOGGING")
+    if queued is None:
+        queued = settings.get("queued", True)
 
     # Создаем директорию для логов
-    log_dir = Path("logs")
+    if log_dir is None:
+        log_dir = settings.get("dir", "logs")
+    log_dir = Path(log_dir)
     log_dir.mkdir(exist_ok=True)
 
     # Создаем логгер
-    logger = logging.getLogger("domain_actions")
+    logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
 
     # Форматтер в JSON
@@ -41,6 +245,7 @@ def setup_action_logger():
                   "amount": getattr(record, "amount", 0),
                   "rate": getattr(record, "rate", 0),
                   "base_currency": getattr(record, "base_currency", ""),
+                  "snapshot_id": getattr(record, "snapshot_id", None),
                   "result": getattr(record, "result", "UNKNOWN"),
                   "error_type": getattr(record, "error_type", ""),
                   "error_message": getattr(record, "error_message", ""),
@@ -72,6 +277,10 @@ def setup_action_logger():
               rate_message = f"rate={rate:.2f} " if rate else ""
               base = getattr(record, "base_currency", "")
               base_message = f"base='{base}' " if base else ""
+              snapshot_id = getattr(record, "snapshot_id", None)
+              snapshot_message = (
+                  f"snapshot={snapshot_id} " if snapshot_id is not None else ""
+              )
 
               # Базовые поля
               base_message = (
@@ -82,6 +291,7 @@ def setup_action_logger():
                   + amount_message
                   + rate_message
                   + base_message
+                  + snapshot_message
                   + f"result={getattr(record, 'result', 'UNKNOWN')}"
               )
 
@@ -99,7 +309,7 @@ def setup_action_logger():
               return base_message
 
     # File handler с ротацией (JSON формат)
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = BatchRotatingFileHandler(
         filename=log_dir / "actions.log",
         maxBytes=10 * 1024 * 1024,  # 10MB
         backupCount=5,
@@ -107,13 +317,35 @@ def setup_action_logger():
     )
     file_handler.setFormatter(JsonFormatter())
 
-    # Console handler (человекочитаемый формат)
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(HumanFormatter())
-
     # Добавляем обработчики
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    if queued:
+        # Форматирование JSON, запись и ротация - в фоновом потоке
+        log_queue = queue.SimpleQueue()
+        listener = BatchQueueListener(
+            log_queue,
+            file_handler,
+            settings.get("batch_size", 256),
+            settings.get("flush_interval", 0.05),
+        )
+        queue_handler = DroppingQueueHandler(
+            log_queue, settings.get("queue_size", 10000)
+        )
+        listener.queue_handler = queue_handler
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(queue_handler)
+        logger.listener = listener  # type: ignore[attr-defined]
+    else:
+        logger.addHandler(file_handler)
+
+    # Console handler (человекочитаемый формат) остается синхронным,
+    # чтобы сообщения не перемешивались с выводом команд
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(HumanFormatter())
+        logger.addHandler(console_handler)
+
+    logger.addFilter(ApiSampler(settings.get("api_sample_rate", 1.0)))
 
     # Предотвращаем дублирование логов
     logger.propagate = False
@@ -121,5 +353,31 @@ def setup_action_logger():
     return logger
 
 
-# Инициализация при импорте
-action_logger = setup_action_logger()
+def shutdown_action_logger(logger: logging.Logger):
+    """Дописывает очередь и закрывает обработчики логгера"""
+    listener = getattr(logger, "listener", None)
+    if listener is not None:
+        listener.stop()
+        atexit.unregister(listener.stop)
+    for handler in list(logger.handlers):
+        handler.close()
+        logger.removeHandler(handler)
+
+
+_action_logger: logging.Logger | None = None
+
+
+def get_action_logger() -> logging.Logger:
+    """Логгер доменных операций; создается при первом обращении"""
+    global _action_logger
+    if _action_logger is None:
+        _action_logger = setup_action_logger()
+    return _action_logger
+
+
+def __getattr__(name: str):
+    # action_logger создается лениво: директория логов и обработчики
+    # появляются только при первой записи
+    if name == "action_logger":
+        return get_action_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
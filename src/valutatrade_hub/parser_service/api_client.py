@@ -3,6 +3,7 @@ from typing import Dict
 
 import requests
 
+from src.valutatrade_hub.core.currencies import get_all_currencies
 from src.valutatrade_hub.core.exceptions import (
     ApiKeyError,
     ApiRequestError,
@@ -92,7 +93,10 @@ class CoinGeckoClient(BaseApiClient):
         timeout: int = 10,
     ):
         super().__init__(base_url, timeout)
-        self.crypto_ids = parser_config.CRYPTO_ID_MAP
+        # Идентификаторы берутся из реестра валют, CRYPTO_ID_MAP - запасной вариант
+        self.crypto_ids = (
+            get_all_currencies().coingecko_ids() or parser_config.CRYPTO_ID_MAP
+        )
         self.vs_currency = vs_currency.lower()
 
     def fetch_rates(self) -> Dict[str, float]:
@@ -105,14 +109,16 @@ class CoinGeckoClient(BaseApiClient):
         if not self.crypto_ids:
             raise ApiRequestError("No cryptocurrency IDs configured")
 
-        # Формируем параметры запроса
-        params = {
-            "ids": ",".join(self.crypto_ids.values()),
-            "vs_currencies": self.vs_currency,
-        }
-
-        # Выполняем запрос
-        data = self._make_request(self.base_url, params)
+        # Запрашиваем пачками, чтобы URL не рос с числом монет
+        ids = list(self.crypto_ids.values())
+        batch_size = parser_config.COINGECKO_BATCH_SIZE
+        data = {}
+        for start in range(0, len(ids), batch_size):
+            params = {
+                "ids": ",".join(ids[start:start + batch_size]),
+                "vs_currencies": self.vs_currency,
+            }
+            data.update(self._make_request(self.base_url, params))
 
         # Преобразуем ответ в стандартный формат
         return self._parse_response(data)
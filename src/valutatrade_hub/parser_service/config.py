@@ -28,6 +28,9 @@ class ParserConfig:
         }
     )
 
+    # Сколько монет запрашивать у CoinGecko за один запрос
+    COINGECKO_BATCH_SIZE: int = 250
+
     # Пути
     RATES_FILE_PATH: str = "rates.json"
     HISTORY_FILE_PATH: str = "exchange_rates.json"
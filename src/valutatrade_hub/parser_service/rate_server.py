@@ -0,0 +1,251 @@
+"""
+Сервер курсов
+
+Держит текущий снимок курсов и отдает его процессам CLI и скриптам через
+Unix-сокет (протокол - в infra/rate_client.py). Только сервер опрашивает
+CoinGeckoClient и ExchangeRateApiClient: устаревшие курсы обновляются одним
+запросом к провайдерам, сколько бы процессов их ни ждали, а результат
+записывается в файлы данных как при update-rates. Пока сервер не запущен,
+процессы читают файлы сами.
+
+Запуск: poetry run rate-server
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from src.valutatrade_hub.core import snapshots, utils, valuation
+from src.valutatrade_hub.infra import rate_client
+from src.valutatrade_hub.infra.database import DatabaseManager
+from src.valutatrade_hub.infra.settings import app_config
+
+
+class RateServer:
+    """Снимок курсов с обновлением по TTL и обработка запросов клиентов"""
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        socket_path: str,
+        ttl_seconds: int,
+        min_refresh_seconds: float = 10.0,
+    ):
+        """
+        Args:
+            db: менеджер базы данных
+            socket_path: путь к Unix-сокету
+            ttl_seconds: через сколько секунд курсы устаревают
+            min_refresh_seconds: наименьший интервал между запросами к
+                одному источнику, в том числе по явной просьбе клиентов
+        """
+        self.db = db
+        self.socket_path = socket_path
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.store = snapshots.store(db)
+        self._refresh_lock = threading.Lock()
+        # Время последнего обновления по источнику (None - все источники)
+        self._refreshed_at: dict[str | None, float] = {}
+        self._stopped = threading.Event()
+        self._server: socketserver.ThreadingUnixStreamServer | None = None
+        # Курсы последнего снимка в виде для JSON: (номер, курсы)
+        self._encoded: tuple[int, dict] | None = None
+
+    def _is_stale(self, snapshot: snapshots.RateSnapshot) -> bool:
+        return not snapshot.pairs or utils.is_old_update(
+            snapshot.last_refresh, self.ttl_seconds
+        )
+
+    def snapshot(self) -> snapshots.RateSnapshot:
+        """
+        Текущий снимок
+
+        Устаревшие курсы обновляются в фоне, а клиент сразу получает
+        последний снимок; ждать приходится, только пока курсов нет совсем.
+        """
+        snapshot = self.store.current()
+        if not snapshot.pairs:
+            self.refresh()
+            return self.store.current()
+        if self._is_stale(snapshot) and not self._refresh_lock.locked():
+            threading.Thread(
+                target=self._refresh_quietly, name="rate-refresh", daemon=True
+            ).start()
+        return snapshot
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Ошибка обновления курсов: {e}")
+
+    def refresh(self, source: str | None = None) -> bool:
+        """
+        Запрашивает курсы у провайдеров
+
+        Запросы, пришедшие во время обновления, ждут его и не запускают
+        новое, пока не прошло min_refresh_seconds. Интервал отсчитывается
+        по каждому источнику отдельно; обновление всех источников
+        учитывается для каждого из них.
+
+        Returns:
+            True, если провайдеры были опрошены этим вызовом
+        """
+        with self._refresh_lock:
+            keys = {None, source}
+            refreshed_at = max(
+                (self._refreshed_at[key] for key in keys if key in self._refreshed_at),
+                default=None,
+            )
+            if (
+                refreshed_at is not None
+                and time.monotonic() - refreshed_at < self.min_refresh_seconds
+            ):
+                return False
+            # requests и клиенты API нужны только при обновлении
+            from src.valutatrade_hub.parser_service import updater
+
+            try:
+                updater.create_updater(self.db, source).run_update()
+            finally:
+                self._refreshed_at[source] = time.monotonic()
+            return True
+
+    def _pairs(self, snapshot: snapshots.RateSnapshot) -> dict:
+        encoded = self._encoded
+        if encoded is None or encoded[0] != snapshot.id:
+            encoded = self._encoded = (
+                snapshot.id,
+                {key: dict(value) for key, value in snapshot.pairs.items()},
+            )
+        return encoded[1]
+
+    def handle(self, request: dict) -> dict:
+        """Ответ на запрос клиента"""
+        op = request.get("op")
+        if op == "refresh":
+            fetched = self.refresh(request.get("source"))
+            snapshot = self.store.current()
+            return {"ok": True, "snapshot_id": snapshot.id, "fetched": fetched}
+
+        snapshot = self.snapshot()
+        reply: dict = {"ok": True, "snapshot_id": snapshot.id}
+        match op:
+            case "ping":
+                pass
+            case "rates":
+                if request.get("known_id") == snapshot.id:
+                    reply["unchanged"] = True
+                else:
+                    reply["last_refresh"] = snapshot.last_refresh
+                    reply["pairs"] = self._pairs(snapshot)
+            case "lookup":
+                pairs = self._pairs(snapshot)
+                reply["pairs"] = {
+                    key: pairs.get(key) for key in request.get("pairs") or []
+                }
+            case "convert":
+                pivot = app_config.get("BASE_CURRENCY")
+                amounts = []
+                for from_currency, to_currency, amount in request.get("items") or []:
+                    rate = valuation.conversion_vector(
+                        snapshot.pairs,
+                        [from_currency.upper()],
+                        to_currency.upper(),
+                        pivot,
+                    )[0]
+                    amounts.append(None if rate is None else float(amount) * rate)
+                reply["amounts"] = amounts
+            case _:
+                return {"ok": False, "error": f"Неизвестная операция '{op}'"}
+        return reply
+
+    def _refresh_loop(self):
+        """Обновляет курсы по истечении TTL без ожидания запросов"""
+        while not self._stopped.wait(self.ttl_seconds):
+            if self._is_stale(self.store.current()):
+                self._refresh_quietly()
+
+    def _bind(self):
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Сокет остался от остановленного сервера
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"Сервер курсов уже запущен: {self.socket_path}")
+            finally:
+                probe.close()
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = server.handle(json.loads(line))
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        self._server = socketserver.ThreadingUnixStreamServer(
+            self.socket_path, Handler
+        )
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self):
+        """Слушает сокет до остановки"""
+        # Снимки сервера читаются из файлов, а не у самого себя
+        rate_client.disable()
+        self._bind()
+        threading.Thread(
+            target=self._refresh_loop, name="rate-refresh-loop", daemon=True
+        ).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """Останавливает serve_forever из другого потока"""
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def main():
+    settings = app_config.get("RATE_SERVER")
+    parser = argparse.ArgumentParser(description="Сервер курсов на Unix-сокете")
+    parser.add_argument("--socket", default=settings["socket"])
+    parser.add_argument("--data-dir", default=app_config.get("DATA_FILE"))
+    args = parser.parse_args()
+
+    server = RateServer(
+        DatabaseManager(os.path.abspath(args.data_dir)),
+        args.socket,
+        app_config.get("RATES_TTL_SECONDS"),
+        settings["min_refresh_seconds"],
+    )
+    print(f"Сервер курсов слушает {os.path.abspath(args.socket)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Сервер курсов остановлен")
+
+
+if __name__ == "__main__":
+    main()
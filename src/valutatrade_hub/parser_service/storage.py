@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from src.valutatrade_hub.core import ratebook, retention, rolling, snapshots
 from src.valutatrade_hub.parser_service.config import parser_config
 
 
@@ -14,8 +15,15 @@ class Storage():
 
     rates_data['pairs'] = rates
     rates_data['last_refresh'] = datetime.now().isoformat()
+    # Номер снимка продолжается между процессами через rates.json
+    store = snapshots.store(self.db)
+    rates_data['snapshot_id'] = store.next_id(rates_data.get('snapshot_id'))
 
     self.db.save(parser_config.RATES_FILE_PATH, rates_data)
+    snapshot = store.publish(
+      rates, rates_data['last_refresh'], rates_data['snapshot_id']
+    )
+    ratebook.on_rates_saved(self.db, snapshot)
 
   def save_rates_history(self, rates):
     """Сохраняет историю курсов валют в базу данных"""
@@ -34,5 +42,10 @@ class Storage():
         "source": value.get("source"),
       })
 
-
+    # Тики старше окна хранения сворачиваются в часовые и дневные бары
+    rates_history_data, _ = retention.compact_ticks(self.db, rates_history_data)
     self.db.save(parser_config.HISTORY_FILE_PATH, rates_history_data)
+
+  def save_rate_stats(self, rates):
+    """Обновляет скользящую статистику курсов"""
+    rolling.update(self.db, rates)
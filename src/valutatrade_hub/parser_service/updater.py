@@ -1,7 +1,11 @@
+import time
 from datetime import datetime
 
-from src.valutatrade_hub.const import LOG_ACTION_API
+from src.valutatrade_hub.const import LOG_ACTION_API, LOG_ACTION_FILL
 from src.valutatrade_hub.core.currencies import get_all_currencies
+from src.valutatrade_hub.core.exceptions import ApiRequestError
+from src.valutatrade_hub.core.orderbook import STATUS_FILLED, OrderMatcher
+from src.valutatrade_hub.infra import metrics
 from src.valutatrade_hub.logging_config import action_logger
 from src.valutatrade_hub.parser_service.storage import Storage
 
@@ -11,23 +15,40 @@ class RatesUpdater():
   Класс для обновления курсов валют
   """
 
-  def __init__(self, clients: list, storage: Storage):
+  def __init__(
+    self, clients: list, storage: Storage, matcher: OrderMatcher | None = None
+  ):
     self.clients = clients
     self.storage = storage
+    self.matcher = matcher
 
 
   def run_update(self):
-    """Запускает обновление курсов валют"""
+    """
+    Запускает обновление курсов валют
+
+    Raises:
+      ApiRequestError: если ни один источник не вернул курсы
+    """
 
     result = {}
-    currencies_code = list(get_all_currencies().keys())
+    currencies_code = get_all_currencies()
+    update_started = time.perf_counter()
 
     action_logger.info("Starting rates update...", extra={'action': LOG_ACTION_API})
 
     for client in self.clients:
+      client_name = client.__class__.__name__
+      for error in metrics.API_ERRORS:
+        metrics.RATES_FETCH_ERRORS.touch(client=client_name, error=error)
+
+      fetch_started = time.perf_counter()
       try:
 
         res = client.fetch_rates()
+        metrics.RATES_FETCH_DURATION.observe(
+          time.perf_counter() - fetch_started, client=client_name
+        )
         action_logger.info(
           f"Fetching rates from {client.__class__.__name__}... OK ({len(res)} rates)", extra={'action': LOG_ACTION_API} # noqa E501
           ) 
@@ -42,11 +63,80 @@ class RatesUpdater():
             }
 
       except Exception as e:
+        metrics.RATES_FETCH_DURATION.observe(
+          time.perf_counter() - fetch_started, client=client_name
+        )
+        metrics.RATES_FETCH_ERRORS.inc(client=client_name, error=type(e).__name__)
         print(e)
         action_logger.error(f"Failed to fetch rates from {client.__class__.__name__}: {e}", extra={'action': LOG_ACTION_API}) # noqa E501
         continue   
 
+    if not result:
+      # Пустой результат не публикуется: последние известные курсы остаются
+      metrics.RATES_LAST_PAIRS.set(0)
+      metrics.RATES_UPDATE_DURATION.observe(time.perf_counter() - update_started)
+      action_logger.error("Update failed: no rates fetched from any source", extra={'action': LOG_ACTION_API}) # noqa E501
+      raise ApiRequestError("No rates fetched from any source")
+
     self.storage.save_rates(result)
     action_logger.info(f"Writing {len(result)} rates to data/rates.json...", extra={'action': LOG_ACTION_API}) # noqa E501
     self.storage.save_rates_history(result)  
+    self.storage.save_rate_stats(result)
     action_logger.info(f"Update successful. Total rates updated: {len(result)}. Last refresh: {datetime.now().isoformat()}", extra={'action': LOG_ACTION_API}) # noqa E501
+
+    metrics.RATES_PAIRS_WRITTEN.inc(len(result))
+    metrics.RATES_LAST_PAIRS.set(len(result))
+    metrics.RATES_LAST_SUCCESS.set(time.time())
+
+    if self.matcher:
+      self._match_orders(result)
+
+    metrics.RATES_UPDATE_DURATION.observe(time.perf_counter() - update_started)
+
+  def _match_orders(self, result: dict):
+    """Исполняет лимитные заявки, пересеченные новыми курсами"""
+
+    fills = self.matcher.match(
+      {key: value["rate"] for key, value in result.items()}
+    )
+
+    for order, rate in fills:
+      extra = {
+        "action": LOG_ACTION_FILL,
+        "user_id": order.user_id,
+        "currency_code": order.currency,
+        "amount": order.amount,
+        "rate": rate,
+        "base_currency": order.base_currency,
+        "result": "OK" if order.status == STATUS_FILLED else "ERROR",
+        "context": f"order=#{order.order_id} side={order.side} price={order.price}",
+      }
+      if order.status == STATUS_FILLED:
+        action_logger.info(f"Order #{order.order_id} filled", extra=extra)
+      else:
+        action_logger.error(f"Order #{order.order_id} rejected", extra=extra)
+
+    if fills:
+      action_logger.info(f"Matched {len(fills)} limit orders", extra={'action': LOG_ACTION_API}) # noqa E501
+
+
+def create_updater(db, source: str | None = None) -> RatesUpdater:
+  """Обновлятор курсов с клиентами источника source (по умолчанию - всех)"""
+  from src.valutatrade_hub.infra.settings import app_config
+  from src.valutatrade_hub.parser_service.api_client import (
+    CoinGeckoClient,
+    ExchangeRateApiClient,
+  )
+
+  match source:
+    case "coingecko":
+      clients = [CoinGeckoClient()]
+    case "exchangerate":
+      clients = [ExchangeRateApiClient()]
+    case _:
+      clients = [CoinGeckoClient(), ExchangeRateApiClient()]
+
+  matcher = OrderMatcher(
+    db, app_config.get("ORDERS_FILE"), app_config.get("PORTFOLIOS_FILE")
+  )
+  return RatesUpdater(clients, Storage(db), matcher)